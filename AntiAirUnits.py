@@ -1,8 +1,8 @@
 import math
-import random
 from enum import Enum
+from operator import attrgetter
 
-from UAVUnits import Unit, UAV, UnitState, ArmourType
+from UAVUnits import Unit, UAV, UnitState, ArmourType, rollD100
 from LogHub import SupplyType
 
 class AAStatus(Enum):
@@ -10,10 +10,22 @@ class AAStatus(Enum):
     Aiming = 2
     Firing = 3
     OutOfAmmo = 4
+    Reloading = 5
+
+# code -> AAStatus, AAstate is stored as a small int
+_AA_STATES_BY_CODE = {s.value: s for s in AAStatus}
+
 
 class AntiAir(Unit):
-    currentAimTime = 0.0
-    target = None
+    __slots__ = ("range", "ammoCount", "ammoType", "aimTime", "timeBetweenShots", "_AAstate", "target")
+
+    @property
+    def AAstate(self) -> AAStatus:
+        return _AA_STATES_BY_CODE[self._AAstate]
+
+    @AAstate.setter
+    def AAstate(self, value: AAStatus):
+        self._AAstate = value.value
 
     def __init__(self,
                  name: str,
@@ -30,8 +42,11 @@ class AntiAir(Unit):
                  aimTime: float = 1.0,
                  timeBetweenShots: float = 1.0,
                  AAstate: AAStatus = AAStatus.Idle,
-                 viewRange: int = 100):
-        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, viewRange)
+                 viewRange: int = 100,
+                 *,
+                 store):
+        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, viewRange,
+                         store=store)
         self.range = range
         # numeric amount (still kept for now)
         self.ammoCount = ammoCount
@@ -40,46 +55,81 @@ class AntiAir(Unit):
         self.aimTime = aimTime
         self.timeBetweenShots = timeBetweenShots
         self.AAstate = AAstate
+        self.target = None
 
-    def tickAA(self, dt: float, units):
-        if self.ammoCount <= 0:
-            self.AAstate = AAStatus.OutOfAmmo
-            self.target = None
-            self.currentAimTime = 0.0
-            return
-        if self.AAstate == AAStatus.Idle:
-            targets = self.scanForTarget(units)
-            if len(targets) > 0:
-                self.target = targets[0]
-                self.AAstate = AAStatus.Aiming
-        if self.AAstate == AAStatus.Aiming and self.target is not None:
-            if self.currentAimTime < self.aimTime:
-                self.currentAimTime += dt
-            else:
-                self.AAstate = AAStatus.Firing
-
-        if self.AAstate == AAStatus.Firing and self.target is not None:
-            self.hitCheck(self.target)
-            self.currentAimTime = 0.0
-            self.ammoCount -= 1
-            if self.target.state == UnitState.Destroyed:
+    # The AA is event driven: the world only calls acquire() while it is Idle,
+    # and on_timer() at the time acquire()/on_timer() returned last.
+    # None means "nothing scheduled" (Idle again, or OutOfAmmo).
+
+    def acquire(self, units, index=None, now: float = 0.0):
+        if self.AAstate != AAStatus.Idle:
+            return None
+        targets = self.scanForTarget(units, index)
+        if not targets:
+            return None
+        # lowest id = first in the units list, like the old list scan picked
+        self.target = min(targets, key=attrgetter("id"))
+        self.AAstate = AAStatus.Aiming
+        return now + self.aimTime
+
+    def on_timer(self, now: float, rng=None):
+        if self.AAstate == AAStatus.Aiming:
+            # aimed -> fire
+            self.AAstate = AAStatus.Firing
+            return self.fire(now, rng)
+        if self.AAstate == AAStatus.Reloading:
+            # reloaded -> aim again, unless someone else got the target meanwhile
+            if self.target is None or self.target.state == UnitState.Destroyed:
                 self.target = None
                 self.AAstate = AAStatus.Idle
-                return
+                return None
             self.AAstate = AAStatus.Aiming
+            return now + self.aimTime
+        return None
+
+    def fire(self, now: float, rng=None):
+        target = self.target
+        if target is None:
+            self.AAstate = AAStatus.Idle
+            return None
 
-    def hitCheck(self, target: UAV):
-        calculated = random.randint(1,100)
+        self.hitCheck(target, rng)
+        self.ammoCount -= 1
+        if self.ammoCount <= 0:
+            self.target = None
+            self.AAstate = AAStatus.OutOfAmmo
+            return None
+        if target.state == UnitState.Destroyed:
+            self.target = None
+            self.AAstate = AAStatus.Idle
+            return None
+        # still up -> reload, then aim again for the next shot
+        self.AAstate = AAStatus.Reloading
+        return now + self.timeBetweenShots
+
+    def inRange(self, u) -> bool:
+        dx = u.positionX - self.positionX
+        dy = u.positionY - self.positionY
+        return dx * dx + dy * dy <= self.range * self.range
+
+    def hitCheck(self, target: UAV, rng=None):
+        calculated = rollD100(rng)
         if calculated < self.chanceToHit: #+ getTerrainHitModifiers + getUAVHitModifiers:
             target.state = UnitState.Destroyed
         return
 
-    def scanForTarget(self, targetList):
+    def scanForTarget(self, targetList, index=None):
         if self.AAstate != AAStatus.Idle:
             return
 
+        # with a spatial index only look at units around us
+        if index is not None:
+            candidates = index.query_radius(self.positionX, self.positionY, self.range)
+        else:
+            candidates = targetList
+
         inRange = []
-        for u in targetList:
+        for u in candidates:
             if u is self:
                 continue
             if u.player == self.player:
@@ -0,0 +1,145 @@
+from collections import deque
+
+import numpy as np
+
+import MovementEngine
+import UAVUnits
+
+# powered nodes tested against every UAV at once, per numpy pass
+COVERAGE_BLOCK = 32
+
+
+def _slots(units) -> np.ndarray:
+    return np.fromiter((u._slot for u in units), dtype=np.intp, count=len(units))
+
+
+def _in(units, ids: set) -> np.ndarray:
+    return np.fromiter((u.id in ids for u in units), dtype=bool, count=len(units))
+
+
+def is_jammed(uav, index) -> bool:
+    """True if any active jammer covering the UAV's position works on one of its frequencies."""
+    uav_freqs = getattr(uav, "usedFrequencies", []) or []
+    if not uav_freqs:
+        return False
+    for jammer in index.ewarUnits.covering(uav.positionX, uav.positionY):
+        # skip inactive jammers if you later add is_active flag:
+        if getattr(jammer, "is_active", True) is False:
+            continue
+        jammer_freqs = getattr(jammer, "jammingFreq", []) or []
+        # simple overlap test (exact membership)
+        # NOTE: any jammer blocks, friendly ones included
+        for f in uav_freqs:
+            if f in jammer_freqs:
+                return True
+    return False
+
+
+class CommGraph:
+    """
+    Who is in comm this tick. Built once per tick as a BFS from every
+    LogHub through ground retransmitters and switched-on RetransmiterUAVs
+    (a relay only carries signal if a powered node reaches it), then every
+    UAV inside a powered node's transmissionRange is marked as in comm.
+    Both passes test distances on arrays, UAV positions taken from the
+    store columns by slot.
+    """
+
+    def __init__(self, store):
+        self.store = store                 # the world's MovementStore
+        self.index = None
+        self.inComm: set[int] = set()      # UAV ids with comm
+        self.jammed: set[int] = set()      # UAV ids blocked by a jammer
+        self.known: set[int] = set()       # UAV ids that existed at rebuild time
+        self.powered: list = []            # bases + relays connected to a base
+
+    def rebuild(self, index, units, bases, jammingRaster=None):
+        self.index = index
+        store = self.store
+        uavs = [u for u in units if isinstance(u, UAVUnits.UAV)]
+        self.known = {u.id for u in uavs}
+        if jammingRaster is not None:
+            self.jammed = jammingRaster.jammed_ids(uavs, store)
+        else:
+            self.jammed = {u.id for u in uavs if is_jammed(u, index)}
+        jammed = self.jammed
+
+        # ---- BFS over the relay graph, rooted at the bases ----
+        # link tests run on arrays: positions of air relays straight from the store columns
+        ground = index.groundRetransmitters.members()
+        air = index.airRelays.members()
+        relays = ground + air
+        airSlots = _slots(air)
+        rx = np.concatenate((np.fromiter((r.positionX for r in ground), np.float64, len(ground)),
+                             store.posX[airSlots]))
+        ry = np.concatenate((np.fromiter((r.positionY for r in ground), np.float64, len(ground)),
+                             store.posY[airSlots]))
+        rPlayer = np.fromiter((r.player for r in relays), np.int64, len(relays))
+        # a UAV only relays while it's up, not jammed and switched on (3x drain = retransmitting)
+        usable = np.ones(len(relays), dtype=bool)
+        usable[len(ground):] = ((store.state[airSlots] != MovementEngine.STATE_DESTROYED)
+                                & (store.drainModifier[airSlots] != 1.0)
+                                & ~_in(air, jammed))
+        reached = ~usable
+
+        powered = list(bases)
+        queue = deque((b.positionX, b.positionY, b.transmissionRange, b.player) for b in bases)
+        while queue:
+            x, y, r, player = queue.popleft()
+            hit = np.flatnonzero(~reached & (rPlayer == player) & ((rx - x) ** 2 + (ry - y) ** 2 <= r * r))
+            reached[hit] = True
+            for i in hit.tolist():
+                relay = relays[i]
+                powered.append(relay)
+                queue.append((float(rx[i]), float(ry[i]), relay.transmissionRange, relay.player))
+
+        self.powered = powered
+
+        # ---- coverage: UAVs inside any powered node's range ----
+        slots = _slots(uavs)
+        ux = store.posX[slots]
+        uy = store.posY[slots]
+        uPlayer = np.fromiter((u.player for u in uavs), np.int64, len(uavs))
+        open_ = ~_in(uavs, jammed)
+        # a powered UAV relay doesn't cover itself
+        selfOf = {id(u): i for i, u in enumerate(uavs)}
+        covered = np.zeros(len(uavs), dtype=bool)
+        for player in {n.player for n in powered}:
+            mine = np.flatnonzero(open_ & (uPlayer == player))
+            if mine.size == 0:
+                continue
+            nodes = [n for n in powered if n.player == player]
+            nx = np.fromiter((n.positionX for n in nodes), np.float64, len(nodes))
+            ny = np.fromiter((n.positionY for n in nodes), np.float64, len(nodes))
+            nr = np.fromiter((n.transmissionRange for n in nodes), np.float64, len(nodes))
+            mx = ux[mine][None, :]
+            my = uy[mine][None, :]
+            col = {i: k for k, i in enumerate(mine.tolist())}
+            for b0 in range(0, len(nodes), COVERAGE_BLOCK):
+                b1 = min(b0 + COVERAGE_BLOCK, len(nodes))
+                inside = ((mx - nx[b0:b1, None]) ** 2 + (my - ny[b0:b1, None]) ** 2
+                          <= (nr[b0:b1] * nr[b0:b1])[:, None])
+                for k in range(b0, b1):
+                    i = selfOf.get(id(nodes[k]))
+                    if i is not None and i in col:
+                        inside[k - b0, col[i]] = False
+                covered[mine] |= inside.any(axis=0)
+        self.inComm = {uavs[i].id for i in np.flatnonzero(covered).tolist()}
+
+    def is_in_comm(self, uav) -> bool:
+        if uav.id in self.known:
+            return uav.id in self.inComm
+        # spawned after the last rebuild - answer directly from the powered nodes
+        return self.check(uav)
+
+    def check(self, uav) -> bool:
+        if self.index is None or is_jammed(uav, self.index):
+            return False
+        for node in self.powered:
+            if node is uav or node.player != uav.player:
+                continue
+            dx = uav.positionX - node.positionX
+            dy = uav.positionY - node.positionY
+            if dx * dx + dy * dy <= node.transmissionRange * node.transmissionRange:
+                return True
+        return False
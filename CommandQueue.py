@@ -0,0 +1,74 @@
+import queue
+from concurrent.futures import Future, TimeoutError
+
+
+class Command:
+    __slots__ = ("name", "fn", "args", "future")
+
+    def __init__(self, fn, args):
+        self.name = fn.__name__
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+
+
+class CommandQueue:
+    """
+    Many writers (Flask request threads) -> one reader (the simulation thread).
+    Request threads never touch the world: they submit a command and wait on
+    its Future; the simulation thread runs everything queued so far at the
+    start of a tick, so commands only ever see the world between ticks.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self.applied = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def submit(self, fn, *args) -> Future:
+        cmd = Command(fn, args)
+        self._queue.put(cmd)
+        return cmd.future
+
+    def call(self, fn, *args, timeout: float = 5.0):
+        """submit() and wait for the result; raises TimeoutError if the sim thread doesn't get to it."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            # still queued -> drop it so it never runs; already running -> let it finish
+            if future.cancel():
+                raise
+            return future.result()
+
+    def drain(self) -> int:
+        """Run the commands queued so far (not ones queued while draining). Sim thread only."""
+        count = self._queue.qsize()
+        done = 0
+        for _ in range(count):
+            try:
+                cmd = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if not cmd.future.set_running_or_notify_cancel():
+                self.cancelled += 1
+                continue
+            try:
+                result = cmd.fn(*cmd.args)
+            except BaseException as e:
+                self.failed += 1
+                cmd.future.set_exception(e)
+            else:
+                self.applied += 1
+                cmd.future.set_result(result)
+            done += 1
+        return done
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "applied": self.applied,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
@@ -0,0 +1,49 @@
+import LogHub
+
+
+class EntityRegistry:
+    """
+    id -> object lookup for everything alive in the world.
+    Units (GameWorld.nextUnitId) and ground structures (GameWorld.nextStructureId, 10000+)
+    are kept in separate dicts because the two counters can overlap once
+    there are more than 10000 units; get() checks units first, the same
+    order the old `units + aaUnits + logBases` scans used.
+    """
+
+    def __init__(self):
+        self.units = {}
+        self.structures = {}
+
+    def _table(self, obj):
+        return self.structures if isinstance(obj, LogHub.GroundStructure) else self.units
+
+    def add(self, obj):
+        self._table(obj)[obj.id] = obj
+
+    def remove(self, obj):
+        table = self._table(obj)
+        # only drop the entry if it still points at this object
+        if table.get(obj.id) is obj:
+            del table[obj.id]
+
+    def get(self, entity_id):
+        obj = self.units.get(entity_id)
+        if obj is None:
+            obj = self.structures.get(entity_id)
+        return obj
+
+    def get_unit(self, unit_id):
+        return self.units.get(unit_id)
+
+    def get_structure(self, structure_id):
+        return self.structures.get(structure_id)
+
+    def clear(self):
+        self.units.clear()
+        self.structures.clear()
+
+    def __len__(self):
+        return len(self.units) + len(self.structures)
+
+    def __contains__(self, obj):
+        return self._table(obj).get(obj.id) is obj
@@ -0,0 +1,923 @@
+import math
+from collections import Counter, deque
+
+import numpy as np
+
+import UAVUnits, AntiAirUnits, LogHub, GroundUnits
+import SpatialIndex, MovementEngine, CommNetwork, JammingRaster, EntityRegistry, TimerQueue, TerrainRaster
+import PathFinding, RoadNetwork
+
+ATTACK_RANGE = 3
+
+# independent random streams, one per subsystem that draws random numbers
+RNG_STREAMS = ("aa", "strike")
+
+# supply truck defaults
+TRUCK_MAX_FUEL = 40.0
+TRUCK_FUEL_PER_TICK = 0.005
+DELIVERY_RADIUS = 5
+# most terrain samples per route leg when working out a truck's ETA
+TRUCK_ETA_SAMPLES = 512
+# how often a truck that isn't getting any closer (no fuel, target moved) looks again
+TRUCK_RECHECK = 1.0
+
+
+def is_active_air_relay(u):
+    return isinstance(u, UAVUnits.RetransmiterUAV) and getattr(u, "is_retransmitting", False)
+
+
+class GameWorld:
+    """
+    Everything that lives on the map plus the per-tick simulation.
+    Used by the Flask server (TestGameLoop) and by headless runs alike;
+    nothing in here sleeps or knows about HTTP.
+    """
+
+    def __init__(self, width: int = 1024, height: int = 1024, max_events: int = 10000, seed=None):
+        self.width = width
+        self.height = height
+
+        # every random draw goes through self.rng[<stream>]; the same seed and the
+        # same commands replay the same battle. With seed=None fresh entropy is
+        # picked and kept in self.seed so the run can still be replayed.
+        self.seed = None
+        self.rng = {}
+        self.reseed(seed)
+
+        self.verbose = True
+        self.max_events = max_events
+        # optional TerrainRaster scaling movement speed; part of the map, so clear() keeps it
+        self.terrain = None
+        self.planner = None     # PathFinding.PathPlanner over the terrain, made on first use
+        # the server plans on a thread of its own so searches never hold up a tick; headless
+        # runs keep planning inline so a seed replays the same routes
+        self.planInBackground = False
+        # optional RoadNetwork supply trucks drive on; map data too, bridges can be destroyed
+        self.roads = None
+        # this world's units are views into its own store (make_entity passes it on), and
+        # ids come from its own counters, so any number of worlds can live in one process
+        self.store = MovementEngine.MovementStore()
+        self.nextUnitId = 0
+        self.nextStructureId = 0
+        self.clear()
+
+    def clear(self):
+        """Empty the world: no entities, tick 0, fresh indices and stats (seed kept)."""
+        self.units = []
+        self.aaUnits = []
+        self.logBases = []
+        self.ground_retransmitters = []
+        self.ewarUnits = []
+        self.pending_attacks = {}
+        self.store.reset()
+
+        # id -> object for everything in the lists above, kept in sync on spawn/destroy
+        self.registry = EntityRegistry.EntityRegistry()
+        # uniform grid over all world lists, rebuilt at the start of every tick;
+        # spawn() / _forget() keep it current in between
+        self.index = SpatialIndex.WorldIndex(cellSize=64)
+        # who can receive orders this tick, rebuilt right after the spatial index
+        self.comm = CommNetwork.CommGraph(self.store)
+        # per-frequency jammer coverage, only rebuilt when an EW unit appears or disappears
+        self.jamming = JammingRaster.JammingRaster(self.width, self.height, cellSize=4)
+
+        # AA shots / reloads and supply truck arrivals wake up from here instead of
+        # being polled every tick; awakeAA holds the AAs with nothing scheduled
+        # (Idle ones scan for targets, OutOfAmmo ones wait for a truck)
+        self.timers = TimerQueue.TimerQueue()
+        self.awakeAA = {}
+        self.supplyVehicles = {}
+
+        self.tick_count = 0
+        self.time = 0.0
+
+        # event statistics: running counters plus a bounded log of recent events
+        self.stats = Counter()
+        self.events = deque(maxlen=self.max_events)
+
+        # what the published views haven't picked up yet (take_changes): entities changed
+        # outside the movement store (touch), ids that left the world, and AAs whose
+        # record follows a target around; fresh = start over from every entity
+        self.touched = {}
+        self.gone = set()
+        self.aiming = set()
+        self.fresh = True
+
+    def reseed(self, seed=None):
+        seq = np.random.SeedSequence(seed)
+        self.seed = seq.entropy
+        self.rng = {name: np.random.Generator(np.random.PCG64(child))
+                    for name, child in zip(RNG_STREAMS, seq.spawn(len(RNG_STREAMS)))}
+
+    # ------------------------------------------------------------------ events
+
+    def record(self, kind: str, **data):
+        self.stats[kind] += 1
+        data["type"] = kind
+        data["tick"] = self.tick_count
+        data["time"] = round(self.time, 3)
+        self.events.append(data)
+
+    # ------------------------------------------------------- spawn / destroy
+
+    def list_for(self, obj):
+        if isinstance(obj, AntiAirUnits.AntiAir):
+            return self.aaUnits
+        if isinstance(obj, UAVUnits.Unit):
+            return self.units
+        if isinstance(obj, LogHub.LogHub):
+            return self.logBases
+        if isinstance(obj, LogHub.GroundRetransmitter):
+            return self.ground_retransmitters
+        return self.ewarUnits
+
+    def grid_for(self, obj):
+        """The spatial index grid obj lives in (same split as list_for)."""
+        idx = self.index
+        if isinstance(obj, AntiAirUnits.AntiAir):
+            return idx.aaUnits
+        if isinstance(obj, UAVUnits.Unit):
+            return idx.units
+        if isinstance(obj, LogHub.LogHub):
+            return idx.logBases
+        if isinstance(obj, LogHub.GroundRetransmitter):
+            return idx.groundRetransmitters
+        return idx.ewarUnits
+
+    def assign_id(self, obj):
+        """Give a new entity this world's next id: units count from 0, ground structures from 10000."""
+        if isinstance(obj, LogHub.GroundStructure):
+            obj.id = 10000 + self.nextStructureId
+            self.nextStructureId += 1
+        else:
+            obj.id = self.nextUnitId
+            self.nextUnitId += 1
+        return obj.id
+
+    def touch(self, obj):
+        """Mark obj as changed in ways the movement store doesn't see (ammo, storage, move_queue ...)."""
+        self.touched[obj] = None
+
+    def take_changes(self):
+        """
+        What changed since the last call, for WorldView: (entities, slots, gone ids).
+        entities are the live ones changed beyond their store columns - touch()ed,
+        new, requeued, AAs aiming at something that moves - and need a whole new
+        record; slots are the store rows written, whose records only need the
+        column values. entities is None after clear() / a restore, when every
+        entity has to be looked at.
+        """
+        store = self.store
+        slots, requeued = store.take_dirty()
+        slots = slots[store.ids[slots] >= 0]
+        if self.fresh:
+            self.fresh = False
+            self.touched = {}
+            self.gone = set()
+            self.aiming = {aa for aa in self.aaUnits if aa.target is not None}
+            return None, slots, frozenset()
+        changed = self.touched
+        changed.update(dict.fromkeys(self.aiming))
+        owners = store.owners
+        for slot in requeued.tolist():
+            ref = owners[slot]
+            u = ref() if ref is not None else None
+            if u is not None:
+                changed[u] = None
+        get = self.registry.get
+        entities = [obj for obj in changed if obj.id is not None and get(obj.id) is obj]
+        gone = frozenset(self.gone)
+        self.touched = {}
+        self.gone = set()
+        self.aiming = {aa for aa in self.aiming if aa.target is not None}
+        return entities, slots, gone
+
+    def spawn(self, obj):
+        if obj.id is None:
+            self.assign_id(obj)
+        self.touch(obj)
+        if isinstance(obj, UAVUnits.Unit):
+            self.store.ids[obj._slot] = obj.id
+        lst = self.list_for(obj)
+        lst.append(obj)
+        self.registry.add(obj)
+        # queried later this tick too, not only after the next rebuild
+        self.grid_for(obj).insert(obj)
+        if lst is self.ewarUnits:
+            self.jamming.mark_dirty()
+        elif lst is self.aaUnits:
+            self.awakeAA[obj.id] = obj
+        elif isinstance(obj, GroundUnits.SupplyVehicle):
+            self.supplyVehicles[obj.id] = obj
+            self._schedule_truck(obj)
+        return obj
+
+    def despawn(self, obj):
+        lst = self.list_for(obj)
+        lst.remove(obj)
+        self._forget(obj)
+
+    def _forget(self, obj):
+        self.registry.remove(obj)
+        self.gone.add(obj.id)
+        self.grid_for(obj).remove(obj)
+        self.index.airRelays.remove(obj)
+        self.timers.cancel(obj)
+        if isinstance(obj, AntiAirUnits.AntiAir):
+            self.awakeAA.pop(obj.id, None)
+        elif isinstance(obj, GroundUnits.SupplyVehicle):
+            self.supplyVehicles.pop(obj.id, None)
+        elif isinstance(obj, LogHub.ElectronicWarfare):
+            self.jamming.mark_dirty()
+        # trucks heading to / home to this one need to change plans now
+        for truck in self.supplyVehicles.values():
+            if truck.target_unit_id == obj.id or truck.home_base_id == obj.id:
+                self.timers.schedule(truck, self.time)
+
+    def prune_destroyed(self, lst):
+        # returns the list without destroyed entries and forgets those in the registry
+        alive = []
+        for obj in lst:
+            if obj.state == UAVUnits.UnitState.Destroyed:
+                self._forget(obj)
+                self.record("destroyed", id=obj.id, unit_class=obj.__class__.__name__, player=obj.player,
+                            battery=round(obj.currentBattery, 4) if isinstance(obj, UAVUnits.UAV) else None)
+            else:
+                alive.append(obj)
+        return alive
+
+    def get_base(self, base_id):
+        base = self.registry.get_structure(base_id)
+        return base if isinstance(base, LogHub.LogHub) else None
+
+    def path_planner(self):
+        """A* planner over the current terrain (None without terrain); rebuilt if the terrain is swapped."""
+        if self.terrain is None:
+            return None
+        if self.planner is None or self.planner.terrain is not self.terrain:
+            self.planner = PathFinding.PathPlanner(self.terrain, background=self.planInBackground)
+        return self.planner
+
+    def route_unit(self, u, dest, clear_queue: bool = True):
+        """
+        Like u.move_unit(dest), but ground units on a map with terrain follow
+        an A* route, and supply trucks take the road network when that's
+        quicker: the first waypoint becomes the destination and the rest go
+        to the front of move_queue. With clear_queue=False a unit that's
+        already moving gets the route appended after its queued moves.
+        A search left to the planner thread (planInBackground) has the unit
+        head straight for dest until the route comes in, see _apply_routes().
+        """
+        dest = (dest[0], dest[1])
+        append = not clear_queue and u.state == UAVUnits.UnitState.Moving and u.destination is not None
+        if append:
+            start = u.move_queue[-1] if u.move_queue else u.destination
+        else:
+            start = (u.positionX, u.positionY)
+        path = None
+        if self.roads is not None and isinstance(u, GroundUnits.SupplyVehicle):
+            path = self.roads.route(start, dest)
+        planner = self.path_planner() if isinstance(u, GroundUnits.GroundUnit) else None
+        if not path and planner is not None:
+            if planner.background:
+                path = planner.request_path(start, dest, (u.id, dest))
+            else:
+                path = planner.find_path(start, dest)
+        if not path:
+            path = [dest]
+
+        if append:
+            u.move_queue.extend(path)
+            self.touch(u)
+        else:
+            u.move_unit(path[0], clear_queue=clear_queue)
+            u.move_queue[:0] = path[1:]
+        return path
+
+    def _apply_routes(self, planner):
+        # routes the planner thread finished: each replaces the straight leg to its
+        # dest, if the unit still has that leg ahead of it (else it got new orders)
+        for (uid, dest), path in planner.finished():
+            u = self.registry.get_unit(uid)
+            if not path or u is None or u.state != UAVUnits.UnitState.Moving:
+                continue
+            if u.destination == dest:
+                u.move_unit(path[0], clear_queue=False)
+                u.move_queue[:0] = path[1:]
+            elif dest in u.move_queue:
+                i = u.move_queue.index(dest)
+                u.move_queue[i:i + 1] = path
+                self.touch(u)
+            else:
+                continue
+            if isinstance(u, GroundUnits.SupplyVehicle):
+                self._schedule_truck(u)
+
+    def route_group(self, units, dest):
+        """
+        Send many units to one point. Ground units on a map with terrain share
+        that point's flow field (built once, whatever the group size) and steer
+        by it every tick; everyone else heads straight there.
+        """
+        dest = (dest[0], dest[1])
+        planner = self.path_planner()
+        for u in units:
+            u.move_unit(dest)
+            if planner is not None and isinstance(u, GroundUnits.GroundUnit):
+                u.followsFlow = True
+
+    def destroy_bridge(self, bridge_id: str) -> bool:
+        """Close a bridge of the road network; units whose route crosses it plan again from where they are."""
+        if self.roads is None or not self.roads.destroy_bridge(bridge_id):
+            return False
+        self.record("bridge_destroyed", bridge=bridge_id)
+        span = self.roads.bridge_points(bridge_id)
+        for u in self.units:
+            if u.state != UAVUnits.UnitState.Moving or not isinstance(u, GroundUnits.GroundUnit):
+                continue
+            ahead = [u.destination] + u.move_queue
+            if not span.isdisjoint(ahead):
+                self.route_unit(u, ahead[-1])
+                if isinstance(u, GroundUnits.SupplyVehicle):
+                    self._schedule_truck(u)
+        return True
+
+    def repair_bridge(self, bridge_id: str) -> bool:
+        if self.roads is None or not self.roads.repair_bridge(bridge_id):
+            return False
+        self.record("bridge_repaired", bridge=bridge_id)
+        return True
+
+    # ------------------------------------------------------------- factories
+
+    def make_entity(self, unit_type: str, player: int, x: float, y: float, options: dict = None):
+        """Build (but don't spawn) one of the admin/scenario unit types with its usual defaults."""
+        options = options or {}
+        ally = player == 1
+
+        if unit_type == "LoiteringMunition":
+            # read optional params
+            expl_str = options.get("explosiveType", "HEAT")
+            used_freqs = options.get("usedFrequencies", [2400])
+
+            # normalize used_freqs (client might send string or list)
+            if isinstance(used_freqs, str):
+                used_freqs = [float(s.strip()) for s in used_freqs.split(",") if s.strip()]
+
+            # convert explosive type string -> enum (fallback to HEAT on invalid)
+            try:
+                expl_enum = UAVUnits.ExplosiveType[expl_str]
+            except Exception:
+                expl_enum = UAVUnits.ExplosiveType.HEAT
+
+            return UAVUnits.LoiteringMunition(
+                name=options.get("name", f"LM-admin-{len(self.units)}"),
+                chanceToHit=options.get("chanceToHit", 50),
+                baseSpeed=options.get("baseSpeed", 20),
+                state=UAVUnits.UnitState[options.get("state", "Landed")],
+                position=(x, y),
+                image="static/ICONS/UAV ALLY.png" if ally else "static/ICONS/UAV ENEMY.png",
+                armourType=UAVUnits.ArmourType.Unarmored,
+                player=player,
+                currentWeight=1.7,
+                idleBatteryDrainPerTick=0.0083,
+                moveBatteryDrainPerTick=0.0138,
+                payload=1.0,
+                explosiveType=expl_enum,
+                usedFrequencies=used_freqs,
+                store=self.store
+            )
+
+        if unit_type == "AntiAir":
+            return AntiAirUnits.AntiAir(
+                name=options.get("name", f"AA-admin-{len(self.aaUnits)}"),
+                chanceToHit=options.get("chanceToHit", 35),
+                baseSpeed=0,
+                state=UAVUnits.UnitState.Idle,
+                position=(x, y),
+                image="static/ICONS/AIR DEF ALLY.png" if ally else "static/ICONS/AIR DEF ENEMY.png",
+                armourType=UAVUnits.ArmourType.LightArmour,
+                player=player,
+                range=options.get("range", 150),
+                ammoCount=options.get("ammo", 5),
+                ammoType=LogHub.SupplyType.AAMunition,
+                aimTime=options.get("aimTime", 1.0),
+                timeBetweenShots=options.get("timeBetweenShots", 2.0),
+                AAstate=AntiAirUnits.AAStatus.Idle,
+                store=self.store
+            )
+
+        if unit_type == "LogHub":
+            storage = {LogHub.SupplyType[k]: v for k, v in (options.get("storage") or {}).items()}
+            return LogHub.LogHub(
+                name=options.get("name", f"Base-admin-{len(self.logBases)}"),
+                position=(x, y),
+                image="static/ICONS/HQ_ALLY.png" if ally else "static/ICONS/HQ_ENEMY.png",
+                player=player,
+                transmissionRange=options.get("transmissionRange", 300),
+                storage=storage
+            )
+
+        if unit_type == "GroundRetransmitter":
+            return LogHub.GroundRetransmitter(
+                name=options.get("name", f"RT-admin-{len(self.ground_retransmitters)}"),
+                position=(x, y),
+                image="static/ICONS/ŁĄCZNOŚĆ ALLY.png" if ally else "static/ICONS/ŁĄCZNOŚĆ ENEMY.png",
+                player=player,
+                transmissionRange=options.get("transmissionRange", 200),
+                parent_base_id=options.get("parent_base_id", -1)
+            )
+
+        if unit_type == "RetransmiterUAV":
+            used_freqs = options.get("usedFrequencies", [5600])
+            if isinstance(used_freqs, str):
+                used_freqs = [float(s.strip()) for s in used_freqs.split(",") if s.strip()]
+
+            ruav = UAVUnits.RetransmiterUAV(
+                name=options.get("name", f"RT-UAV-admin-{len(self.units)}"),
+                chanceToHit=0,
+                baseSpeed=options.get("baseSpeed", 15),
+                state=UAVUnits.UnitState[options.get("state", "Landed")],
+                position=(x, y),
+                image="static/ICONS/ROTOR ALLY.png" if ally else "static/ICONS/ROTOR ENEMY.png",
+                armourType=UAVUnits.ArmourType.Unarmored,
+                player=player,
+                currentWeight=1.7,
+                idleBatteryDrainPerTick=0.0083,
+                moveBatteryDrainPerTick=0.0138,
+                transmissionRange=options.get("transmissionRange", 200.0),
+                usedFrequencies=used_freqs,
+                store=self.store
+            )
+            ruav.is_retransmitting = bool(options.get("retransmitting", False))
+            return ruav
+
+        if unit_type == "ElectronicWarfare":
+            # default jammingRange and frequencies — adjust as you like
+            jamming_range = int(options.get("jammingRange", 200))
+            jamming_freq = options.get("jammingFreq", [2400, 5800])
+            if isinstance(jamming_freq, str):
+                # parse comma-separated string just in case
+                jamming_freq = [float(s.strip()) for s in jamming_freq.split(",") if s.strip()]
+
+            return LogHub.ElectronicWarfare(
+                name=options.get("name", f"EW-admin-{len(self.ewarUnits)}"),
+                position=(x, y),
+                image="static/ICONS/ELECTRONIC WARFARE ALLY.png" if ally else "static/ICONS/ELECTRONIC WARFARE ENEMY.png",
+                player=player,
+                jammingRange=jamming_range,
+                jammingFreq=jamming_freq
+            )
+
+        if unit_type == "Tank":
+            return GroundUnits.Tank(
+                name=options.get("name", f"T-{len(self.units)}"),
+                state=UAVUnits.UnitState.Idle,
+                position=(x, y),
+                image="static/ICONS/TANK ALLY.png" if ally else "static/ICONS/TANK ENEMY.png",
+                player=player,
+                max_fuel=options.get("max_fuel", 300),
+                store=self.store
+            )
+
+        return None
+
+    def load_scenario(self, scenario: dict):
+        """
+        Spawn everything listed in a scenario dict:
+          {"entities": [{"type": "LogHub", "player": 1, "x": 100, "y": 100,
+                         "tag": "hq1", "storage": {"AAMunition": 20}}, ...]}
+        Optional per-entity orders: "move_to": [x, y] or a list of waypoints,
+        "attack": <tag of another entity>.
+        Optional "terrain": path of a TerrainRaster .npy for the map,
+        "roads": path of a GeoJSON road network (RoadNetwork).
+        Returns {tag: entity} for the tagged entries.
+        """
+        if scenario.get("terrain"):
+            self.terrain = TerrainRaster.TerrainRaster(scenario["terrain"])
+        if scenario.get("roads"):
+            self.roads = RoadNetwork.RoadNetwork.load(scenario["roads"])
+        tagged = {}
+        orders = []
+        for spec in scenario.get("entities", []):
+            opts = {k: v for k, v in spec.items() if k not in ("type", "player", "x", "y")}
+            obj = self.make_entity(spec["type"], int(spec.get("player", 1)), float(spec["x"]), float(spec["y"]), opts)
+            if obj is None:
+                raise ValueError(f"unknown entity type in scenario: {spec['type']}")
+            self.spawn(obj)
+            if "tag" in spec:
+                tagged[spec["tag"]] = obj
+            orders.append((obj, spec))
+
+        for obj, spec in orders:
+            route = spec.get("move_to")
+            if route:
+                if not isinstance(route[0], (list, tuple)):
+                    route = [route]
+                self.route_unit(obj, route[0])
+                for p in route[1:]:
+                    self.route_unit(obj, p, clear_queue=False)
+            if "attack" in spec:
+                self.pending_attacks[obj.id] = tagged[spec["attack"]].id
+        return tagged
+
+    # -------------------------------------------------------------- queries
+
+    def rebuild_spatial_index(self, dt: float):
+        # units keep moving after the rebuild, so widen searches by one tick of travel
+        slack = max((u.baseSpeed for u in self.units), default=0) * dt
+        self.index.rebuild(self.units, self.aaUnits, self.logBases, self.ground_retransmitters, self.ewarUnits,
+                           slack=slack, relayCheck=is_active_air_relay)
+
+    def is_uav_in_comm(self, uav):
+        """
+        Return True if UAV currently has comm (i.e. able to receive commands).
+        Looked up in the comm graph, which is rebuilt once per tick: jammers block
+        the UAV's frequencies, and bases / ground retransmitters / active
+        RetransmiterUAVs only count when they are linked back to a LogHub.
+        """
+        return self.comm.is_in_comm(uav)
+
+    def find_nearest_loghub_with_supply(self,
+                                        player: int,
+                                        supply_type: LogHub.SupplyType,
+                                        x: float,
+                                        y: float):
+        def usable(b):
+            if b.player != player:
+                return False
+
+            storage = getattr(b, "inStorage", {}) or {}
+            if storage.get(supply_type, 0) <= 0:
+                return False
+
+            # NEW: also require free ground supply truck slot
+            current_trucks = getattr(b, "current_supply_trucks", 0)
+            max_trucks = getattr(b, "max_supply_trucks", 2)
+            if current_trucks >= max_trucks:
+                # hub is busy – skip it
+                return False
+            return True
+
+        nearest = self.index.logBases.k_nearest(x, y, k=1, predicate=usable)
+        return nearest[0] if nearest else None
+
+    def spawn_supply_vehicle(self,
+                             from_base: LogHub.LogHub,
+                             target_unit,
+                             supply_type: LogHub.SupplyType,
+                             amount: int):
+        # 1) check truck quota first
+        if getattr(from_base, "current_supply_trucks", 0) >= getattr(from_base, "max_supply_trucks", 2):
+            # hub is “busy” – don’t spawn another truck
+            return None
+
+        # 2) check storage
+        available = from_base.inStorage.get(supply_type, 0)
+        if available <= 0:
+            return None
+        amount = min(amount, available)
+
+        # reserve supply right away
+        from_base.inStorage[supply_type] = available - amount
+
+        # --- NEW: fuel for the truck ---
+        fuel_available = from_base.inStorage.get(LogHub.SupplyType.Fuel, 0)
+        taken_fuel = min(TRUCK_MAX_FUEL, fuel_available)
+        if taken_fuel > 0:
+            from_base.inStorage[LogHub.SupplyType.Fuel] = fuel_available - taken_fuel
+
+        # choose icon
+        if from_base.player == 1:
+            image = "static/ICONS/LOGISTYKA ALLY.png"
+        else:
+            image = "static/ICONS/LOGISTYKA ENEMY.png"
+
+        veh = GroundUnits.SupplyVehicle(
+            name=f"SUP-{from_base.id}",
+            chanceToHit=0,
+            baseSpeed=5,
+            state=UAVUnits.UnitState.Idle,
+            position=(from_base.positionX, from_base.positionY),
+            image=image,
+            armourType=UAVUnits.ArmourType.Unarmored,
+            player=from_base.player,
+            cargoType=supply_type,
+            cargoAmmount=amount,
+            target_unit_id=getattr(target_unit, "id"),
+            home_base_id=from_base.id,
+            max_fuel=taken_fuel,
+            fuel_consumption_per_tick=TRUCK_FUEL_PER_TICK,
+            store=self.store
+        )
+        # routing may hand the planner thread a ticket with our id
+        self.assign_id(veh)
+
+        # send it to the unit
+        self.route_unit(veh, (target_unit.positionX, target_unit.positionY))
+
+        # put to world
+        self.spawn(veh)
+
+        # 3) mark that this hub now has one more active truck
+        from_base.current_supply_trucks += 1
+        self.touch(from_base)
+
+        self.record("supply_dispatched", id=veh.id, base=from_base.id, target=veh.target_unit_id,
+                    player=veh.player, amount=amount)
+        return veh
+
+    # ------------------------------------------------------------------ tick
+
+    def tick(self, dt: float):
+        self.tick_count += 1
+        self.time += dt
+
+        self.rebuild_spatial_index(dt)
+        if self.jamming.dirty:
+            self.jamming.rebuild(self.ewarUnits)
+        self.comm.rebuild(self.index, self.units, self.logBases, self.jamming)
+
+        # UAVs without comm drop their orders before everyone moves
+        idle = UAVUnits.UnitState.Idle
+        for u in self.units:
+            if isinstance(u, UAVUnits.UAV):
+                # (already dropped ones are left alone, so they don't show up as changed every tick)
+                if (u.destination is not None or u.state != idle) and not self.is_uav_in_comm(u):
+                    u.destination = None
+                    u.state = idle
+
+        # one batched movement / fuel / battery step for every unit
+        planner = self.path_planner()
+        if planner is not None and planner.background:
+            self._apply_routes(planner)
+        self.store.step(dt, terrain=self.terrain, flows=planner.flows if planner is not None else None)
+
+        # AAs with nothing scheduled: Idle ones look for a target, empty ones ask for ammo
+        for aa in list(self.awakeAA.values()):
+            if aa.ammoCount <= 0:
+                if aa.AAstate != AntiAirUnits.AAStatus.OutOfAmmo or aa.target is not None:
+                    aa.AAstate = AntiAirUnits.AAStatus.OutOfAmmo
+                    aa.target = None
+                    self.touch(aa)
+                self._request_ammo(aa)
+                continue
+            due = aa.acquire(self.units, self.index.units, self.time)
+            if due is not None:
+                del self.awakeAA[aa.id]
+                self.timers.schedule(aa, due)
+                self.aiming.add(aa)
+
+        # only entities whose wake-up time has come get touched below
+        due_trucks = []
+        for obj in self.timers.pop_due(self.time):
+            if isinstance(obj, AntiAirUnits.AntiAir):
+                self._wake_aa(obj)
+            else:
+                due_trucks.append(obj)
+
+        before_uav = len(self.units)
+        before_aa = len(self.aaUnits)
+
+        self._tick_attacks()
+        self._tick_supply_vehicles(due_trucks)
+        self._resend_destroyed_supply()
+
+        self.units = self.prune_destroyed(self.units)
+        self.aaUnits = self.prune_destroyed(self.aaUnits)
+
+        if self.verbose and (len(self.units) != before_uav or len(self.aaUnits) != before_aa):
+            print(f"[SERVER] Destroyed units removed: "
+                  f"{before_uav - len(self.units)} UAVs, {before_aa - len(self.aaUnits)} AA units.")
+
+    def _wake_aa(self, aa):
+        self.touch(aa)
+        ammo_before = aa.ammoCount
+        due = aa.on_timer(self.time, self.rng["aa"])
+        if aa.ammoCount < ammo_before:
+            self.record("aa_shot", id=aa.id, player=aa.player, shots=ammo_before - aa.ammoCount)
+        if due is not None:
+            self.timers.schedule(aa, due)
+            return
+        self.awakeAA[aa.id] = aa
+        if aa.ammoCount <= 0:
+            self._request_ammo(aa)
+
+    def _request_ammo(self, aa):
+        if aa.supplyRequested:
+            return
+        # try to find a base with AA ammo
+        base = self.find_nearest_loghub_with_supply(
+            aa.player,
+            aa.ammoType,
+            aa.positionX,
+            aa.positionY
+        )
+        if base is not None:
+            self.spawn_supply_vehicle(base, aa, aa.ammoType, amount=5)  # amount to deliver
+            aa.supplyRequested = True
+
+    def _schedule_truck(self, u):
+        # wake the truck when it should be within delivery radius of where it's driving
+        dest = u.destination
+        speed = u.baseSpeed
+        if dest is None or u.state != UAVUnits.UnitState.Moving or speed <= 0:
+            # parked (out of fuel, or the target moved off its destination) -> look again later
+            self.timers.schedule(u, self.time + TRUCK_RECHECK)
+            return
+        self.timers.schedule(u, self.time + self._truck_eta(u, speed))
+
+    def _truck_eta(self, u, speed: float) -> float:
+        # time to drive the rest of the route (destination, then move_queue) up to DELIVERY_RADIUS
+        # short of its end, at the speed the terrain under each stretch allows
+        points = [(u.positionX, u.positionY), u.destination] + list(u.move_queue)
+        legs = [math.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(points, points[1:])]
+        if self.terrain is None:
+            return max(sum(legs) - DELIVERY_RADIUS, 0.0) / speed
+        legs[-1] = max(legs[-1] - DELIVERY_RADIUS, 0.0)
+        step = self.terrain.cellSize
+        eta = 0.0
+        for (a, b), length in zip(zip(points, points[1:]), legs):
+            if length <= 0:
+                continue
+            n = min(max(int(math.ceil(length / step)), 1), TRUCK_ETA_SAMPLES)
+            # middle of each piece, along the (possibly shortened) leg
+            f = (np.arange(n) + 0.5) / n * length / math.hypot(b[0] - a[0], b[1] - a[1])
+            mult = self.terrain.speed_multipliers(a[0] + (b[0] - a[0]) * f, a[1] + (b[1] - a[1]) * f, True)
+            eta += float((length / n / mult).sum())
+        return eta / speed
+
+    def _send_truck_home(self, u):
+        home = self.get_base(u.home_base_id)
+        if home:
+            if self.roads is not None:
+                self.route_unit(u, (home.positionX, home.positionY))
+            else:
+                # every truck of a hub drives home to the same spot -> one shared flow field
+                self.route_group([u], (home.positionX, home.positionY))
+            u.phase = "to_base"
+            self._schedule_truck(u)
+        else:
+            # no home, just despawn
+            self.despawn(u)
+
+    def _tick_attacks(self):
+        pending_attacks = self.pending_attacks
+        for attacker_id in list(pending_attacks.keys()):
+            target_id = pending_attacks[attacker_id]
+
+            # find attacker + target again (they may have moved or died)
+            attacker = self.registry.get_unit(attacker_id)
+            target = self.registry.get_unit(target_id)
+
+            # if attacker or target is gone/destroyed -> drop order
+            if attacker is None or attacker.state == UAVUnits.UnitState.Destroyed \
+               or target is None or target.state == UAVUnits.UnitState.Destroyed:
+                pending_attacks.pop(attacker_id, None)
+                continue
+
+            # compute distance
+            dx = target.positionX - attacker.positionX
+            dy = target.positionY - attacker.positionY
+            dist = math.hypot(dx, dy)
+
+            if dist <= ATTACK_RANGE:
+                # in range -> perform attack
+                attacker.attack(target, self.rng["strike"])
+                self.record("strike", id=attacker.id, player=attacker.player, target=target.id,
+                            kill=target.state == UAVUnits.UnitState.Destroyed)
+                # remove order (LM will likely destroy itself too)
+                pending_attacks.pop(attacker_id, None)
+            else:
+                # not in range -> keep chasing
+                # we order the LM to move toward the *current* target position
+                attacker.move_unit((target.positionX, target.positionY))
+
+    def _tick_supply_vehicles(self, trucks):
+        # trucks whose ETA came up this tick (or whose target / home just disappeared)
+        for u in trucks:
+            if u.phase == "to_target":
+                # find the target (trucks only ever supply units)
+                target = self.registry.get_unit(u.target_unit_id)
+                if target is None:
+                    # target gone -> go back
+                    self._send_truck_home(u)
+                    continue
+
+                # are we close enough to deliver?
+                dx = target.positionX - u.positionX
+                dy = target.positionY - u.positionY
+                if math.hypot(dx, dy) >= DELIVERY_RADIUS:
+                    self._schedule_truck(u)
+                    continue
+
+                if hasattr(target, "ammoCount") and hasattr(target, "ammoType"):
+                    if target.ammoType == u.cargoType:
+                        target.ammoCount += u.cargoAmmount
+                        self.touch(target)
+                        self.record("supply_delivered", id=u.id, target=target.id,
+                                    player=u.player, amount=u.cargoAmmount)
+
+                        # allow unit to request again in the future
+                        target.supplyRequested = False
+
+                        # if this was an AA unit – wake it up
+                        if hasattr(target, "AAstate"):
+                            target.AAstate = AntiAirUnits.AAStatus.Idle
+                            # also drop any old target / pending shot so it can pick a new one cleanly
+                            target.target = None
+                            self.timers.cancel(target)
+                            self.awakeAA[target.id] = target
+
+                # after delivering -> go home
+                self._send_truck_home(u)
+
+            elif u.phase == "to_base":
+                home = self.get_base(u.home_base_id)
+                if home is None:
+                    self.despawn(u)
+                    continue
+
+                dx = home.positionX - u.positionX
+                dy = home.positionY - u.positionY
+                if math.hypot(dx, dy) >= DELIVERY_RADIUS:
+                    self._schedule_truck(u)
+                    continue
+
+                # NEW: return remaining fuel to hub
+                remaining_fuel = getattr(u, "currentFuel", 0)
+                if remaining_fuel > 0:
+                    if getattr(home, "inStorage", None) is None:
+                        home.inStorage = {}
+                    home.inStorage[LogHub.SupplyType.Fuel] = home.inStorage.get(LogHub.SupplyType.Fuel, 0) + remaining_fuel
+
+                # arrived -> free the truck slot on that hub
+                if hasattr(home, "current_supply_trucks"):
+                    home.current_supply_trucks = max(0, home.current_supply_trucks - 1)
+                self.touch(home)
+
+                # truck is done
+                self.despawn(u)
+
+    def _resend_destroyed_supply(self):
+        # --- handle destroyed supply trucks (resend request) ---
+        for u in list(self.supplyVehicles.values()):
+            if u.state == UAVUnits.UnitState.Destroyed:
+                # find the unit/structure it was supposed to supply
+                target = self.registry.get_unit(u.target_unit_id)
+
+                if target is not None:
+                    # allow it to ask again
+                    target.supplyRequested = False
+
+                    # figure out what it needed
+                    needed_type = None
+                    still_needs = False
+                    if hasattr(target, "ammoCount") and hasattr(target, "ammoType"):
+                        if target.ammoCount <= 0:
+                            needed_type = target.ammoType
+                            still_needs = True
+
+                    if still_needs and needed_type is not None:
+                        # try to send a new truck from ANY hub that has supply AND free trucks
+                        base = self.find_nearest_loghub_with_supply(
+                            target.player,
+                            needed_type,
+                            target.positionX,
+                            target.positionY
+                        )
+                        if base is not None:
+                            spawned = self.spawn_supply_vehicle(base, target, needed_type, amount=5)
+                            if spawned is not None:
+                                # mark that the target is being supplied again
+                                target.supplyRequested = True
+                # IMPORTANT: we do NOT give the truck slot back to the original hub here,
+                # because the truck was destroyed
+
+    # --------------------------------------------------------------- summary
+
+    def alive_counts(self) -> dict:
+        counts = {}
+        for obj in self.units + self.aaUnits + self.logBases + self.ground_retransmitters + self.ewarUnits:
+            per_player = counts.setdefault(obj.player, Counter())
+            per_player[obj.__class__.__name__] += 1
+        return {p: dict(c) for p, c in counts.items()}
+
+    def summary(self) -> dict:
+        return {
+            "tick": self.tick_count,
+            "time": round(self.time, 3),
+            "alive": self.alive_counts(),
+            "stats": dict(self.stats),
+            "entities": [
+                {
+                    "id": obj.id,
+                    "unit_class": obj.__class__.__name__,
+                    "player": obj.player,
+                    "x": round(obj.positionX, 2),
+                    "y": round(obj.positionY, 2),
+                    "state": obj.state.name if hasattr(obj, "state") else None,
+                }
+                for obj in self.units + self.aaUnits + self.logBases + self.ground_retransmitters + self.ewarUnits
+            ],
+        }
@@ -1,8 +1,14 @@
 # GroundUnits.py
 import UAVUnits
 from LogHub import SupplyType
+from MovementEngine import column
 
 class GroundUnit(UAVUnits.Unit):
+    __slots__ = ("maxFuel",)
+
+    currentFuel = column("fuel")
+    fuelConsumptionPerTick = column("fuelPerTick")
+
     def __init__(self,
                  name: str,
                  chanceToHit: int,
@@ -13,27 +19,34 @@ class GroundUnit(UAVUnits.Unit):
                  armourType: UAVUnits.ArmourType,
                  player: int,
                  max_fuel: float = 0.0,
-                 fuel_consumption_per_tick: float = 0.0):
-        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player)
+                 fuel_consumption_per_tick: float = 0.0,
+                 *,
+                 store):
+        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, store=store)
         # fuel-related
         self.maxFuel = max_fuel
         self.currentFuel = max_fuel
         self.fuelConsumptionPerTick = fuel_consumption_per_tick
+        # fuel gate for movement is applied by MovementStore.step
+        self._store.usesFuel[self._slot] = True
 
-    def tick_unit(self, dt: float):
-        # fuel gate for movement
-        if self.state == UAVUnits.UnitState.Moving:
-            if self.currentFuel <= 0:
-                self.state = UAVUnits.UnitState.Idle
-                return
-            self.currentFuel -= self.fuelConsumptionPerTick
-            if self.currentFuel < 0:
-                self.currentFuel = 0
-        # normal movement
-        super().tick_unit(dt)
+
+# SupplyVehicle.phase values, kept as a small int code
+SUPPLY_PHASES = ("to_target", "to_base")
+_PHASE_CODES = {p: i for i, p in enumerate(SUPPLY_PHASES)}
 
 
 class SupplyVehicle(GroundUnit):
+    __slots__ = ("cargoType", "cargoAmmount", "target_unit_id", "home_base_id", "_phase")
+
+    @property
+    def phase(self) -> str:
+        return SUPPLY_PHASES[self._phase]
+
+    @phase.setter
+    def phase(self, value: str):
+        self._phase = _PHASE_CODES[value]
+
     def __init__(self,
                  name: str,
                  chanceToHit: int,
@@ -48,10 +61,13 @@ class SupplyVehicle(GroundUnit):
                  target_unit_id: int,
                  home_base_id: int,
                  max_fuel: float = 0.0,
-                 fuel_consumption_per_tick: float = 0.0):
+                 fuel_consumption_per_tick: float = 0.0,
+                 *,
+                 store):
         super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player,
                          max_fuel=max_fuel,
-                         fuel_consumption_per_tick=fuel_consumption_per_tick)
+                         fuel_consumption_per_tick=fuel_consumption_per_tick,
+                         store=store)
         self.cargoType = cargoType
         self.cargoAmmount = cargoAmmount
         self.target_unit_id = target_unit_id   # where to deliver
@@ -60,6 +76,8 @@ class SupplyVehicle(GroundUnit):
 
 
 class CombatVehicle(GroundUnit):
+    __slots__ = ("shootingRange", "ammoType", "ammoCount")
+
     def __init__(self,
                  name: str,
                  chanceToHit: int,
@@ -73,10 +91,13 @@ class CombatVehicle(GroundUnit):
                  ammo_type: SupplyType,
                  ammo_count: int,
                  max_fuel: float = 0.0,
-                 fuel_consumption_per_tick: float = 0.0):
+                 fuel_consumption_per_tick: float = 0.0,
+                 *,
+                 store):
         super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player,
                          max_fuel=max_fuel,
-                         fuel_consumption_per_tick=fuel_consumption_per_tick)
+                         fuel_consumption_per_tick=fuel_consumption_per_tick,
+                         store=store)
         # NEW combat stuff
         self.shootingRange = shooting_range
         self.ammoType = ammo_type
@@ -103,13 +124,17 @@ class CombatVehicle(GroundUnit):
 
 
 class Tank(CombatVehicle):
+    __slots__ = ()
+
     def __init__(self,
                  name: str,
                  state: UAVUnits.UnitState,
                  position: (int, int),
                  image: str,
                  player: int,
-                 max_fuel: float):
+                 max_fuel: float,
+                 *,
+                 store):
         # sensible defaults for a tank
         super().__init__(
             name=name,
@@ -124,5 +149,6 @@ class Tank(CombatVehicle):
             ammo_type=SupplyType.TanksShells,
             ammo_count=20,
             max_fuel=max_fuel,
-            fuel_consumption_per_tick=0.08
+            fuel_consumption_per_tick=0.08,
+            store=store
         )
@@ -0,0 +1,66 @@
+import argparse
+import json
+import time
+
+import GameWorld
+
+MAP_WIDTH = 1024
+MAP_HEIGHT = 1024
+
+
+def load_scenario_file(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run_headless(scenario: dict, seconds: float, tick_rate: float = 10.0, verbose: bool = False,
+                 max_events: int = 10000, stop_when=None, seed=None):
+    """
+    Run a scenario for `seconds` of simulated time as fast as the CPU allows:
+    same GameWorld.tick as the server, but no scheduler, no sleeps, no Flask.
+    `seed` fixes every random draw (GameWorld.rng), so a seed replays bit-exactly.
+    stop_when(world, tagged) is checked after every tick and ends the run early
+    when it returns True. Returns (world, result) where result holds the final
+    summary and timings.
+    """
+    world = GameWorld.GameWorld(scenario.get("width", MAP_WIDTH), scenario.get("height", MAP_HEIGHT),
+                                max_events, seed=seed)
+    world.verbose = verbose
+    tagged = world.load_scenario(scenario)
+
+    dt = 1.0 / tick_rate
+    ticks = int(round(seconds * tick_rate))
+
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        world.tick(dt)
+        if stop_when is not None and stop_when(world, tagged):
+            break
+    wall = time.perf_counter() - t0
+
+    result = world.summary()
+    result["seed"] = world.seed
+    result["wall_time"] = round(wall, 4)
+    result["speedup"] = round(world.time / wall, 1) if wall > 0 else None
+    return world, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a W.A.T scenario headless, faster than real time.")
+    parser.add_argument("scenario", help="path to a scenario JSON file")
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated seconds to run")
+    parser.add_argument("--tick-rate", type=float, default=10.0, help="simulation ticks per simulated second")
+    parser.add_argument("--seed", type=int, default=None, help="RNG seed (default: fresh entropy, printed)")
+    parser.add_argument("--verbose", action="store_true", help="keep the per-tick server prints")
+    parser.add_argument("--no-entities", action="store_true", help="leave the entity list out of the output")
+    args = parser.parse_args()
+
+    _, result = run_headless(load_scenario_file(args.scenario), args.seconds, args.tick_rate, args.verbose,
+                             seed=args.seed)
+    if args.no_entities:
+        result.pop("entities", None)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
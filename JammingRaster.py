@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+
+class JammingRaster:
+    """
+    Per-frequency coverage grid of all active jammers.
+    Jammers are static, so the grid is only rebuilt after an ElectronicWarfare
+    unit is spawned or destroyed (mark_dirty()); checking a UAV is then one
+    array lookup at its cell. A cell counts as jammed when its centre is
+    inside a jammer's range, so edges are accurate to about half a cell.
+    """
+
+    def __init__(self, width: int, height: int, cellSize: int = 4):
+        self.width = width
+        self.height = height
+        self.cellSize = cellSize
+        self.cols = int(math.ceil(width / cellSize))
+        self.rows = int(math.ceil(height / cellSize))
+        self.layers: dict = {}      # freq -> bool[rows, cols]
+        self.jammers: list = []
+        self.dirty = True
+        self.version = 0
+
+        # cell centre coordinates, reused for every jammer
+        self._centresX = (np.arange(self.cols) + 0.5) * cellSize
+        self._centresY = (np.arange(self.rows) + 0.5) * cellSize
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def rebuild(self, ewarUnits):
+        self.layers = {}
+        self.jammers = [j for j in ewarUnits if getattr(j, "is_active", True) is not False]
+        cs = self.cellSize
+        for jammer in self.jammers:
+            r = jammer.jammingRange
+            jx, jy = jammer.positionX, jammer.positionY
+            # only touch the cells under the jammer's bounding box
+            c0 = max(int((jx - r) // cs), 0)
+            c1 = min(int((jx + r) // cs) + 1, self.cols)
+            r0 = max(int((jy - r) // cs), 0)
+            r1 = min(int((jy + r) // cs) + 1, self.rows)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            dx = self._centresX[c0:c1] - jx
+            dy = self._centresY[r0:r1] - jy
+            disc = (dy[:, None] ** 2 + dx[None, :] ** 2) <= r * r
+            for f in getattr(jammer, "jammingFreq", []) or []:
+                layer = self.layers.get(f)
+                if layer is None:
+                    layer = np.zeros((self.rows, self.cols), dtype=bool)
+                    self.layers[f] = layer
+                layer[r0:r1, c0:c1] |= disc
+        self.dirty = False
+        self.version += 1
+
+    def _exact(self, x: float, y: float, freq) -> bool:
+        # positions off the raster fall back to the plain distance test
+        for jammer in self.jammers:
+            if freq in (getattr(jammer, "jammingFreq", []) or []):
+                if math.hypot(x - jammer.positionX, y - jammer.positionY) <= jammer.jammingRange:
+                    return True
+        return False
+
+    def jammed_ids(self, uavs, store) -> set:
+        """Ids of every UAV in `uavs` (views into `store`) sitting in a jammed cell of one of its frequencies."""
+        if not self.layers:
+            return set()
+
+        # group UAV slots by frequency, then one vectorized lookup per frequency
+        byFreq: dict = {}
+        for u in uavs:
+            for f in getattr(u, "usedFrequencies", []) or []:
+                if f in self.layers:
+                    byFreq.setdefault(f, []).append(u)
+
+        jammed = set()
+        for f, group in byFreq.items():
+            slots = np.fromiter((u._slot for u in group), dtype=np.intp, count=len(group))
+            xs = store.posX[slots]
+            ys = store.posY[slots]
+            cols = np.floor(xs / self.cellSize).astype(np.intp)
+            rows = np.floor(ys / self.cellSize).astype(np.intp)
+            inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+
+            hit = np.zeros(len(group), dtype=bool)
+            hit[inside] = self.layers[f][rows[inside], cols[inside]]
+            for i in np.flatnonzero(hit).tolist():
+                jammed.add(group[i].id)
+            for i in np.flatnonzero(~inside).tolist():
+                if self._exact(float(xs[i]), float(ys[i]), f):
+                    jammed.add(group[i].id)
+        return jammed
@@ -14,11 +14,10 @@ class SupplyType(Enum):
     TanksShells = 11
 
 class GroundStructure:
-    nextId = 0
+    __slots__ = ("id", "name", "positionX", "positionY", "image", "player")
 
     def __init__(self, name: str, position: (int,int), image: str, player: int):
-        self.id = 10000 + GroundStructure.nextId
-        GroundStructure.nextId += 1
+        self.id = None      # handed out by GameWorld.spawn (10000 and up)
         self.name = name
         self.positionX = position[0]
         self.positionY = position[1]
@@ -26,6 +25,9 @@ class GroundStructure:
         self.player = player
 
 class LogHub(GroundStructure):
+    __slots__ = ("transmissionRange", "available_retransmitters", "max_deployed_uavs", "current_spawned_uavs",
+                 "viewRange", "max_air_retransmitters", "current_air_retransmitters", "inStorage",
+                 "max_supply_trucks", "current_supply_trucks")
 
     def __init__(self, name: str, position: (int,int), image: str, player: int,
                  transmissionRange: int,
@@ -51,6 +53,7 @@ class LogHub(GroundStructure):
 
 
 class GroundRetransmitter(GroundStructure):
+    __slots__ = ("transmissionRange", "parent_base_id")
 
     def __init__(self, name: str, position: (int,int), image: str, player: int, transmissionRange: int, parent_base_id: int):
         super().__init__(name, position, image, player)
@@ -58,6 +61,7 @@ class GroundRetransmitter(GroundStructure):
         self.parent_base_id = parent_base_id
 
 class ElectronicWarfare(GroundStructure):
+    __slots__ = ("jammingRange", "jammingFreq")
 
     def __init__(self, name: str, position: (int,int), image: str, player: int, jammingRange: int, jammingFreq: list):
         super().__init__(name, position, image, player)
@@ -0,0 +1,64 @@
+import argparse
+import gc
+import sys
+import tracemalloc
+
+import GameWorld, MovementEngine
+
+# (entity type, options) built through the same factory as admin spawns / scenarios
+ENTITY_TYPES = [
+    ("LoiteringMunition", {}),
+    ("RetransmiterUAV", {}),
+    ("AntiAir", {}),
+    ("Tank", {}),
+    ("LogHub", {"storage": {"AAMunition": 10, "Fuel": 100}}),
+    ("GroundRetransmitter", {}),
+    ("ElectronicWarfare", {}),
+]
+
+
+def store_bytes_per_slot() -> int:
+    store = MovementEngine.MovementStore(capacity=1)
+    names = store.FLOAT_COLUMNS + store.BOOL_COLUMNS + ("state", "dirty", "requeued", "ids")
+    return sum(getattr(store, n).itemsize for n in names)
+
+
+def measure(unit_type: str, options: dict, count: int) -> dict:
+    """Bytes per entity as seen by tracemalloc: the object, its attribute values and containers."""
+    world = GameWorld.GameWorld()
+    # grow the movement store up front so its arrays don't count as per-entity memory
+    while world.store.capacity < count:
+        world.store._grow()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [world.make_entity(unit_type, 1, float(i % 1000), float(i // 1000), dict(options))
+            for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    sample = objs[0]
+    return {
+        "type": unit_type,
+        "class": type(sample).__name__,
+        "bytes_per_entity": round((after - before) / count, 1),
+        "object_size": sys.getsizeof(sample),
+        "has_dict": hasattr(sample, "__dict__"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-entity memory footprint of the W.A.T entity classes.")
+    parser.add_argument("--count", type=int, default=20000, help="entities built per type")
+    args = parser.parse_args()
+
+    print(f"{'type':<22}{'bytes/entity':>14}{'getsizeof':>11}{'__dict__':>10}")
+    for unit_type, options in ENTITY_TYPES:
+        r = measure(unit_type, options, args.count)
+        print(f"{r['type']:<22}{r['bytes_per_entity']:>14}{r['object_size']:>11}{str(r['has_dict']):>10}")
+    print(f"\nmovement store: {store_bytes_per_slot()} bytes per unit slot (numpy columns, not included above)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import UAVUnits, GroundUnits
+import Headless
+
+# UAVs always start on a full battery (UAV.__init__)
+FULL_BATTERY = 100.0
+
+
+def _combat_alive(world, player):
+    # supply trucks don't count as a fighting force
+    for u in world.units + world.aaUnits:
+        if u.player == player and not isinstance(u, GroundUnits.SupplyVehicle):
+            return True
+    return False
+
+
+def victory_check(scenario: dict):
+    """
+    Build a stop_when(world, tagged) for run_headless that remembers the winner.
+    With scenario["objectives"] = {"1": ["tank2", "aa2"], ...} a player wins once
+    every tagged entity on its list is gone; otherwise a player wins when the
+    other side has no combat units left.
+    """
+    objectives = {int(p): list(tags) for p, tags in (scenario.get("objectives") or {}).items()}
+    players = sorted({int(e.get("player", 1)) for e in scenario.get("entities", [])})
+    outcome = {"winner": 0, "time": None}
+
+    def stop_when(world, tagged):
+        for p in players:
+            if p in objectives:
+                done = all(world.registry.get(tagged[t].id) is not tagged[t] for t in objectives[p])
+            else:
+                enemies = [q for q in players if q != p]
+                done = bool(enemies) and _combat_alive(world, p) and \
+                    not any(_combat_alive(world, q) for q in enemies)
+            if done:
+                outcome["winner"] = p
+                outcome["time"] = world.time
+                return True
+        return False
+
+    return players, outcome, stop_when
+
+
+def run_replica(job):
+    """One seeded run in a worker process; returns a flat dict of per-replica metrics."""
+    scenario, seconds, tick_rate, seed = job
+
+    players, outcome, stop_when = victory_check(scenario)
+    world, result = Headless.run_headless(scenario, seconds, tick_rate, max_events=None,
+                                          stop_when=stop_when, seed=seed)
+
+    row = {
+        "seed": seed,
+        "winner": outcome["winner"],
+        "time_to_kill": outcome["time"] if outcome["time"] is not None else math.nan,
+        "end_time": world.time,
+        "ticks": world.tick_count,
+        "wall_time": result["wall_time"],
+    }
+    for p in players:
+        row[f"losses_p{p}"] = 0
+        row[f"ammo_used_p{p}"] = 0
+        row[f"battery_used_p{p}"] = 0.0
+        row[f"strikes_p{p}"] = 0
+        row[f"kills_p{p}"] = 0
+
+    for ev in world.events:
+        p = ev.get("player")
+        if p not in players:
+            continue
+        kind = ev["type"]
+        if kind == "destroyed":
+            row[f"losses_p{p}"] += 1
+            if ev.get("battery") is not None:
+                row[f"battery_used_p{p}"] += FULL_BATTERY - ev["battery"]
+        elif kind == "aa_shot":
+            row[f"ammo_used_p{p}"] += ev["shots"]
+        elif kind == "strike":
+            row[f"strikes_p{p}"] += 1
+            row[f"kills_p{p}"] += int(ev["kill"])
+
+    # UAVs still flying at the end
+    for u in world.units:
+        if isinstance(u, UAVUnits.UAV) and u.player in players:
+            row[f"battery_used_p{u.player}"] += FULL_BATTERY - u.currentBattery
+    return row
+
+
+def replica_seeds(seed: int, n: int):
+    # independent child seeds for every replica; each world splits its own seed
+    # into per-subsystem streams again, so workers never share a stream
+    children = np.random.SeedSequence(seed).spawn(n)
+    return [int(c.generate_state(1, dtype=np.uint64)[0]) for c in children]
+
+
+def mean_ci(values, z: float = 1.96) -> dict:
+    """Mean with a normal-approximation confidence interval (NaNs ignored)."""
+    a = np.asarray(values, dtype=float)
+    a = a[~np.isnan(a)]
+    n = len(a)
+    if n == 0:
+        return {"n": 0, "mean": None, "ci_low": None, "ci_high": None, "std": None}
+    mean = float(a.mean())
+    std = float(a.std(ddof=1)) if n > 1 else 0.0
+    half = z * std / math.sqrt(n) if n > 1 else 0.0
+    return {"n": n, "mean": round(mean, 4), "ci_low": round(mean - half, 4),
+            "ci_high": round(mean + half, 4), "std": round(std, 4)}
+
+
+def wilson_ci(successes: int, n: int, z: float = 1.96) -> dict:
+    """Win rate with a Wilson score interval (behaves at 0% / 100% unlike the normal one)."""
+    if n == 0:
+        return {"rate": None, "ci_low": None, "ci_high": None}
+    p = successes / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return {"rate": round(p, 4), "ci_low": round(max(0.0, centre - half), 4),
+            "ci_high": round(min(1.0, centre + half), 4)}
+
+
+def to_columns(rows) -> dict:
+    keys = list(rows[0].keys()) if rows else []
+    # seeds are full uint64s; left to guess, numpy makes mixed big/small ones float64 and rounds them
+    return {k: np.array([r[k] for r in rows], dtype=np.uint64 if k == "seed" else None) for k in keys}
+
+
+def aggregate(columns: dict, players) -> dict:
+    n = len(columns.get("seed", []))
+    winners = columns["winner"]
+    summary = {"replicas": n, "win_rate": {}, "losses": {}, "ammo_used": {}, "battery_used": {}, "time_to_kill": {}}
+
+    for p in list(players) + [0]:
+        key = f"p{p}" if p else "draw"
+        summary["win_rate"][key] = wilson_ci(int(np.sum(winners == p)), n)
+
+    for p in players:
+        losses = columns[f"losses_p{p}"]
+        dist = mean_ci(losses)
+        dist["percentiles"] = {str(q): float(np.percentile(losses, q)) for q in (5, 25, 50, 75, 95)}
+        values, counts = np.unique(losses, return_counts=True)
+        dist["histogram"] = {str(int(v)): int(c) for v, c in zip(values, counts)}
+        summary["losses"][f"p{p}"] = dist
+        summary["ammo_used"][f"p{p}"] = mean_ci(columns[f"ammo_used_p{p}"])
+        summary["battery_used"][f"p{p}"] = mean_ci(columns[f"battery_used_p{p}"])
+        # time-to-kill only over the replicas that player actually won
+        summary["time_to_kill"][f"p{p}"] = mean_ci(columns["time_to_kill"][winners == p])
+    return summary
+
+
+def run_batch(scenario: dict, replicas: int, seconds: float, tick_rate: float = 10.0,
+              seed: int = 0, workers: int = None):
+    """Run `replicas` seeded copies of a scenario over a process pool; returns (columns, summary)."""
+    workers = workers or os.cpu_count() or 1
+    jobs = [(scenario, seconds, tick_rate, s) for s in replica_seeds(seed, replicas)]
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        rows = [run_replica(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, replicas // (workers * 4))
+            rows = list(pool.map(run_replica, jobs, chunksize=chunk))
+    wall = time.perf_counter() - t0
+
+    players, _, _ = victory_check(scenario)
+    columns = to_columns(rows)
+    summary = aggregate(columns, players)
+    summary["seed"] = seed
+    summary["workers"] = workers
+    summary["wall_time"] = round(wall, 3)
+    return columns, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo batch runs of a W.A.T scenario.")
+    parser.add_argument("scenario", help="path to a scenario JSON file")
+    parser.add_argument("--replicas", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=120.0, help="simulated seconds per replica (upper bound)")
+    parser.add_argument("--tick-rate", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0, help="master seed; replica seeds are spawned from it")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: all cores)")
+    parser.add_argument("--out", default=None, help="write per-replica columns to this .npz file")
+    args = parser.parse_args()
+
+    scenario = Headless.load_scenario_file(args.scenario)
+    columns, summary = run_batch(scenario, args.replicas, args.seconds, args.tick_rate, args.seed, args.workers)
+    if args.out:
+        np.savez_compressed(args.out, **columns)
+        summary["output"] = args.out
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
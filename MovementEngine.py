@@ -0,0 +1,240 @@
+import weakref
+
+import numpy as np
+
+# numeric state codes, same values as UAVUnits.UnitState
+STATE_IDLE = 1
+STATE_DESTROYED = 2
+STATE_DAMAGED = 3
+STATE_MOVING = 4
+STATE_LANDED = 5
+STATE_ACTIVE = 6
+
+
+class _OwnerRef(weakref.ref):
+    # weakref to a slot's Unit that remembers which slot it was for
+    __slots__ = ("slot", "generation")
+
+
+class MovementStore:
+    """
+    Structure-of-arrays storage for everything that moves.
+    Every Unit owns one slot; its positionX / destination / battery / fuel ...
+    attributes are properties reading and writing these arrays, and step()
+    advances every moving unit in one batched numpy pass per tick.
+    """
+
+    FLOAT_COLUMNS = ("posX", "posY", "destX", "destY", "speed",
+                     "battery", "idleDrain", "moveDrain", "drainModifier",
+                     "fuel", "fuelPerTick")
+    BOOL_COLUMNS = ("alive", "hasDest", "usesBattery", "usesFuel", "followsFlow")
+
+    def __init__(self, capacity: int = 1024):
+        self.generation = 0
+        self._allocate_arrays(capacity)
+
+    def _allocate_arrays(self, capacity: int):
+        self.capacity = capacity
+        self.size = 0           # high-water mark of used slots
+        self.free = []          # released slots ready for reuse
+        self.owners = []        # slot -> weakref to the Unit
+        for name in self.FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=np.float64))
+        for name in self.BOOL_COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=bool))
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.drainModifier[:] = 1.0
+        # slots written since the last take_dirty(): the units WorldView has to look at again;
+        # requeued ones also changed their move_queue, which lives on the Python object
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.requeued = np.zeros(capacity, dtype=bool)
+        # slot -> id of the unit in the world (-1: not spawned), set by GameWorld.spawn
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+
+    def reset(self):
+        """Drop every slot (new world). Finalizers of old units become no-ops."""
+        self.generation += 1
+        self._allocate_arrays(self.capacity)
+
+    def _grow(self):
+        newCap = self.capacity * 2
+        for name in self.FLOAT_COLUMNS + self.BOOL_COLUMNS + ("state", "dirty", "requeued", "ids"):
+            old = getattr(self, name)
+            new = np.zeros(newCap, dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+        self.ids[self.capacity:] = -1
+        self.drainModifier[self.capacity:] = 1.0
+        self.capacity = newCap
+
+    def allocate(self, owner) -> int:
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow()
+            slot = self.size
+            self.size += 1
+            self.owners.append(None)
+
+        for name in self.FLOAT_COLUMNS:
+            getattr(self, name)[slot] = 0.0
+        for name in self.BOOL_COLUMNS:
+            getattr(self, name)[slot] = False
+        self.drainModifier[slot] = 1.0
+        self.state[slot] = STATE_IDLE
+        self.alive[slot] = True
+        self.dirty[slot] = True
+        self.ids[slot] = -1
+        # the weakref's callback gives the slot back once the unit is garbage collected
+        self.owners[slot] = self._owner_ref(owner, slot)
+        return slot
+
+    def _owner_ref(self, owner, slot: int):
+        ref = _OwnerRef(owner, self._collected)
+        ref.slot = slot
+        ref.generation = self.generation
+        return ref
+
+    def _collected(self, ref):
+        self.release(ref.slot, ref.generation)
+
+    def allocate_many(self, owners) -> range:
+        """
+        Bulk allocate() for a freshly reset store (snapshot restore): slots are
+        handed out contiguously and the caller fills the columns afterwards.
+        """
+        n = len(owners)
+        start = self.size
+        while self.size + n > self.capacity:
+            self._grow()
+        slots = range(start, start + n)
+        sl = slice(start, start + n)
+        for name in self.FLOAT_COLUMNS:
+            getattr(self, name)[sl] = 0.0
+        for name in self.BOOL_COLUMNS:
+            getattr(self, name)[sl] = False
+        self.drainModifier[sl] = 1.0
+        self.state[sl] = STATE_IDLE
+        self.alive[sl] = True
+        self.dirty[sl] = True
+        self.ids[sl] = -1
+        self.size += n
+        self.owners.extend(map(self._owner_ref, owners, slots))
+        return slots
+
+    def release(self, slot: int, generation: int = None):
+        if generation is not None and generation != self.generation:
+            return
+        if not self.alive[slot]:
+            return
+        self.alive[slot] = False
+        self.state[slot] = STATE_DESTROYED
+        self.owners[slot] = None
+        self.free.append(slot)
+
+    def take_dirty(self):
+        """(slots written, slots requeued) since the last call, and clear the marks."""
+        slots = np.flatnonzero(self.dirty[:self.size])
+        requeued = np.flatnonzero(self.requeued[:self.size])
+        self.dirty[slots] = False
+        self.requeued[requeued] = False
+        return slots, requeued
+
+    def step(self, dt: float, slots=None, terrain=None, flows=None):
+        """
+        Advance all live slots (or just `slots`) by one tick.
+        With a TerrainRaster, each moving unit's speed is scaled by the terrain
+        under it (ground table for units without a battery, air table for UAVs).
+        With PathFinding.FlowFields, units flagged followsFlow head down the
+        field of their destination instead of straight at it.
+        """
+        if slots is None:
+            idx = np.flatnonzero(self.alive[:self.size])
+        else:
+            idx = np.asarray(slots, dtype=np.intp)
+        if idx.size == 0:
+            return
+
+        state = self.state
+        moving = state[idx] == STATE_MOVING
+
+        # --- fuel gate: ground units with an empty tank stop instead of moving ---
+        fuelMask = moving & self.usesFuel[idx]
+        if fuelMask.any():
+            fi = idx[fuelMask]
+            empty = self.fuel[fi] <= 0
+            state[fi[empty]] = STATE_IDLE
+            burn = fi[~empty]
+            self.fuel[burn] = np.maximum(self.fuel[burn] - self.fuelPerTick[burn], 0.0)
+            moving[fuelMask] = ~empty
+            self.dirty[fi] = True
+
+        # --- movement + arrival detection ---
+        mi = idx[moving]
+        if mi.size:
+            self.dirty[mi] = True
+            dx = self.destX[mi] - self.posX[mi]
+            dy = self.destY[mi] - self.posY[mi]
+            dist = np.hypot(dx, dy)
+            maxStep = self.speed[mi] * dt
+            if terrain is not None:
+                maxStep *= terrain.speed_multipliers(self.posX[mi], self.posY[mi], ~self.usesBattery[mi])
+
+            arrived = maxStep >= dist
+            if flows is not None:
+                fm = np.flatnonzero(self.followsFlow[mi])
+                if fm.size:
+                    fi = mi[fm]
+                    ux, uy = flows.steer(self.posX[fi], self.posY[fi], self.destX[fi], self.destY[fi])
+                    # outside the goal cell: a full step along the field, no arriving yet
+                    far = (ux != 0) | (uy != 0)
+                    ff = fm[far]
+                    dx[ff] = ux[far] * dist[ff]
+                    dy[ff] = uy[far] * dist[ff]
+                    arrived[ff] = False
+            go = ~arrived
+            if go.any():
+                gi = mi[go]
+                scale = maxStep[go] / dist[go]
+                self.posX[gi] += dx[go] * scale
+                self.posY[gi] += dy[go] * scale
+
+            ai = mi[arrived]
+            if ai.size:
+                self.posX[ai] = self.destX[ai]
+                self.posY[ai] = self.destY[ai]
+                state[ai] = STATE_IDLE
+                # move_queue lives on the Python object, only arrivals touch it
+                for slot in ai.tolist():
+                    ref = self.owners[slot]
+                    owner = ref() if ref is not None else None
+                    if owner is not None and owner.move_queue:
+                        owner._try_dequeue_next_move()
+
+        # --- battery drain (after movement, like UAV.tick_unit did) ---
+        bi = idx[self.usesBattery[idx]]
+        if bi.size:
+            st = state[bi]
+            drain = np.where(st == STATE_IDLE, self.idleDrain[bi],
+                             np.where(st == STATE_MOVING, self.moveDrain[bi], 0.0))
+            self.battery[bi] -= drain * self.drainModifier[bi]
+            self.dirty[bi[drain != 0.0]] = True
+            dead = bi[self.battery[bi] <= 0.0]
+            if dead.size:
+                self.battery[dead] = 0.0
+                state[dead] = STATE_DESTROYED
+                self.dirty[dead] = True
+
+
+def column(name: str, cast=float):
+    """Property exposing one column of the unit's store as a plain attribute of the unit."""
+    def getter(self):
+        return cast(getattr(self._store, name)[self._slot])
+
+    def setter(self, value):
+        store = self._store
+        getattr(store, name)[self._slot] = value
+        store.dirty[self._slot] = True
+
+    return property(getter, setter)
@@ -0,0 +1,436 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# side of a planning cell in map units; paths are planned on this coarser grid
+# (a block of terrain cells) and MovementEngine still applies the fine terrain speed
+PLAN_CELL = 16.0
+PATH_CACHE_SIZE = 256
+FLOW_CACHE_SIZE = 32
+# terrain cells averaged per band when (re)building a CostGrid
+BAND_CELLS = 1 << 21
+
+_SQRT2 = math.sqrt(2.0)
+# (dr, dc, step length in cells), 8-connected
+_NEIGHBOURS = ((0, 1, 1.0), (1, 0, 1.0), (0, -1, 1.0), (-1, 0, 1.0),
+               (1, 1, _SQRT2), (1, -1, _SQRT2), (-1, 1, _SQRT2), (-1, -1, _SQRT2))
+
+
+class CostGrid:
+    """
+    Ground travel cost of a TerrainRaster averaged over square blocks of
+    about `planCell` map units. Built on the first refresh(), which also
+    rebuilds it after the terrain was painted (it remembers the version).
+    """
+
+    def __init__(self, terrain, planCell: float = PLAN_CELL):
+        self.terrain = terrain
+        self.block = max(1, int(round(planCell / terrain.cellSize)))
+        self.cell = self.block * terrain.cellSize
+        self.rows = -(-terrain.rows // self.block)
+        self.cols = -(-terrain.cols // self.block)
+        self.cost = None
+        self.flat = None
+        self.minCost = None
+        self.version = None
+
+    def refresh(self) -> bool:
+        """Rebuild from the terrain if it changed since the last build; True if it did."""
+        t = self.terrain
+        version = t.version
+        if self.version == version:
+            return False
+        k = self.block
+        lut = 1.0 / t.groundLUT
+        cost = np.empty((self.rows, self.cols))
+        # a band of block rows at a time: uint8 codes -> cost -> block means, so the
+        # raster is never held at full resolution (let alone as floats)
+        step = max(1, BAND_CELLS // (k * k * self.cols))
+        for b0 in range(0, self.rows, step):
+            b1 = min(b0 + step, self.rows)
+            codes = np.asarray(t.codes[b0 * k:b1 * k])
+            pad = ((0, (b1 - b0) * k - codes.shape[0]), (0, self.cols * k - t.cols))
+            if pad[0][1] or pad[1][1]:
+                codes = np.pad(codes, pad, mode="edge")
+            cost[b0:b1] = lut[codes].reshape(b1 - b0, k, self.cols, k).mean(axis=(1, 3))
+        self.cost = cost
+        self.flat = cost.ravel().tolist()     # plain floats for the heapq searches
+        self.minCost = float(cost.min())
+        self.version = version
+        return True
+
+    def cell_of(self, x: float, y: float):
+        c = min(max(int(x // self.cell), 0), self.cols - 1)
+        r = min(max(int(y // self.cell), 0), self.rows - 1)
+        return r, c
+
+    def cells_of(self, x, y) -> np.ndarray:
+        """Flat cell index for arrays of map positions."""
+        c = np.clip((np.asarray(x) // self.cell).astype(np.intp), 0, self.cols - 1)
+        r = np.clip((np.asarray(y) // self.cell).astype(np.intp), 0, self.rows - 1)
+        return r * self.cols + c
+
+    def center(self, r: int, c: int):
+        return (c + 0.5) * self.cell, (r + 0.5) * self.cell
+
+
+def astar(cost: list, cols: int, start: int, goal: int, minCost: float):
+    """
+    Cheapest 8-connected path between two flat cell indices of a row-major
+    cost grid (list of floats, one per cell). A step costs its length times
+    the mean cost of the two cells it joins. Returns the list of cells from
+    start to goal, or None if goal can't be reached.
+    """
+    n = len(cost)
+    gr, gc = divmod(goal, cols)
+    diag = _SQRT2 - 1.0
+
+    def h(node):
+        r, c = divmod(node, cols)
+        dr = abs(r - gr)
+        dc = abs(c - gc)
+        # octile distance at the cheapest cost anywhere keeps it admissible
+        return (max(dr, dc) + diag * min(dr, dc)) * minCost
+
+    g = {start: 0.0}
+    came = {}
+    heap = [(h(start), 0.0, start)]
+    while heap:
+        _, gs, node = heapq.heappop(heap)
+        if node == goal:
+            path = [node]
+            while node in came:
+                node = came[node]
+                path.append(node)
+            path.reverse()
+            return path
+        if gs > g[node]:
+            continue  # stale heap entry
+        r, c = divmod(node, cols)
+        here = cost[node]
+        for dr, dc, step in _NEIGHBOURS:
+            nc = c + dc
+            if nc < 0 or nc >= cols:
+                continue
+            nxt = node + dr * cols + dc
+            if nxt < 0 or nxt >= n:
+                continue
+            ng = gs + step * 0.5 * (here + cost[nxt])
+            if ng < g.get(nxt, math.inf):
+                g[nxt] = ng
+                came[nxt] = node
+                heapq.heappush(heap, (ng + h(nxt), ng, nxt))
+    return None
+
+
+def _clear_line(cost: list, cols: int, a: int, b: int, limit: float) -> bool:
+    # does the straight line between two cells only cross cells costing <= limit?
+    ar, ac = divmod(a, cols)
+    br, bc = divmod(b, cols)
+    n = 2 * max(abs(br - ar), abs(bc - ac))
+    for i in range(1, n):
+        r = round(ar + (br - ar) * i / n)
+        c = round(ac + (bc - ac) * i / n)
+        if cost[r * cols + c] > limit:
+            return False
+    return True
+
+
+def _smooth(path: list, cost: list, cols: int) -> list:
+    """
+    Pull the cell path straight: from each kept cell jump to the furthest
+    later one in plain sight, as long as the shortcut crosses nothing dearer
+    than the stretch of path it replaces (so it never cuts through a lake).
+    """
+    out = [path[0]]
+    i = 0
+    while i < len(path) - 1:
+        j = i + 1
+        limit = max(cost[path[i]], cost[path[j]])
+        while j + 1 < len(path):
+            worst = max(limit, cost[path[j + 1]])
+            if not _clear_line(cost, cols, path[i], path[j + 1], worst):
+                break
+            limit = worst
+            j += 1
+        out.append(path[j])
+        i = j
+    return out
+
+
+def integrate(cost: list, cols: int, goal: int) -> np.ndarray:
+    """
+    Dijkstra from one cell over a row-major cost grid (same step costs as
+    astar): the cheapest cost from every cell to `goal`, inf where it can't
+    be reached.
+    """
+    n = len(cost)
+    dist = [math.inf] * n
+    dist[goal] = 0.0
+    heap = [(0.0, goal)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        r, c = divmod(node, cols)
+        here = cost[node]
+        for dr, dc, step in _NEIGHBOURS:
+            nc = c + dc
+            if nc < 0 or nc >= cols:
+                continue
+            nxt = node + dr * cols + dc
+            if nxt < 0 or nxt >= n:
+                continue
+            nd = d + step * 0.5 * (here + cost[nxt])
+            if nd < dist[nxt]:
+                dist[nxt] = nd
+                heapq.heappush(heap, (nd, nxt))
+    return np.array(dist)
+
+
+class FlowField:
+    """
+    Where to head from every cell of a CostGrid to reach one goal cell: a unit
+    direction (dirX, dirY) per flat cell index towards the neighbour the
+    cheapest route continues through. The goal cell itself, and cells with
+    no way to the goal, get (0, 0).
+    """
+
+    def __init__(self, grid: CostGrid, goal: int):
+        self.goal = goal
+        self.version = grid.version
+        rows, cols = grid.rows, grid.cols
+        dist = integrate(grid.flat, cols, goal).reshape(rows, cols)
+        self.dist = dist
+
+        cost = grid.cost
+        padDist = np.pad(dist, 1, constant_values=np.inf)
+        padCost = np.pad(cost, 1, mode="edge")
+        best = np.full((rows, cols), np.inf)
+        dirX = np.zeros((rows, cols))
+        dirY = np.zeros((rows, cols))
+        for dr, dc, step in _NEIGHBOURS:
+            there = (slice(1 + dr, 1 + dr + rows), slice(1 + dc, 1 + dc + cols))
+            cand = padDist[there] + step * 0.5 * (cost + padCost[there])
+            better = cand < best
+            best[better] = cand[better]
+            dirX[better] = dc / step
+            dirY[better] = dr / step
+        dirX.flat[goal] = dirY.flat[goal] = 0.0
+        self.dirX = dirX.ravel()
+        self.dirY = dirY.ravel()
+
+
+class FlowFields:
+    """
+    LRU of FlowFields over one CostGrid, one per goal cell. A field serves
+    every unit heading to its goal, however many; they all go when the
+    terrain version changes. With a worker (PathPlanner in background
+    mode) fields are built on it and units head straight for their goal
+    until theirs is ready.
+    """
+
+    def __init__(self, grid: CostGrid, capacity: int = FLOW_CACHE_SIZE, worker=None):
+        self.grid = grid
+        self.capacity = capacity
+        self._fields = OrderedDict()    # goal cell -> FlowField
+        self._version = grid.version
+        self._worker = worker
+        self._queued = set()            # goal cells waiting on the worker
+        self._lock = threading.Lock()
+        self.built = 0
+
+    def field(self, goal: int):
+        """
+        The FlowField to `goal`. With a worker this never builds: it queues
+        the build and returns what there is meanwhile (a field for older
+        terrain, or None).
+        """
+        version = self.grid.terrain.version
+        with self._lock:
+            f = self._fields.get(goal)
+            if f is not None:
+                self._fields.move_to_end(goal)
+                if f.version == version:
+                    return f
+            if self._worker is not None:
+                if goal not in self._queued:
+                    self._queued.add(goal)
+                    self._worker.submit(self._build, goal)
+                return f
+        return self._build(goal)
+
+    def _build(self, goal: int) -> FlowField:
+        grid = self.grid
+        try:
+            grid.refresh()
+            f = FlowField(grid, goal)
+            with self._lock:
+                if self._version != grid.version:
+                    self._fields.clear()
+                    self._version = grid.version
+                self._fields[goal] = f
+                self.built += 1
+                while len(self._fields) > self.capacity:
+                    self._fields.popitem(last=False)
+            return f
+        finally:
+            with self._lock:
+                self._queued.discard(goal)
+
+    def steer(self, x, y, goalX, goalY):
+        """
+        Unit heading (ux, uy) for units at (x[i], y[i]) going to (goalX[i],
+        goalY[i]), one field lookup per distinct goal. (0, 0) means the unit
+        is in its goal cell (or cut off from it, or its field isn't built
+        yet) and should head straight there.
+        """
+        cells = self.grid.cells_of(x, y)
+        goals = self.grid.cells_of(goalX, goalY)
+        ux = np.zeros(cells.size)
+        uy = np.zeros(cells.size)
+        for goal in np.unique(goals).tolist():
+            f = self.field(goal)
+            if f is None:
+                continue
+            sel = goals == goal
+            ux[sel] = f.dirX[cells[sel]]
+            uy[sel] = f.dirY[cells[sel]]
+        return ux, uy
+
+    def stats(self) -> dict:
+        return {"cached": len(self._fields), "capacity": self.capacity, "built": self.built,
+                "queued": len(self._queued)}
+
+
+class PathPlanner:
+    """
+    A* for ground units over a CostGrid, with an LRU cache of routes keyed by
+    (start cell, goal cell, terrain version): every truck a hub sends to the
+    same AA site reuses the first one's route, and painting the terrain
+    quietly retires the old routes.
+
+    With background=True the searches, flow field builds and cost grid
+    rebuilds all run on one planner thread: request_path() answers from the
+    cache or queues the search, and finished() hands back what got done.
+    """
+
+    def __init__(self, terrain, planCell: float = PLAN_CELL, capacity: int = PATH_CACHE_SIZE,
+                 background: bool = False):
+        self.grid = CostGrid(terrain, planCell)
+        self.capacity = capacity
+        self._cache = OrderedDict()     # (start, goal, version) -> tuple of waypoints
+        self._version = self.grid.version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.background = background
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="planner") if background else None
+        self._pending = {}              # key -> [(ticket, goal)] waiting on that search
+        self._finished = deque()        # (ticket, waypoints or None)
+        # group moves to one point steer by a shared field instead of a route each
+        self.flows = FlowFields(self.grid, worker=self._worker)
+
+    @property
+    def terrain(self):
+        return self.grid.terrain
+
+    def _key(self, start, goal):
+        grid = self.grid
+        sr, sc = grid.cell_of(*start)
+        gr, gc = grid.cell_of(*goal)
+        return sr * grid.cols + sc, gr * grid.cols + gc, self.terrain.version
+
+    def _cached(self, key):
+        with self._lock:
+            route = self._cache.get(key)
+            if route is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return route
+
+    def _search(self, key):
+        # the corners of the cheapest route between two cells, cached; None if there's none
+        grid = self.grid
+        grid.refresh()
+        with self._lock:
+            if self._version != grid.version:
+                self._cache.clear()
+                self._version = grid.version
+            self.misses += 1
+        cells = astar(grid.flat, grid.cols, key[0], key[1], grid.minCost)
+        if cells is None:
+            return None
+        # start cell is where we are, goal cell is replaced by the exact goal
+        route = tuple(grid.center(*divmod(cell, grid.cols))
+                      for cell in _smooth(cells, grid.flat, grid.cols)[1:-1])
+        with self._lock:
+            self._cache[(key[0], key[1], grid.version)] = route
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+        return route
+
+    def find_path(self, start, goal):
+        """
+        Waypoints from start to goal: the corners of the cheapest route
+        (planning cell centres) followed by goal itself. None if there's no
+        route. Blocks until the search is done, in background mode too.
+        """
+        key = self._key(start, goal)
+        route = self._cached(key)
+        if route is None:
+            route = self._worker.submit(self._search, key).result() if self.background else self._search(key)
+            if route is None:
+                return None
+        return list(route) + [(float(goal[0]), float(goal[1]))]
+
+    def request_path(self, start, goal, ticket):
+        """
+        find_path() that never waits, for background mode: the waypoints if
+        the route is cached, else None and the search is queued; it shows up
+        in finished() as (ticket, waypoints or None).
+        """
+        key = self._key(start, goal)
+        goal = (float(goal[0]), float(goal[1]))
+        route = self._cached(key)
+        if route is not None:
+            return list(route) + [goal]
+        with self._lock:
+            waiting = self._pending.setdefault(key, [])
+            waiting.append((ticket, goal))
+            if len(waiting) > 1:
+                return None     # same search already queued
+        self._worker.submit(self._search_queued, key)
+        return None
+
+    def _search_queued(self, key):
+        route = None
+        try:
+            route = self._search(key)
+        finally:
+            with self._lock:
+                for ticket, goal in self._pending.pop(key, ()):
+                    self._finished.append((ticket, None if route is None else list(route) + [goal]))
+
+    def finished(self) -> list:
+        """(ticket, waypoints or None) of every queued search done since the last call."""
+        with self._lock:
+            done = list(self._finished)
+            self._finished.clear()
+        return done
+
+    def stats(self) -> dict:
+        return {
+            "plan_cell": self.grid.cell,
+            "terrain_version": self.grid.version,
+            "cached": len(self._cache),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "queued": len(self._pending),
+            "flow_fields": self.flows.stats(),
+        }
@@ -0,0 +1,344 @@
+import argparse
+import heapq
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import TerrainRaster
+
+# how much faster than open ground a vehicle drives on a road
+ROAD_SPEED = TerrainRaster.GROUND_SPEED[TerrainRaster.TerrainType.Road]
+# vertices closer than this (map units) are the same junction
+SNAP_TOLERANCE = 1.0
+LANDMARKS = 8
+ROUTE_CACHE_SIZE = 1024
+
+# stands in for "unreachable" in landmark tables: |FAR - FAR| is 0, |FAR - d| prunes
+_FAR = 1e30
+
+
+def _lines(geometry: dict):
+    kind = geometry.get("type")
+    if kind == "LineString":
+        return [geometry["coordinates"]]
+    if kind == "MultiLineString":
+        return geometry["coordinates"]
+    return []
+
+
+class RoadNetwork:
+    """
+    Road graph built from GeoJSON LineString / MultiLineString features in
+    map coordinates. Every vertex is a node (vertices within SNAP_TOLERANCE
+    merge, which is how roads join); consecutive vertices are joined by an
+    edge weighted by length / the feature's "speed" property (default 1).
+    Features with "bridge": true are bridges: destroy_bridge() closes their
+    edges until repair_bridge().
+
+    Shortest paths are A* with ALT bounds (distances from a few far-apart
+    landmarks, worked out once at load). Closing edges only makes distances
+    longer, so the bounds stay valid after a bridge goes down and nothing
+    has to be recomputed; routes through it are dropped from the cache.
+    """
+
+    def __init__(self, features, snapTolerance: float = SNAP_TOLERANCE, landmarks: int = LANDMARKS,
+                 cacheSize: int = ROUTE_CACHE_SIZE):
+        self.snapTolerance = snapTolerance
+        xs, ys = [], []
+        keys = {}
+
+        def node(x, y):
+            key = (round(x / snapTolerance), round(y / snapTolerance))
+            n = keys.get(key)
+            if n is None:
+                n = keys[key] = len(xs)
+                xs.append(float(x))
+                ys.append(float(y))
+            return n
+
+        self.adj = []                   # node -> [(neighbour, edge)]
+        self.edgeWeight = []
+        self.edgeOpen = []
+        self.bridges = {}               # bridge id -> {"name", "edges", "nodes", "x", "y", "destroyed"}
+        self.lines = []                 # (bridge id or None, [[x, y], ...]) for drawing
+        for f in features:
+            props = f.get("properties") or {}
+            speed = float(props.get("speed", 1.0))
+            bridge = None
+            if props.get("bridge"):
+                bridge = str(props.get("id", f"bridge-{len(self.bridges)}"))
+                self.bridges[bridge] = {"name": props.get("name", bridge), "edges": [], "nodes": set(),
+                                        "destroyed": False}
+            for line in _lines(f.get("geometry") or {}):
+                self.lines.append((bridge, [[float(p[0]), float(p[1])] for p in line]))
+                prev = None
+                for p in line:
+                    n = node(p[0], p[1])
+                    while len(self.adj) < len(xs):
+                        self.adj.append([])
+                    if prev is not None and prev != n:
+                        e = len(self.edgeWeight)
+                        self.edgeWeight.append(math.hypot(xs[n] - xs[prev], ys[n] - ys[prev]) / speed)
+                        self.edgeOpen.append(True)
+                        self.adj[prev].append((n, e))
+                        self.adj[n].append((prev, e))
+                        if bridge is not None:
+                            self.bridges[bridge]["edges"].append(e)
+                            self.bridges[bridge]["nodes"].update((prev, n))
+                    prev = n
+
+        self.nodeX = np.array(xs)
+        self.nodeY = np.array(ys)
+        for b in self.bridges.values():
+            nodes = sorted(b["nodes"])
+            # the icon sits on the span's middle
+            b["x"] = float(self.nodeX[nodes].mean()) if nodes else 0.0
+            b["y"] = float(self.nodeY[nodes].mean()) if nodes else 0.0
+        self._nodeOpen = np.ones(len(xs), dtype=bool)
+
+        self.version = 0
+        self.capacity = cacheSize
+        self._cache = OrderedDict()     # (from node, to node) -> (nodes, cost) or None
+        self.hits = 0
+        self.misses = 0
+        self.expanded = 0
+        self._landmarks(landmarks)
+
+    @classmethod
+    def load(cls, path: str, **kwargs):
+        with open(path) as f:
+            data = json.load(f)
+        features = data["features"] if data.get("type") == "FeatureCollection" else [data]
+        return cls(features, **kwargs)
+
+    # ------------------------------------------------------------ preprocessing
+
+    def _dijkstra(self, source: int) -> list:
+        dist = [math.inf] * len(self.adj)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        weight = self.edgeWeight
+        while heap:
+            d, n = heapq.heappop(heap)
+            if d > dist[n]:
+                continue
+            for m, e in self.adj[n]:
+                nd = d + weight[e]
+                if nd < dist[m]:
+                    dist[m] = nd
+                    heapq.heappush(heap, (nd, m))
+        return dist
+
+    def _landmarks(self, count: int):
+        """Pick landmarks farthest-first and keep every node's distance to each of them."""
+        n = len(self.adj)
+        self.landmarks = []
+        tables = []
+        if n:
+            nearest = np.full(n, np.inf)
+            pick = 0
+            for _ in range(min(count, n)):
+                dist = np.array(self._dijkstra(pick))
+                self.landmarks.append(pick)
+                tables.append(np.where(np.isinf(dist), _FAR, dist))
+                nearest = np.minimum(nearest, np.where(np.isinf(dist), _FAR, dist))
+                # next one: the node farthest from all picked so far (other components count as far)
+                nearest[self.landmarks] = -1.0
+                pick = int(nearest.argmax())
+                if nearest[pick] <= 0:
+                    break
+        # node -> its landmark distances, plain floats for the search loop
+        self._lm = np.array(tables).T.tolist() if tables else [[] for _ in range(n)]
+
+    # ------------------------------------------------------------------ queries
+
+    def snap(self, x: float, y: float):
+        """Nearest node still on the usable network, or None if there's none."""
+        if not self._nodeOpen.any():
+            return None
+        d2 = (self.nodeX - x) ** 2 + (self.nodeY - y) ** 2
+        d2[~self._nodeOpen] = np.inf
+        return int(d2.argmin())
+
+    def shortest_path(self, source: int, target: int):
+        """(nodes, cost) of the cheapest open route between two nodes, or None."""
+        key = (source, target)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        result = self._search(source, target)
+        self._cache[key] = result
+        while len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+        return result
+
+    def _search(self, source: int, target: int):
+        lm = self._lm
+        lt = lm[target]
+
+        def h(n):
+            # triangle inequality on every landmark: |d(L, t) - d(L, n)| <= d(n, t)
+            return max([abs(a - b) for a, b in zip(lm[n], lt)], default=0.0)
+
+        weight = self.edgeWeight
+        open_ = self.edgeOpen
+        g = {source: 0.0}
+        came = {}
+        # ties on f go to the deeper entry, or grid-like networks expand every equal-length detour
+        heap = [(h(source), -0.0, source)]
+        while heap:
+            _, gs, n = heapq.heappop(heap)
+            gs = -gs
+            if n == target:
+                path = [n]
+                while n in came:
+                    n = came[n]
+                    path.append(n)
+                path.reverse()
+                return tuple(path), gs
+            if gs > g[n]:
+                continue
+            self.expanded += 1
+            for m, e in self.adj[n]:
+                if not open_[e]:
+                    continue
+                ng = gs + weight[e]
+                if ng < g.get(m, math.inf):
+                    g[m] = ng
+                    came[m] = n
+                    hm = h(m)
+                    if hm < _FAR / 2:
+                        heapq.heappush(heap, (ng + hm, -ng, m))
+        return None
+
+    def route(self, start, goal):
+        """
+        Waypoints from start to goal by road: drive to the nearest node,
+        follow the network, leave it at the node nearest the goal and go
+        straight to goal. None if there's no connection or the road trip
+        (off-road legs at open ground speed, the rest at ROAD_SPEED) would
+        take longer than driving straight there.
+        """
+        s = self.snap(*start)
+        t = self.snap(*goal)
+        if s is None or t is None:
+            return None
+        found = self.shortest_path(s, t)
+        if found is None:
+            return None
+        nodes, cost = found
+        nx, ny = self.nodeX, self.nodeY
+        offRoad = math.hypot(nx[s] - start[0], ny[s] - start[1]) + math.hypot(goal[0] - nx[t], goal[1] - ny[t])
+        if offRoad + cost / ROAD_SPEED >= math.hypot(goal[0] - start[0], goal[1] - start[1]):
+            return None
+        path = [(float(nx[n]), float(ny[n])) for n in nodes]
+        if path[0] == (float(start[0]), float(start[1])):
+            path.pop(0)
+        path.append((float(goal[0]), float(goal[1])))
+        return path
+
+    # ------------------------------------------------------------------ bridges
+
+    def bridge_points(self, bridge_id: str) -> set:
+        """Positions of a bridge's nodes, as they appear in route() waypoints."""
+        b = self.bridges[bridge_id]
+        return {(float(self.nodeX[n]), float(self.nodeY[n])) for n in b["nodes"]}
+
+    def destroy_bridge(self, bridge_id: str) -> bool:
+        b = self.bridges.get(bridge_id)
+        if b is None or b["destroyed"]:
+            return False
+        b["destroyed"] = True
+        for e in b["edges"]:
+            self.edgeOpen[e] = False
+        self._refresh_nodes(b["nodes"])
+        # only routes over this bridge need planning again
+        nodes = b["nodes"]
+        for key in [k for k, r in self._cache.items() if r is not None and not nodes.isdisjoint(r[0])]:
+            del self._cache[key]
+        self.version += 1
+        return True
+
+    def repair_bridge(self, bridge_id: str) -> bool:
+        b = self.bridges.get(bridge_id)
+        if b is None or not b["destroyed"]:
+            return False
+        b["destroyed"] = False
+        for e in b["edges"]:
+            self.edgeOpen[e] = True
+        self._refresh_nodes(b["nodes"])
+        # a reopened bridge can shorten any route, and connect unreachable pairs
+        self._cache.clear()
+        self.version += 1
+        return True
+
+    def destroyed_bridges(self) -> list:
+        return [bid for bid, b in self.bridges.items() if b["destroyed"]]
+
+    def _refresh_nodes(self, nodes):
+        # a node is usable (can be snapped to) while any of its edges is open
+        for n in nodes:
+            self._nodeOpen[n] = any(self.edgeOpen[e] for _, e in self.adj[n])
+
+    # -------------------------------------------------------------------- misc
+
+    def to_json(self) -> dict:
+        """Roads and bridges for the page to draw."""
+        return {
+            "version": self.version,
+            "lines": [{"bridge": bid, "points": pts} for bid, pts in self.lines],
+            "bridges": [{"id": bid, "name": b["name"], "x": b["x"], "y": b["y"], "destroyed": b["destroyed"]}
+                        for bid, b in self.bridges.items()],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self.adj),
+            "edges": len(self.edgeWeight),
+            "bridges": len(self.bridges),
+            "destroyed_bridges": len(self.destroyed_bridges()),
+            "landmarks": len(self.landmarks),
+            "cached": len(self._cache),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expanded": self.expanded,
+        }
+
+
+def open_roads(path: str):
+    """RoadNetwork for `path`, or None when there's no such file (roads are optional)."""
+    if not path or not os.path.exists(path):
+        return None
+    return RoadNetwork.load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a road network (GeoJSON) and time some queries.")
+    parser.add_argument("path", help="GeoJSON with LineString roads in map coordinates")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    roads = RoadNetwork.load(args.path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    rng = np.random.default_rng(args.seed)
+    pairs = rng.integers(0, len(roads.adj), size=(args.queries, 2))
+    t0 = time.perf_counter()
+    for s, t in pairs.tolist():
+        roads.shortest_path(s, t)
+    query_ms = (time.perf_counter() - t0) * 1000 / max(args.queries, 1)
+    stats = roads.stats()
+    stats.update(load_ms=round(load_ms, 1), query_ms=round(query_ms, 3))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
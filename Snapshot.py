@@ -0,0 +1,421 @@
+"""
+Binary world snapshots.
+
+Layout:  MAGIC | u32 version | u32 flags | payload
+payload: u32 header length | header JSON | array blob   (zlib'd when FLAG_ZLIB)
+
+Entities are stored column-wise: one array per attribute across every
+entity that has it, movement columns gathered straight out of
+the world's MovementStore by slot, strings in a shared string table and
+lists (move queues, frequencies, hub storage) as offsets + flat values.
+The header only holds scalars and the array directory, so both directions
+are a handful of numpy copies plus one setattr pass per attribute.
+The event log is not saved; the stats counters are.
+"""
+
+import gc
+import json
+import os
+import struct
+import zlib
+from collections import Counter
+from enum import Enum
+from operator import attrgetter
+
+import numpy as np
+
+import UAVUnits, AntiAirUnits, LogHub, GroundUnits
+import MovementEngine, GameWorld
+
+MAGIC = b"WATSNAP\0"
+SNAPSHOT_VERSION = 4
+# oldest version loads() still reads
+OLDEST_VERSION = SNAPSHOT_VERSION
+FLAG_ZLIB = 1
+
+_PREFIX = struct.Struct("<8sII")
+_U32 = struct.Struct("<I")
+
+# class <-> code; order is part of the format, only ever append
+UNIT_CLASSES = [
+    UAVUnits.Unit, UAVUnits.UAV, UAVUnits.LoiteringMunition, UAVUnits.RetransmiterUAV,
+    GroundUnits.GroundUnit, GroundUnits.SupplyVehicle, GroundUnits.CombatVehicle, GroundUnits.Tank,
+    AntiAirUnits.AntiAir,
+]
+STRUCTURE_CLASSES = [
+    LogHub.GroundStructure, LogHub.LogHub, LogHub.GroundRetransmitter, LogHub.ElectronicWarfare,
+]
+
+# store columns saved for every unit
+STORE_COLUMNS = MovementEngine.MovementStore.FLOAT_COLUMNS + MovementEngine.MovementStore.BOOL_COLUMNS + ("state",)
+
+# per-class instance attributes: (attr, kind); subclasses inherit their parents' fields.
+# kinds: "i" int64, "f" float64, "n" number (float64, ints come back as ints),
+#        "b" bool, "s" string table, Enum subclass -> its value,
+#        "list" list of numbers, "queue" list of (x, y), "storage" {SupplyType: amount},
+#        "ref" unit reference (saved as id, -1 for None)
+FIELDS = {
+    UAVUnits.Unit: [("id", "i"), ("name", "s"), ("chanceToHit", "n"), ("image", "s"),
+                    ("armourType", UAVUnits.ArmourType), ("player", "i"), ("viewRange", "n"),
+                    ("move_queue", "queue"), ("supplyRequested", "b")],
+    UAVUnits.UAV: [("currentWeight", "n"), ("usedFrequencies", "list"), ("parent_base_id", "i")],
+    UAVUnits.LoiteringMunition: [("payload", "n"), ("explosiveType", UAVUnits.ExplosiveType)],
+    UAVUnits.RetransmiterUAV: [("transmissionRange", "n")],
+    GroundUnits.GroundUnit: [("maxFuel", "n")],
+    GroundUnits.SupplyVehicle: [("cargoType", LogHub.SupplyType), ("cargoAmmount", "n"),
+                                ("target_unit_id", "i"), ("home_base_id", "i"), ("phase", "s")],
+    GroundUnits.CombatVehicle: [("shootingRange", "n"), ("ammoType", LogHub.SupplyType), ("ammoCount", "n")],
+    AntiAirUnits.AntiAir: [("range", "n"), ("ammoCount", "n"), ("ammoType", LogHub.SupplyType),
+                           ("aimTime", "n"), ("timeBetweenShots", "n"), ("AAstate", AntiAirUnits.AAStatus),
+                           ("target", "ref")],
+
+    LogHub.GroundStructure: [("id", "i"), ("name", "s"), ("image", "s"), ("player", "i"),
+                             ("positionX", "n"), ("positionY", "n")],
+    LogHub.LogHub: [("transmissionRange", "n"), ("available_retransmitters", "n"), ("max_deployed_uavs", "n"),
+                    ("current_spawned_uavs", "n"), ("viewRange", "n"), ("max_air_retransmitters", "n"),
+                    ("current_air_retransmitters", "n"), ("max_supply_trucks", "n"),
+                    ("current_supply_trucks", "n"), ("inStorage", "storage")],
+    LogHub.GroundRetransmitter: [("transmissionRange", "n"), ("parent_base_id", "i")],
+    LogHub.ElectronicWarfare: [("jammingRange", "n"), ("jammingFreq", "list")],
+}
+
+
+def _fields_of(cls):
+    out = []
+    for c in reversed(cls.__mro__):
+        out.extend(FIELDS.get(c, []))
+    return out
+
+
+def _numbers(arr):
+    # float64 column back to Python numbers, whole values as ints
+    whole = np.isfinite(arr) & (arr == np.floor(arr))
+    if whole.all():
+        return arr.astype(np.int64).tolist()
+    if not whole.any():
+        return arr.tolist()
+    return [int(v) if w else v for v, w in zip(arr.tolist(), whole.tolist())]
+
+
+# ------------------------------------------------------------------ writing
+
+class _Writer:
+    def __init__(self):
+        self.directory = []
+        self.chunks = []
+        self.offset = 0
+        self.strings = {}
+
+    def add(self, name, arr):
+        arr = np.ascontiguousarray(arr)
+        self.directory.append([name, arr.dtype.str, list(arr.shape), self.offset])
+        self.chunks.append(arr.tobytes())
+        self.offset += arr.nbytes
+
+    def intern(self, s):
+        idx = self.strings.get(s)
+        if idx is None:
+            idx = self.strings[s] = len(self.strings)
+        return idx
+
+    def add_string_table(self):
+        encoded = [s.encode("utf-8") for s in self.strings]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        self.add("strings.offsets", np.concatenate(([0], np.cumsum(lengths))))
+        self.add("strings.data", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+
+def _write_table(w, prefix, objs, classes):
+    codes = {c: i for i, c in enumerate(classes)}
+    kinds = np.fromiter((codes[type(o)] for o in objs), dtype=np.uint8, count=len(objs))
+    w.add(prefix + ".class", kinds)
+
+    # group the columns by attribute: every class that has the field contributes its rows in table order
+    byField = {}
+    for cls in classes:
+        for attr, kind in _fields_of(cls):
+            byField.setdefault((attr, kind), []).append(codes[cls])
+
+    for (attr, kind), clsCodes in byField.items():
+        mask = np.isin(kinds, clsCodes)
+        rows = [objs[i] for i in np.flatnonzero(mask).tolist()] if not mask.all() else objs
+        name = f"{prefix}.{attr}"
+        get = attrgetter(attr)
+        if kind == "i":
+            w.add(name, np.fromiter(map(get, rows), dtype=np.int64, count=len(rows)))
+        elif kind in ("f", "n"):
+            w.add(name, np.fromiter(map(get, rows), dtype=np.float64, count=len(rows)))
+        elif kind == "b":
+            w.add(name, np.fromiter((bool(getattr(o, attr, False)) for o in rows), dtype=bool, count=len(rows)))
+        elif kind == "s":
+            w.add(name, np.fromiter(map(w.intern, map(get, rows)), dtype=np.int64, count=len(rows)))
+        elif kind == "ref":
+            w.add(name, np.fromiter((-1 if getattr(o, attr, None) is None else getattr(o, attr).id for o in rows),
+                                    dtype=np.int64, count=len(rows)))
+        elif isinstance(kind, type) and issubclass(kind, Enum):
+            w.add(name, np.fromiter(map(attrgetter(attr + "._value_"), rows), dtype=np.int64, count=len(rows)))
+        else:
+            # ragged: per-row lengths + flat values
+            lists = [getattr(o, attr) or () for o in rows]
+            if kind == "storage":
+                lists = [list(d.items()) if d else [] for d in lists]
+            lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+            w.add(name + ".len", lengths)
+            if kind == "list":
+                flat = np.fromiter((v for x in lists for v in x), dtype=np.float64, count=int(lengths.sum()))
+            elif kind == "queue":
+                flat = np.array([p for x in lists for p in x], dtype=np.float64).reshape(-1, 2)
+            else:  # storage
+                flat = np.array([(k.value, v) for x in lists for k, v in x], dtype=np.float64).reshape(-1, 2)
+            w.add(name + ".values", flat)
+
+
+def dumps(world, compress: bool = False, level: int = 1) -> bytes:
+    units = world.units + world.aaUnits
+    structures = world.logBases + world.ground_retransmitters + world.ewarUnits
+
+    w = _Writer()
+    _write_table(w, "units", units, UNIT_CLASSES)
+    _write_table(w, "structures", structures, STRUCTURE_CLASSES)
+
+    store = world.store
+    slots = np.fromiter((u._slot for u in units), dtype=np.intp, count=len(units))
+    for col in STORE_COLUMNS:
+        w.add("store." + col, getattr(store, col)[slots])
+
+    attackers = np.fromiter(world.pending_attacks.keys(), dtype=np.int64, count=len(world.pending_attacks))
+    targets = np.fromiter(world.pending_attacks.values(), dtype=np.int64, count=len(world.pending_attacks))
+    w.add("pending.attacker", attackers)
+    w.add("pending.target", targets)
+
+    # scheduled wake-ups (AA shots / reloads, truck ETAs) in wake order, plus the awake AAs in order
+    timers = world.timers.entries()
+    w.add("timers.id", np.fromiter((obj.id for obj, _ in timers), dtype=np.int64, count=len(timers)))
+    w.add("timers.due", np.fromiter((due for _, due in timers), dtype=np.float64, count=len(timers)))
+    w.add("awake.id", np.fromiter(world.awakeAA.keys(), dtype=np.int64, count=len(world.awakeAA)))
+    w.add_string_table()
+
+    header = {
+        "width": world.width,
+        "height": world.height,
+        "tick_count": world.tick_count,
+        "time": world.time,
+        "seed": world.seed,
+        "rng": {name: g.bit_generator.state for name, g in world.rng.items()},
+        "stats": dict(world.stats),
+        "next_unit_id": world.nextUnitId,
+        "next_structure_id": world.nextStructureId,
+        "counts": {
+            "units": len(world.units), "aaUnits": len(world.aaUnits),
+            "logBases": len(world.logBases), "ground_retransmitters": len(world.ground_retransmitters),
+            "ewarUnits": len(world.ewarUnits),
+        },
+        "arrays": w.directory,
+        # the road network is map data like the terrain, only which bridges are down is battle state
+        "destroyed_bridges": world.roads.destroyed_bridges() if world.roads is not None else [],
+    }
+    headerBytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    payload = b"".join([_U32.pack(len(headerBytes)), headerBytes] + w.chunks)
+
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, level)
+        flags |= FLAG_ZLIB
+    return _PREFIX.pack(MAGIC, SNAPSHOT_VERSION, flags) + payload
+
+
+# ------------------------------------------------------------------ reading
+
+def _read_table(arrays, strings, prefix, classes, setup=None):
+    kinds = arrays[prefix + ".class"]
+    clsList = [classes[k] for k in kinds.tolist()]
+    objs = [cls.__new__(cls) for cls in clsList]
+    if setup is not None:
+        setup(objs)
+
+    codes = {c: i for i, c in enumerate(classes)}
+    byField = {}
+    for cls in classes:
+        for attr, kind in _fields_of(cls):
+            byField.setdefault((attr, kind), []).append(codes[cls])
+
+    refs = []
+    for (attr, kind), clsCodes in byField.items():
+        mask = np.isin(kinds, clsCodes)
+        rows = [objs[i] for i in np.flatnonzero(mask).tolist()] if not mask.all() else objs
+        name = f"{prefix}.{attr}"
+        if kind == "ref":
+            refs.append((attr, rows, arrays[name].tolist()))
+            continue
+        if kind in ("i", "f", "b"):
+            values = arrays[name].tolist()
+        elif kind == "n":
+            values = _numbers(arrays[name])
+        elif kind == "s":
+            values = [strings[i] for i in arrays[name].tolist()]
+        elif isinstance(kind, type) and issubclass(kind, Enum):
+            byValue = {e.value: e for e in kind}
+            values = [byValue[v] for v in arrays[name].tolist()]
+        else:
+            lengths = arrays[name + ".len"].tolist()
+            flatArr = arrays[name + ".values"]
+            if kind == "list":
+                flat = _numbers(flatArr)
+            elif kind == "queue":
+                flat = list(map(tuple, flatArr.tolist()))
+            else:
+                flat = list(zip(map(LogHub.SupplyType, flatArr[:, 0].astype(np.int64).tolist()),
+                                _numbers(flatArr[:, 1])))
+            values = []
+            pos = 0
+            for n in lengths:
+                chunk = flat[pos:pos + n]
+                values.append(dict(chunk) if kind == "storage" else chunk)
+                pos += n
+        for o, v in zip(rows, values):
+            setattr(o, attr, v)
+    return objs, refs
+
+
+def _parse(data: bytes):
+    if len(data) < _PREFIX.size:
+        raise ValueError("not a W.A.T snapshot (too short)")
+    magic, version, flags = _PREFIX.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a W.A.T snapshot (bad magic)")
+    if not OLDEST_VERSION <= version <= SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version} "
+                         f"(expected {OLDEST_VERSION} to {SNAPSHOT_VERSION})")
+
+    payload = memoryview(data)[_PREFIX.size:]
+    if flags & FLAG_ZLIB:
+        payload = memoryview(zlib.decompress(payload))
+    (headerLen,) = _U32.unpack_from(payload)
+    header = json.loads(bytes(payload[4:4 + headerLen]).decode("utf-8"))
+    blob = payload[4 + headerLen:]
+
+    arrays = {}
+    for name, dtype, shape, offset in header["arrays"]:
+        dt = np.dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        arrays[name] = np.frombuffer(blob, dtype=dt, count=count, offset=offset).reshape(shape)
+    return header, arrays
+
+
+def loads(data: bytes, world=None):
+    """
+    Rebuild a world from dumps() output. Restores into `world` in place when
+    given (the server keeps its GameWorld object), otherwise returns a new one.
+    """
+    # building ~100k objects trips the cyclic GC over and over, and every
+    # object is kept anyway, so those passes find nothing
+    gcWasOn = gc.isenabled()
+    gc.disable()
+    try:
+        return _loads(data, world)
+    finally:
+        if gcWasOn:
+            gc.enable()
+
+
+def _loads(data: bytes, world=None):
+    header, arrays = _parse(data)
+    offsets = arrays["strings.offsets"].tolist()
+    raw = arrays["strings.data"].tobytes()
+    strings = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+    if world is None:
+        world = GameWorld.GameWorld(header["width"], header["height"])
+    else:
+        world.width, world.height = header["width"], header["height"]
+        world.clear()
+
+    store = world.store
+
+    def allocate_slots(objs):
+        # fresh store: slots come out as 0..n-1 in table order
+        for o, slot in zip(objs, store.allocate_many(objs)):
+            o._store = store
+            o._slot = slot
+
+    units, unitRefs = _read_table(arrays, strings, "units", UNIT_CLASSES, allocate_slots)
+    n = len(units)
+    for col in STORE_COLUMNS:
+        getattr(store, col)[:n] = arrays["store." + col]
+    store.ids[:n] = [u.id for u in units]
+
+    structures, _ = _read_table(arrays, strings, "structures", STRUCTURE_CLASSES)
+
+    counts = header["counts"]
+    nu = counts["units"]
+    world.units = units[:nu]
+    world.aaUnits = units[nu:]
+    nb = counts["logBases"]
+    nr = counts["ground_retransmitters"]
+    world.logBases = structures[:nb]
+    world.ground_retransmitters = structures[nb:nb + nr]
+    world.ewarUnits = structures[nb + nr:]
+    for obj in units + structures:
+        world.registry.add(obj)
+
+    # AA targets point at units by id; one that was already removed from the
+    # world comes back as None, which AntiAir.fire() treats like a dead target
+    for attr, rows, ids in unitRefs:
+        for o, tid in zip(rows, ids):
+            setattr(o, attr, world.registry.get_unit(tid) if tid >= 0 else None)
+
+    for tid, due in zip(arrays["timers.id"].tolist(), arrays["timers.due"].tolist()):
+        world.timers.schedule(world.registry.get_unit(tid), due)
+    for aid in arrays["awake.id"].tolist():
+        world.awakeAA[aid] = world.registry.get_unit(aid)
+    for u in world.units:
+        if isinstance(u, GroundUnits.SupplyVehicle):
+            world.supplyVehicles[u.id] = u
+
+    world.pending_attacks = dict(zip(arrays["pending.attacker"].tolist(), arrays["pending.target"].tolist()))
+
+    world.nextUnitId = header["next_unit_id"]
+    world.nextStructureId = header["next_structure_id"]
+    world.tick_count = header["tick_count"]
+    world.time = header["time"]
+    world.reseed(header["seed"])
+    for name, state in header["rng"].items():
+        if name in world.rng:
+            world.rng[name].bit_generator.state = state
+    world.stats = Counter(header["stats"])
+    if world.roads is not None:
+        down = set(header.get("destroyed_bridges", []))
+        for bid in list(world.roads.bridges):
+            if bid in down:
+                world.roads.destroy_bridge(bid)
+            else:
+                world.roads.repair_bridge(bid)
+    world.jamming.mark_dirty()
+    return world
+
+
+def compress(data: bytes, level: int = 1) -> bytes:
+    """dumps(world) output zlib'd, same as dumps(world, compress=True) would have made it."""
+    magic, version, flags = _PREFIX.unpack_from(data)
+    if flags & FLAG_ZLIB:
+        return data
+    return _PREFIX.pack(magic, version, flags | FLAG_ZLIB) + zlib.compress(memoryview(data)[_PREFIX.size:], level)
+
+
+def write(path: str, data: bytes):
+    # write-then-rename so a crash mid-save never leaves a half file behind
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save(world, path: str, compress: bool = False):
+    data = dumps(world, compress)
+    write(path, data)
+    return len(data)
+
+
+def load(path: str, world=None):
+    with open(path, "rb") as f:
+        return loads(f.read(), world)
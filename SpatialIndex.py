@@ -0,0 +1,216 @@
+import heapq
+import math
+
+
+class SpatialGrid:
+    """
+    Uniform grid (spatial hash) over anything that has positionX / positionY.
+    Rebuilt once per tick from the world lists, then queried instead of
+    looping over the full lists; entities spawned or removed in between go
+    in / out right away with insert() / remove().
+    """
+
+    def __init__(self, cellSize: float = 64.0, rangeAttr: str = None):
+        self.cellSize = cellSize
+        # optional per-object range attribute (transmissionRange, jammingRange, ...)
+        # used by covering()
+        self.rangeAttr = rangeAttr
+        self.maxRange = 0.0
+        # extra search margin for objects that moved since the last rebuild
+        self.slack = 0.0
+        self.cells: dict[tuple[int, int], list] = {}
+        # obj -> the cell it was filed under (it may have moved since)
+        self.cellOf = {}
+        self.count = 0
+        self.minCell = None
+        self.maxCell = None
+
+    def _cell(self, x: float, y: float):
+        return int(x // self.cellSize), int(y // self.cellSize)
+
+    def clear(self):
+        self.cells.clear()
+        self.cellOf.clear()
+        self.count = 0
+        self.maxRange = 0.0
+        self.minCell = None
+        self.maxCell = None
+
+    def insert(self, obj):
+        cx, cy = self._cell(obj.positionX, obj.positionY)
+        bucket = self.cells.get((cx, cy))
+        if bucket is None:
+            self.cells[(cx, cy)] = [obj]
+        else:
+            bucket.append(obj)
+        self.cellOf[obj] = (cx, cy)
+        self.count += 1
+
+        if self.minCell is None:
+            self.minCell = [cx, cy]
+            self.maxCell = [cx, cy]
+        else:
+            if cx < self.minCell[0]: self.minCell[0] = cx
+            if cy < self.minCell[1]: self.minCell[1] = cy
+            if cx > self.maxCell[0]: self.maxCell[0] = cx
+            if cy > self.maxCell[1]: self.maxCell[1] = cy
+
+        if self.rangeAttr is not None:
+            r = getattr(obj, self.rangeAttr, 0) or 0
+            if r > self.maxRange:
+                self.maxRange = r
+
+    def remove(self, obj):
+        key = self.cellOf.pop(obj, None)
+        if key is None:
+            return
+        bucket = self.cells[key]
+        bucket.remove(obj)
+        if not bucket:
+            del self.cells[key]
+        self.count -= 1
+
+    def rebuild(self, objects, slack: float = 0.0):
+        self.clear()
+        self.slack = slack
+        for obj in objects:
+            self.insert(obj)
+
+    def members(self) -> list:
+        """Everything in the grid, in the order it went in."""
+        return list(self.cellOf)
+
+    def _cells_in_box(self, x0: float, y0: float, x1: float, y1: float):
+        if self.minCell is None:
+            return
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        # clamp to occupied area so huge radii don't walk empty space
+        cx0 = max(cx0, self.minCell[0])
+        cy0 = max(cy0, self.minCell[1])
+        cx1 = min(cx1, self.maxCell[0])
+        cy1 = min(cy1, self.maxCell[1])
+        cells = self.cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield bucket
+
+    def query_radius(self, x: float, y: float, radius: float, predicate=None) -> list:
+        """All objects within `radius` of (x, y), exact distance on current positions."""
+        found = []
+        reach = radius + self.slack
+        r2 = radius * radius
+        for bucket in self._cells_in_box(x - reach, y - reach, x + reach, y + reach):
+            for obj in bucket:
+                dx = obj.positionX - x
+                dy = obj.positionY - y
+                if dx * dx + dy * dy <= r2 and (predicate is None or predicate(obj)):
+                    found.append(obj)
+        return found
+
+    def covering(self, x: float, y: float, predicate=None) -> list:
+        """Objects whose own range (rangeAttr) reaches the point (x, y)."""
+        found = []
+        reach = self.maxRange + self.slack
+        attr = self.rangeAttr
+        for bucket in self._cells_in_box(x - reach, y - reach, x + reach, y + reach):
+            for obj in bucket:
+                r = getattr(obj, attr, 0) or 0
+                dx = obj.positionX - x
+                dy = obj.positionY - y
+                if dx * dx + dy * dy <= r * r and (predicate is None or predicate(obj)):
+                    found.append(obj)
+        return found
+
+    def k_nearest(self, x: float, y: float, k: int = 1, predicate=None, maxRadius: float = None) -> list:
+        """
+        Up to k nearest objects (optionally filtered by predicate), closest first,
+        equal distances by id. Searches outward ring by ring and stops as soon
+        as no unvisited ring can hold anything closer than what we already have.
+        """
+        if k <= 0 or self.minCell is None:
+            return []
+
+        cx, cy = self._cell(x, y)
+        # farthest ring that can still contain occupied cells
+        lastRing = max(abs(cx - self.minCell[0]), abs(cx - self.maxCell[0]),
+                       abs(cy - self.minCell[1]), abs(cy - self.maxCell[1]))
+        if maxRadius is not None:
+            lastRing = min(lastRing, int(math.ceil((maxRadius + self.slack) / self.cellSize)) + 1)
+
+        best = []  # max-heap of (-dist2, -id, obj): the worst kept candidate on top
+        maxR2 = None if maxRadius is None else maxRadius * maxRadius
+        cells = self.cells
+
+        for ring in range(lastRing + 1):
+            if ring == 0:
+                ringCells = [(cx, cy)]
+            else:
+                ringCells = []
+                for i in range(-ring, ring + 1):
+                    ringCells.append((cx + i, cy - ring))
+                    ringCells.append((cx + i, cy + ring))
+                for j in range(-ring + 1, ring):
+                    ringCells.append((cx - ring, cy + j))
+                    ringCells.append((cx + ring, cy + j))
+
+            for key in ringCells:
+                bucket = cells.get(key)
+                if not bucket:
+                    continue
+                for obj in bucket:
+                    dx = obj.positionX - x
+                    dy = obj.positionY - y
+                    d2 = dx * dx + dy * dy
+                    if maxR2 is not None and d2 > maxR2:
+                        continue
+                    if len(best) == k and d2 > -best[0][0]:
+                        continue
+                    rank = (-d2, -obj.id)
+                    if len(best) == k and rank <= best[0][:2]:
+                        continue
+                    if predicate is not None and not predicate(obj):
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, rank + (obj,))
+                    else:
+                        heapq.heapreplace(best, rank + (obj,))
+
+            # anything in ring+1 is at least ring*cellSize away
+            # (strictly closer: an equal distance further out could still win on id)
+            if len(best) == k:
+                safe = ring * self.cellSize - self.slack
+                if safe > 0 and -best[0][0] < safe * safe:
+                    break
+
+        best.sort(key=lambda item: (-item[0], -item[1]))
+        return [item[2] for item in best]
+
+
+class WorldIndex:
+    """One SpatialGrid per world list, rebuilt together at the start of a tick."""
+
+    def __init__(self, cellSize: float = 64.0):
+        self.units = SpatialGrid(cellSize)
+        self.aaUnits = SpatialGrid(cellSize)
+        self.logBases = SpatialGrid(cellSize, rangeAttr="transmissionRange")
+        self.groundRetransmitters = SpatialGrid(cellSize, rangeAttr="transmissionRange")
+        self.ewarUnits = SpatialGrid(cellSize, rangeAttr="jammingRange")
+        # airborne retransmitters that are currently switched on
+        self.airRelays = SpatialGrid(cellSize, rangeAttr="transmissionRange")
+
+    def grids(self) -> tuple:
+        return (self.units, self.aaUnits, self.logBases, self.groundRetransmitters, self.ewarUnits)
+
+    def rebuild(self, units, aaUnits, logBases, ground_retransmitters, ewarUnits, slack: float = 0.0, relayCheck=None):
+        self.units.rebuild(units, slack)
+        self.aaUnits.rebuild(aaUnits, slack)
+        self.logBases.rebuild(logBases)
+        self.groundRetransmitters.rebuild(ground_retransmitters)
+        self.ewarUnits.rebuild(ewarUnits)
+        if relayCheck is None:
+            self.airRelays.rebuild([], slack)
+        else:
+            self.airRelays.rebuild([u for u in units if relayCheck(u)], slack)
@@ -0,0 +1,181 @@
+import argparse
+import json
+import math
+import os
+from enum import Enum
+
+import numpy as np
+
+
+class TerrainType(Enum):
+    Open = 0
+    Road = 1
+    Forest = 2
+    Marsh = 3
+    Water = 4
+    Urban = 5
+
+
+# speed multiplier per terrain class; ground units crawl through marsh and
+# barely move in water, aircraft don't care what's below them
+GROUND_SPEED = {
+    TerrainType.Open: 1.0,
+    TerrainType.Road: 1.25,
+    TerrainType.Forest: 0.6,
+    TerrainType.Marsh: 0.35,
+    TerrainType.Water: 0.1,
+    TerrainType.Urban: 0.8,
+}
+AIR_SPEED = {t: 1.0 for t in TerrainType}
+
+# rough RGB of each class on map imagery, for from_image()
+PALETTE = {
+    TerrainType.Open: (170, 190, 120),
+    TerrainType.Road: (200, 200, 200),
+    TerrainType.Forest: (40, 90, 40),
+    TerrainType.Marsh: (100, 120, 90),
+    TerrainType.Water: (50, 90, 160),
+    TerrainType.Urban: (130, 120, 115),
+}
+
+
+def _lut(table: dict) -> np.ndarray:
+    # code -> multiplier, 256 entries so any uint8 in the file is a valid index
+    lut = np.ones(256, dtype=np.float64)
+    for t, m in table.items():
+        lut[t.value] = m
+    return lut
+
+
+class TerrainRaster:
+    """
+    Terrain class (uint8 TerrainType code) per cell, kept in a .npy file and
+    memory-mapped, so opening a large map is instant and only the pages
+    units actually stand on get read. A small .json next to it holds the
+    cell size. speed_multipliers() looks up many positions at once;
+    MovementEngine samples it for every moving unit each tick.
+    version goes up with every edit, for caches built on top of the terrain.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        self.cellSize = float(meta["cell_size"])
+        self.codes = np.load(path, mmap_mode="r+" if writable else "r")
+        self.rows, self.cols = self.codes.shape
+        self.width = self.cols * self.cellSize
+        self.height = self.rows * self.cellSize
+        self.groundLUT = _lut(GROUND_SPEED)
+        self.airLUT = _lut(AIR_SPEED)
+        self.version = 0
+
+    @classmethod
+    def create(cls, path: str, width: float, height: float, cellSize: float = 4.0,
+               fill: TerrainType = TerrainType.Open):
+        """New raster file covering width x height map units, every cell `fill`."""
+        cols = int(math.ceil(width / cellSize))
+        rows = int(math.ceil(height / cellSize))
+        codes = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(rows, cols))
+        codes[:] = fill.value
+        codes.flush()
+        del codes
+        with open(path + ".json", "w") as f:
+            json.dump({"cell_size": cellSize}, f)
+        return cls(path, writable=True)
+
+    @classmethod
+    def from_image(cls, image_path: str, path: str, width: float, height: float,
+                   cellSize: float = 4.0, palette: dict = None, band_rows: int = 256):
+        """
+        Classify map imagery into terrain: each cell gets the class whose
+        palette colour is nearest. The image is stretched over the map like
+        the page does; cells are written band by band so big maps never have
+        to fit in memory.
+        """
+        from PIL import Image
+
+        palette = palette or PALETTE
+        codes_of = np.array([t.value for t in palette], dtype=np.uint8)
+        colours = np.array(list(palette.values()), dtype=np.float32)
+
+        raster = cls.create(path, width, height, cellSize)
+        img = Image.open(image_path).convert("RGB").resize((raster.cols, raster.rows), Image.BOX)
+        for r0 in range(0, raster.rows, band_rows):
+            r1 = min(r0 + band_rows, raster.rows)
+            band = np.asarray(img.crop((0, r0, raster.cols, r1)), dtype=np.float32)
+            d2 = ((band[:, :, None, :] - colours[None, None, :, :]) ** 2).sum(axis=3)
+            raster.codes[r0:r1] = codes_of[d2.argmin(axis=2)]
+        raster.codes.flush()
+        raster.version += 1
+        return raster
+
+    # ---------------------------------------------------------------- lookups
+
+    def cell_index(self, x, y):
+        """Row / column arrays for map positions, clamped to the raster."""
+        cs = self.cellSize
+        c = np.clip((np.asarray(x, dtype=np.float64) // cs).astype(np.intp), 0, self.cols - 1)
+        r = np.clip((np.asarray(y, dtype=np.float64) // cs).astype(np.intp), 0, self.rows - 1)
+        return r, c
+
+    def terrain_at(self, x: float, y: float) -> TerrainType:
+        r, c = self.cell_index(x, y)
+        return TerrainType(int(self.codes[r, c]))
+
+    def speed_multipliers(self, x, y, ground) -> np.ndarray:
+        """Speed factor for each (x[i], y[i]); ground[i] picks the ground or the air table."""
+        r, c = self.cell_index(x, y)
+        codes = self.codes[r, c]
+        return np.where(ground, self.groundLUT[codes], self.airLUT[codes])
+
+    # ---------------------------------------------------------------- edits
+
+    def paint_rect(self, x0: float, y0: float, x1: float, y1: float, terrain: TerrainType):
+        r0, c0 = self.cell_index(min(x0, x1), min(y0, y1))
+        r1, c1 = self.cell_index(max(x0, x1), max(y0, y1))
+        self.codes[r0:r1 + 1, c0:c1 + 1] = terrain.value
+        self.version += 1
+
+    def paint_circle(self, x: float, y: float, radius: float, terrain: TerrainType):
+        r0, c0 = self.cell_index(x - radius, y - radius)
+        r1, c1 = self.cell_index(x + radius, y + radius)
+        cs = self.cellSize
+        cy = (np.arange(r0, r1 + 1) + 0.5) * cs - y
+        cx = (np.arange(c0, c1 + 1) + 0.5) * cs - x
+        disc = cy[:, None] ** 2 + cx[None, :] ** 2 <= radius * radius
+        block = self.codes[r0:r1 + 1, c0:c1 + 1]
+        block[disc] = terrain.value
+        self.version += 1
+
+    def flush(self):
+        if isinstance(self.codes, np.memmap) and self.codes.mode != "r":
+            self.codes.flush()
+
+
+def open_terrain(path: str, writable: bool = False):
+    """TerrainRaster for `path`, or None when there's no such file (terrain is optional)."""
+    if not path or not os.path.exists(path):
+        return None
+    return TerrainRaster(path, writable)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a terrain raster (.npy + .json) for W.A.T maps.")
+    parser.add_argument("out", help="output .npy path")
+    parser.add_argument("--image", default=None, help="classify this map image by colour")
+    parser.add_argument("--width", type=float, default=1024)
+    parser.add_argument("--height", type=float, default=1024)
+    parser.add_argument("--cell", type=float, default=4.0, help="cell size in map units")
+    args = parser.parse_args()
+
+    if args.image:
+        raster = TerrainRaster.from_image(args.image, args.out, args.width, args.height, args.cell)
+    else:
+        raster = TerrainRaster.create(args.out, args.width, args.height, args.cell)
+    counts = np.bincount(np.asarray(raster.codes).ravel(), minlength=len(TerrainType))
+    print(json.dumps({t.name: int(counts[t.value]) for t in TerrainType}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 import threading
-import time
 import math
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
-from flask import Flask, request, send_file, render_template_string, jsonify
+from flask import Flask, Response, abort, request, send_file, render_template_string, jsonify
 from io import BytesIO
 from PIL import Image, ImageDraw
-import UAVUnits, AntiAirUnits, LogHub, GroundUnits
+import UAVUnits, AntiAirUnits, LogHub, GameWorld, TickScheduler, Snapshot, CommandQueue, WorldView, TilePyramid, TerrainRaster
+import RoadNetwork
 
 app = Flask(__name__)
 
@@ -13,7 +16,31 @@ MAP_WIDTH = 1024
 MAP_HEIGHT = 1024
 TICK_RATE = 10
 PLAYER1 = 1
-ATTACK_RANGE = 3
+
+# /units?spectator=1 sends every player's entities (no fog of war); off unless
+# the admin running the server turns it on, otherwise every client has to say which player it is
+ALLOW_SPECTATORS = False
+
+# /map background grid; rendered once per configuration and kept in memory
+MAP_GRID_STEP = 50
+MAP_CACHE_SECONDS = 24 * 3600
+
+# map imagery served as a tile pyramid; cut into TILE_DIR in the background at
+# startup (and again whenever the source image changes) - /tiles answers 503
+# until it's ready. `python TilePyramid.py <image> tiles` cuts it beforehand.
+MAP_IMAGERY = "static/images/sampleMap.png"
+TILE_DIR = "tiles"
+TILE_CACHE_SIZE = 512
+
+# terrain classes driving movement speed (TerrainRaster .npy); no file = open ground everywhere
+TERRAIN_PATH = "terrain.npy"
+
+# road / bridge network supply trucks can drive on (GeoJSON in map coordinates); no file = no roads
+ROADS_PATH = "roads.geojson"
+
+# periodic binary snapshot of the world (0 = off)
+AUTOSAVE_SECONDS = 0
+AUTOSAVE_PATH = "autosave.wats"
 
 PAGE_TMPL = """
 <!DOCTYPE html>
@@ -224,19 +251,144 @@ PAGE_TMPL = """
     const zoomInBtn = document.getElementById("zoomInBtn");
     const zoomOutBtn = document.getElementById("zoomOutBtn");
     const zoomLabel = document.getElementById("zoomLabel");
-    const mapImage = new Image();
-    mapImage.src = "static/images/sampleMap.png";
-    let mapLoaded = false;
-    mapImage.onload = () => {
-      mapLoaded = true;
-    };
+    // background imagery comes as a tile pyramid (/tiles/z/x/y); only the
+    // tiles on screen are fetched, at the level that matches the zoom
+    let tileMeta = null;
+    const tileImages = new Map();   // "z/x/y" -> Image, least recently drawn first
+    const TILE_CACHE = 256;
+    function fetchTileMeta() {
+      fetch("/tiles/meta")
+        .then(res => {
+          // 503 while the server is still cutting the pyramid
+          if (res.status === 503) { setTimeout(fetchTileMeta, 5000); return null; }
+          return res.json();
+        })
+        .then(meta => { if (meta) { tileMeta = meta; getTile(0, 0, 0); } })
+        .catch(err => console.error("Failed to fetch tile info:", err));
+    }
+    fetchTileMeta();
+
+    // road network (/roads) drawn over the imagery; bridges get the DROGIMOSTY icon
+    let roads = null;
+    const bridgeImage = new Image();
+    bridgeImage.src = "static/ICONS/DROGIMOSTY ALLY.png";
+    const BRIDGE_ICON = 20;
+
+    function fetchRoads() {
+      return fetch("/roads")
+        .then(res => res.json())
+        .then(data => { roads = data; })
+        .catch(err => console.error("Failed to fetch roads:", err));
+    }
+    fetchRoads();
+
+    function getTile(z, x, y) {
+      const key = z + "/" + x + "/" + y;
+      let img = tileImages.get(key);
+      if (img) {
+        tileImages.delete(key);
+      } else {
+        img = new Image();
+        img.src = "/tiles/" + key + ".png?v=" + tileMeta.version;
+      }
+      tileImages.set(key, img);
+      if (tileImages.size > TILE_CACHE) tileImages.delete(tileImages.keys().next().value);
+      return img;
+    }
+
+    function tileReady(img) {
+      return img && img.complete && img.naturalWidth > 0;
+    }
+
+    function drawTiles() {
+      // first level whose tiles are at least as sharp as the screen at this zoom
+      let z = 0;
+      while (z < tileMeta.maxZoom && (tileMeta.tileSize << z) < canvas.width * zoom) z++;
+      const n = 1 << z;
+      const tw = canvas.width / n, th = canvas.height / n;
+      const x0 = Math.max(0, Math.floor(-offsetX / zoom / tw));
+      const y0 = Math.max(0, Math.floor(-offsetY / zoom / th));
+      const x1 = Math.min(n - 1, Math.floor((canvas.width - offsetX) / zoom / tw));
+      const y1 = Math.min(n - 1, Math.floor((canvas.height - offsetY) / zoom / th));
+      for (let x = x0; x <= x1; x++) {
+        for (let y = y0; y <= y1; y++) {
+          const img = getTile(z, x, y);
+          if (tileReady(img)) {
+            ctx.drawImage(img, x * tw, y * th, tw, th);
+            continue;
+          }
+          // still loading: stretch the matching part of a coarser tile we already have
+          for (let pz = z - 1; pz >= 0; pz--) {
+            const s = z - pz;
+            const parent = tileImages.get(pz + "/" + (x >> s) + "/" + (y >> s));
+            if (!tileReady(parent)) continue;
+            const part = tileMeta.tileSize >> s;
+            ctx.drawImage(parent, (x - ((x >> s) << s)) * part, (y - ((y >> s) << s)) * part, part, part,
+                          x * tw, y * th, tw, th);
+            break;
+          }
+        }
+      }
+    }
+
+    function drawRoads() {
+      const down = new Set(roads.bridges.filter(b => b.destroyed).map(b => b.id));
+      ctx.save();
+      ctx.lineCap = "round";
+      ctx.lineJoin = "round";
+      for (const line of roads.lines) {
+        const pts = line.points;
+        if (pts.length < 2) continue;
+        ctx.beginPath();
+        ctx.moveTo(pts[0][0], pts[0][1]);
+        for (let i = 1; i < pts.length; i++) ctx.lineTo(pts[i][0], pts[i][1]);
+        if (line.bridge === null) {
+          ctx.strokeStyle = "rgba(235, 225, 200, 0.7)";
+          ctx.lineWidth = 2;
+          ctx.setLineDash([]);
+        } else {
+          ctx.strokeStyle = down.has(line.bridge) ? "rgba(220, 40, 40, 0.8)" : "rgba(255, 200, 80, 0.9)";
+          ctx.lineWidth = 3;
+          ctx.setLineDash(down.has(line.bridge) ? [4, 4] : []);
+        }
+        ctx.stroke();
+      }
+      ctx.setLineDash([]);
+      const half = BRIDGE_ICON / 2;
+      for (const b of roads.bridges) {
+        if (bridgeImage.complete && bridgeImage.naturalWidth > 0) {
+          ctx.drawImage(bridgeImage, b.x - half, b.y - half, BRIDGE_ICON, BRIDGE_ICON);
+        }
+        if (b.destroyed) {
+          ctx.beginPath();
+          ctx.moveTo(b.x - half, b.y - half);
+          ctx.lineTo(b.x + half, b.y + half);
+          ctx.moveTo(b.x + half, b.y - half);
+          ctx.lineTo(b.x - half, b.y + half);
+          ctx.strokeStyle = "rgba(220, 40, 40, 0.9)";
+          ctx.lineWidth = 3;
+          ctx.stroke();
+        }
+      }
+      ctx.restore();
+    }
+
+    function bridgeAt(x, y) {
+      if (!roads) return null;
+      const half = BRIDGE_ICON / 2;
+      return roads.bridges.find(b => Math.abs(b.x - x) <= half && Math.abs(b.y - y) <= half) || null;
+    }
 
     // NEW: visibility flags
     let showTransmission = true;
     let showEnemyAA = true;
 
-    // assume local player is 1 (server also uses PLAYER1 = 1)
-    const localPlayer = 1;
+    // local player comes from the page URL (/?player=2), default 1 (server PLAYER1 = 1);
+    // the server only sends what this player can see. /?spectator=1 shows everything,
+    // if the server allows spectators (ALLOW_SPECTATORS)
+    const pageParams = new URLSearchParams(window.location.search);
+    const localPlayer = Math.max(1, Math.trunc(Number(pageParams.get("player") ?? 1)) || 1);
+    const playerQuery = "player=" + localPlayer + (pageParams.get("spectator") === "1" ? "&spectator=1" : "");
 
     const chkTransmission = document.getElementById("chkTransmission");
     const chkEnemyAA = document.getElementById("chkEnemyAA");
@@ -350,6 +502,8 @@ PAGE_TMPL = """
     let spawnUavFromKeyboard = false;
 
     let units = [];             // will be fetched from server
+    let unitsById = new Map();  // id -> unit, patched in place by /units deltas
+    let unitsVersion = -1;      // last server view version we applied
     let selectedUnitId = null;
     let selectedUnitSnapshot = null;
     let moveTarget = null;      // { x:…, y:… } or null
@@ -500,40 +654,194 @@ PAGE_TMPL = """
     }
 
 
-    function fetchUnits() {
-      fetch("/units")
-        .then(res => res.json())
-        .then(data => {
-          units = data;
-          units.forEach(u => {
-            const img = new Image();
-            img.src = u.image;
-            u._img = img;
-          });
-            if (selectedUnitId !== null) {
-              const selected = units.find(u => u.id === selectedUnitId);
-              if (selected) {
-                // always refresh fast-changing stuff for retrans UAV
-                if (selected.unit_class === "RetransmiterUAV") {
-                  updateInfoPanelDynamic(selected);
-                }
-            
-                // rebuild whole panel only if structure actually changed
-                if (!selectedUnitSnapshot || !isSameUnitSnapshot(selectedUnitSnapshot, selected)) {
-                  updateInfoPanel(selected);
-                  selectedUnitSnapshot = makeUnitSnapshot(selected);
-                }
-              } else {
-                infoPanel.innerHTML = "No unit selected.";
-                selectedUnitId = null;
-                selectedUnitSnapshot = null;
-              }
+    function loadUnitImage(u) {
+      const img = new Image();
+      img.src = u.image;
+      u._img = img;
+    }
+
+    // apply a /units?since=... answer: either the full list or what changed
+    function applyUnitsUpdate(data) {
+      // overlapping fetches can come back out of order; don't step a delta backwards
+      // (full lists always apply, the server may have restarted with fresh versions)
+      if (!data.full && data.version <= unitsVersion) return;
+      if (data.full) {
+        unitsById = new Map();
+        data.units.forEach(u => { loadUnitImage(u); unitsById.set(u.id, u); });
+      } else {
+        data.removed.forEach(id => unitsById.delete(id));
+        data.created.forEach(u => { loadUnitImage(u); unitsById.set(u.id, u); });
+        data.changed.forEach(c => {
+          const u = unitsById.get(c.id);
+          if (!u) return;
+          Object.assign(u, c.set);
+          c.unset.forEach(k => { delete u[k]; });
+          if ("image" in c.set) loadUnitImage(u);
+        });
+      }
+      unitsVersion = data.version;
+      units = Array.from(unitsById.values());
+    }
+
+    // decoder for /units?format=bin, mirrors WireFormat.py
+    const utf8 = new TextDecoder();
+    function decodeUnitFrame(buf) {
+      const dv = new DataView(buf);
+      if (utf8.decode(new Uint8Array(buf, 0, 4)) !== "WATU" || dv.getUint16(4, true) !== 1) {
+        throw new Error("bad unit frame");
+      }
+      const ntables = dv.getUint16(6, true);
+      const version = dv.getUint32(8, true), tick = dv.getUint32(12, true);
+      const nstrings = dv.getUint32(20, true), textLen = dv.getUint32(24, true);
+      const pad4 = n => (4 - n % 4) % 4;
+      let pos = 28;
+      const offs = new Uint32Array(buf, pos, nstrings + 1);
+      pos += (nstrings + 1) * 4;
+      const strings = [];
+      for (let i = 0; i < nstrings; i++) {
+        strings.push(utf8.decode(new Uint8Array(buf, pos + offs[i], offs[i + 1] - offs[i])));
+      }
+      pos += textLen + pad4(textLen);
+
+      const units = [];
+      for (let t = 0; t < ntables; t++) {
+        const rows = dv.getUint32(pos, true), ncols = dv.getUint32(pos + 4, true);
+        pos += 8;
+        const cols = [];
+        for (let c = 0; c < ncols; c++, pos += 8) {
+          cols.push([strings[dv.getUint32(pos, true)], dv.getUint8(pos + 4)]);
+        }
+        const table = [];
+        for (let r = 0; r < rows; r++) table.push({});
+        for (const [key, kind] of cols) {
+          if (kind === 0) {           // CONST
+            const v = strings[dv.getUint32(pos, true)];
+            table.forEach(u => { u[key] = JSON.parse(v); });
+            pos += 4;
+            continue;
+          }
+          let size;
+          if (kind === 1) {           // INT32
+            const a = new Int32Array(buf, pos, rows);
+            a.forEach((v, r) => { table[r][key] = v === -2147483648 ? null : v; });
+            size = rows * 4;
+          } else if (kind === 2) {    // FLOAT32
+            const a = new Float32Array(buf, pos, rows);
+            a.forEach((v, r) => { table[r][key] = Number.isNaN(v) ? null : v; });
+            size = rows * 4;
+          } else if (kind === 4) {    // BOOL
+            const a = new Uint8Array(buf, pos, rows);
+            a.forEach((v, r) => { table[r][key] = v === 2 ? null : v === 1; });
+            size = rows;
+          } else if (kind === 5) {    // VEC2
+            const a = new Float32Array(buf, pos, rows * 2);
+            for (let r = 0; r < rows; r++) {
+              table[r][key] = Number.isNaN(a[2 * r]) ? null : [a[2 * r], a[2 * r + 1]];
             }
-          return units;
-        })
+            size = rows * 8;
+          } else {                    // STRING (3) / JSON (6)
+            const a = new Uint32Array(buf, pos, rows);
+            a.forEach((v, r) => {
+              table[r][key] = v === 0xFFFFFFFF ? null : (kind === 3 ? strings[v] : JSON.parse(strings[v]));
+            });
+            size = rows * 4;
+          }
+          pos += size + pad4(size);
+        }
+        units.push(...table);
+      }
+      return { version: version, tick: tick, full: true, units: units };
+    }
+
+    // viewport culling: only ask for the part of the map on screen (rounded out
+    // to VIEW_QUANTUM so small pans don't change it) plus the selected unit;
+    // when that query changes we start over with a full list for the new one
+    const VIEW_QUANTUM = 128;
+
+    function unitsQuery() {
+      const q = VIEW_QUANTUM;
+      const x0 = Math.floor(-offsetX / zoom / q) * q;
+      const y0 = Math.floor(-offsetY / zoom / q) * q;
+      const x1 = Math.ceil((canvas.width - offsetX) / zoom / q) * q;
+      const y1 = Math.ceil((canvas.height - offsetY) / zoom / q) * q;
+      let query = playerQuery + "&view=" + [x0, y0, x1, y1].join(",");
+      if (selectedUnitId !== null) query += "&include=" + selectedUnitId;
+      return query;
+    }
+
+    let unitsScope = unitsQuery();
+
+    function checkUnitsScope() {
+      const query = unitsQuery();
+      if (query === unitsScope) return;
+      unitsScope = query;
+      unitsVersion = -1;
+      fetchUnits();
+      if (unitsStream) connectUnitsStream();
+    }
+
+    function fetchUnits() {
+      // a full list (first load / resync) comes as a binary frame, deltas as JSON
+      const scope = unitsScope;
+      const req = unitsVersion < 0
+        ? fetch("/units?format=bin&" + scope).then(res => res.arrayBuffer()).then(decodeUnitFrame)
+        : fetch("/units?since=" + unitsVersion + "&" + scope).then(res => res.json());
+      return req
+        .then(data => scope === unitsScope ? onUnitsUpdate(data) : units)
         .catch(err => console.error("Failed to fetch units:", err));
     }
 
+    function onUnitsUpdate(data) {
+      applyUnitsUpdate(data);
+      if (selectedUnitId !== null) {
+        const selected = units.find(u => u.id === selectedUnitId);
+        if (selected) {
+          // always refresh fast-changing stuff for retrans UAV
+          if (selected.unit_class === "RetransmiterUAV") {
+            updateInfoPanelDynamic(selected);
+          }
+      
+          // rebuild whole panel only if structure actually changed
+          if (!selectedUnitSnapshot || !isSameUnitSnapshot(selectedUnitSnapshot, selected)) {
+            updateInfoPanel(selected);
+            selectedUnitSnapshot = makeUnitSnapshot(selected);
+          }
+        } else {
+          infoPanel.innerHTML = "No unit selected.";
+          selectedUnitId = null;
+          selectedUnitSnapshot = null;
+        }
+      }
+      return units;
+    }
+
+    // live updates: server pushes one delta per tick; while the stream is
+    // down (or EventSource is missing) fall back to polling /units
+    let unitsStream = null;
+    let pollTimer = null;
+
+    function startPolling() {
+      if (pollTimer === null) pollTimer = setInterval(fetchUnits, 200);
+    }
+
+    function stopPolling() {
+      if (pollTimer !== null) { clearInterval(pollTimer); pollTimer = null; }
+    }
+
+    function connectUnitsStream() {
+      if (!window.EventSource) { startPolling(); return; }
+      if (unitsStream) unitsStream.close();
+      unitsStream = new EventSource("/units/stream?since=" + unitsVersion + "&" + unitsScope);
+      unitsStream.onopen = stopPolling;
+      unitsStream.addEventListener("units", ev => onUnitsUpdate(JSON.parse(ev.data)));
+      unitsStream.onerror = () => {
+        // reconnect ourselves so the new stream starts from what we have
+        unitsStream.close();
+        startPolling();
+        setTimeout(connectUnitsStream, 2000);
+      };
+    }
+
     canvas.addEventListener("click", (event) => {
 
         const rect = canvas.getBoundingClientRect();
@@ -581,6 +889,25 @@ PAGE_TMPL = """
                 console.error(err);
                 adminMsg.textContent = "Error destroying";
               });
+            } else if (bridgeAt(clickX, clickY)) {
+              // bridges aren't units: destroy (or repair a destroyed one) through /admin_bridge
+              const bridge = bridgeAt(clickX, clickY);
+              fetch("/admin_bridge", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ id: bridge.id, action: bridge.destroyed ? "repair" : "destroy" })
+              })
+              .then(res => res.json())
+              .then(d => {
+                adminMsg.textContent = d.status === "ok"
+                  ? (d.action === "repair" ? "Repaired " : "Destroyed ") + bridge.name
+                  : (d.message || "Error with bridge");
+                fetchRoads();
+              })
+              .catch(err => {
+                console.error(err);
+                adminMsg.textContent = "Error with bridge";
+              });
             } else {
               adminMsg.textContent = "No unit/structure under click.";
             }
@@ -1171,11 +1498,13 @@ PAGE_TMPL = """
         ctx.save();
         ctx.setTransform(zoom, 0, 0, zoom, offsetX, offsetY);
     
-        if (mapLoaded) {
-          ctx.drawImage(mapImage, 0, 0, canvas.width, canvas.height);
-        } else {
-          ctx.fillStyle = "#303030"; // fallback background
-          ctx.fillRect(0, 0, canvas.width, canvas.height);
+        ctx.fillStyle = "#303030"; // fallback background while tiles load
+        ctx.fillRect(0, 0, canvas.width, canvas.height);
+        if (tileMeta) {
+          drawTiles();
+        }
+        if (roads) {
+          drawRoads();
         }
 
       for (const u of units) {
@@ -1372,13 +1701,13 @@ PAGE_TMPL = """
       if (!lastTimestamp) lastTimestamp = timestamp;
       const dt = timestamp - lastTimestamp;
       lastTimestamp = timestamp;
+      checkUnitsScope();
       drawUnits();
       window.requestAnimationFrame(gameLoop);
     }
 
     // initialization
-    fetchUnits();
-    setInterval(fetchUnits, 200)
+    fetchUnits().then(connectUnitsStream);
     window.requestAnimationFrame(gameLoop);
   </script>
 </body>
@@ -1389,20 +1718,66 @@ selected_unit_id = None  # server-side info about selection
 
 SIM_PAUSED = False
 
-#units = [UAVUnits.LoiteringMunition("Termopile", 50, 55, UAVUnits.UnitState.Landed, (100,100), "static/ICONS/UAV ALLY.png", UAVUnits.ArmourType.Unarmored, 1,1.7,0.0083, 0.0138,1.0,UAVUnits.ExplosiveType.HEAT,[2400])]
-units = []
-
-#aaUnits = [AntiAirUnits.AntiAir("Wuefkin",20,0, UAVUnits.UnitState.Idle, (400,400), "static/ICONS/AIR DEF ENEMY.png", UAVUnits.ArmourType.LightArmour, 2, 150, 3, 1, 2, AntiAirUnits.AAStatus.Idle)]
-aaUnits = []
-
-#logBases = [LogHub.LogHub("14 Baza Logistyczna", (150,150), "static/ICONS/HQ_ALLY.png",1, 300)]
-logBases = []
-
-ground_retransmitters = []
-
-ewarUnits = []
+# fixed-rate driver for simulation_tick, also collects tick timing stats
+tick_scheduler = TickScheduler.FixedTimestepScheduler(TICK_RATE, maxSubSteps=5)
+
+# the whole simulated world (units, structures, indices) lives here
+world = GameWorld.GameWorld(MAP_WIDTH, MAP_HEIGHT)
+world.planInBackground = True
+world.terrain = TerrainRaster.open_terrain(TERRAIN_PATH)
+world.roads = RoadNetwork.open_roads(ROADS_PATH)
+last_autosave = 0.0
+# the sim thread only takes the snapshot bytes; compressing and writing them happens here
+autosaver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="autosave")
+autosave_job = None
+
+# frozen copies of the world published after every tick: the sim thread hands
+# over what changed, a publisher thread builds the view; read endpoints only
+# ever look at views.latest (swapping the reference is atomic)
+views = WorldView.ViewHistory(background=True)
+views.publish(world)
+
+# other read-only state the endpoints need, published by the sim thread in
+# the same way: the road network as /roads sends it (rebuilt when
+# roads.version moves) and the world-side counters for /tick_stats
+published_roads = None
+published_stats = {}
+
+
+def publish_state():
+    global published_roads, published_stats
+    if world.roads is None:
+        if published_roads is None:
+            published_roads = {"version": 0, "lines": [], "bridges": []}
+    elif published_roads is None or published_roads["version"] != world.roads.version:
+        published_roads = world.roads.to_json()
+    stats = {}
+    if world.planner is not None:
+        stats["paths"] = world.planner.stats()
+    if world.roads is not None:
+        stats["roads"] = world.roads.stats()
+    published_stats = stats
+
+
+publish_state()
+
+# only the simulation thread writes to the world: request handlers queue a
+# command and wait for its result, the sim thread runs them between ticks
+commands = CommandQueue.CommandQueue()
+COMMAND_TIMEOUT = 5.0
+
+
+def run_command(fn, *args):
+    """Run fn(*args) on the simulation thread; fn returns a JSON-able body or (body, status)."""
+    try:
+        result = commands.call(fn, *args, timeout=COMMAND_TIMEOUT)
+    except CommandQueue.TimeoutError:
+        return jsonify({"status": "error", "message": "simulation busy, try again"}), 503
+    if isinstance(result, tuple):
+        body, status = result
+        return jsonify(body), status
+    return jsonify(result)
 
-pending_attacks = {}
 
 @app.route("/")
 def index():
@@ -1410,149 +1785,171 @@ def index():
 
 
 # --- MAP IMAGE (background only) ---
+_map_cache = {}  # (width, height, grid step) -> (png bytes, etag, last modified)
+_map_lock = threading.Lock()
+
+
+def map_png():
+    key = (MAP_WIDTH, MAP_HEIGHT, MAP_GRID_STEP)
+    # request threads share the cache; the lock also makes concurrent first hits render once
+    with _map_lock:
+        cached = _map_cache.get(key)
+        if cached is not None:
+            return cached
+
+        img = Image.new("RGB", (MAP_WIDTH, MAP_HEIGHT), color=(255, 255, 255))
+        draw = ImageDraw.Draw(img)
+
+        # draw light grid
+        step = MAP_GRID_STEP
+        for x in range(0, MAP_WIDTH, step):
+            draw.line((x, 0, x, MAP_HEIGHT), fill=(230, 230, 230))
+        for y in range(0, MAP_HEIGHT, step):
+            draw.line((0, y, MAP_WIDTH, y), fill=(230, 230, 230))
+
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        png = buf.getvalue()
+        # only the current configuration is worth keeping
+        _map_cache.clear()
+        cached = _map_cache[key] = (png, hashlib.sha1(png).hexdigest(),
+                                    datetime.now(timezone.utc).replace(microsecond=0))
+        return cached
+
+
 @app.route("/map")
 def map_image():
-    img = Image.new("RGB", (MAP_WIDTH, MAP_HEIGHT), color=(255, 255, 255))
-    draw = ImageDraw.Draw(img)
+    png, etag, modified = map_png()
+    # conditional=True answers If-None-Match / If-Modified-Since with 304
+    return send_file(BytesIO(png), mimetype="image/png", etag=etag, last_modified=modified,
+                     max_age=MAP_CACHE_SECONDS, conditional=True)
 
-    # draw light grid
-    step = 50
-    for x in range(0, MAP_WIDTH, step):
-        draw.line((x, 0, x, MAP_HEIGHT), fill=(230, 230, 230))
-    for y in range(0, MAP_HEIGHT, step):
-        draw.line((0, y, MAP_WIDTH, y), fill=(230, 230, 230))
 
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return send_file(buf, mimetype="image/png")
+# --- MAP TILES ---
+_tiles = None
 
 
-# --- API: units ---
+def prepare_tiles():
+    # startup job: a big source takes a while to cut, never do that inside a request
+    global _tiles
+    try:
+        _tiles = TilePyramid.TileStore.open_or_build(MAP_IMAGERY, TILE_DIR, capacity=TILE_CACHE_SIZE)
+    except (OSError, ValueError) as e:
+        print(f"[SERVER] Map tiles unavailable: {e}")
 
-@app.route("/units")
-def get_units():
-    unit_data = []
-
-    # include UAVs, AA and bases
-    all_units = units + aaUnits + logBases + ground_retransmitters + ewarUnits
-
-    for u in all_units:
-        # base dictionary common for everything
-        data = {
-            "id": getattr(u, "id", None),   # bases don't have id yet, we'll fix below
-            "name": getattr(u, "name", "Unknown"),
-            "x": u.positionX,
-            "y": u.positionY,
-            "image": getattr(u, "image", None),
-            "player": getattr(u, "player", 0),
-            "unit_class": u.__class__.__name__,
-            "size": 28,
-            "viewRange":getattr(u, "viewRange", 180)
-        }
 
-        # extra fields for UAVs
-        if isinstance(u, UAVUnits.UAV):
-            data.update({
-                "state": u.state.name,
-                "chanceToHit": getattr(u, "chanceToHit", None),
-                "baseSpeed": getattr(u, "baseSpeed", None),
-                "armourType": u.armourType.name if hasattr(u, "armourType") else None,
-                "currentBattery": round(u.currentBattery, 2),
-                "currentWeight": u.currentWeight,
-                "idleBatteryDrainPerTick": u.idleBatteryDrainPerTick,
-                "moveBatteryDrainPerTick": u.moveBatteryDrainPerTick,
-            })
-            if getattr(u, "destination", None) is not None:
-                # convert tuple -> list for JSON
-                data["destination"] = [u.destination[0], u.destination[1]]
-            if hasattr(u, "move_queue") and u.move_queue:
-                data["move_queue"] = [[pt[0], pt[1]] for pt in u.move_queue]
-            else:
-                data["move_queue"] = []
-
-        if isinstance(u, UAVUnits.RetransmiterUAV):
-            data.update({
-                "transmissionRange": u.transmissionRange,
-                "is_retransmitting": getattr(u, "is_retransmitting", False)
-            })
+def tile_store():
+    if _tiles is None:
+        abort(Response("map tiles not ready yet", 503, {"Retry-After": "5"}))
+    return _tiles
 
-        # extra fields for LoiteringMunition
-        if isinstance(u, UAVUnits.LoiteringMunition):
-            data.update({
-                "payload": u.payload,
-                "explosiveType": u.explosiveType.name,
-            })
 
-        if isinstance(u, GroundUnits.CombatVehicle):
-            data.update({
-                "shootingRange": getattr(u, "shootingRange", None),
-                "ammoType": u.ammoType.name if hasattr(u, "ammoType") else None,
-                "ammoCount": getattr(u, "ammoCount", None),
-                "fuel": getattr(u, "currentFuel", None),
-                "maxFuel": getattr(u, "maxFuel", None)
-            })
+@app.route("/tiles/meta")
+def tiles_meta():
+    store = tile_store()
+    return jsonify({"tileSize": store.tile_size, "maxZoom": store.max_zoom,
+                    "version": store.version, "cache": store.stats()})
 
-        if isinstance(u, GroundUnits.SupplyVehicle):
-            data.update({
-                "cargoType": u.cargoType.name,
-                "cargoAmmount": u.cargoAmmount,
-                "armourType": u.armourType.name,
-                "fuel": getattr(u, "currentFuel", None),
-                "maxFuel": getattr(u, "maxFuel", None)
-            })
 
-        # extra fields for AntiAir
-        if isinstance(u, AntiAirUnits.AntiAir):
-            data.update({
-                "state": u.state.name,
-                "armourType": u.armourType.name if hasattr(u, "armourType") else None,
-                "range": u.range,
-                "aa_state": u.AAstate.name,
-                "ammo": u.ammoCount,
-                "ammoType": u.ammoType.name if hasattr(u, "ammoType") else None
-            })
-            if u.target is not None:
-                data["aa_target"] = [u.target.positionX, u.target.positionY]
-                data["aa_target_name"] = getattr(u.target, "name", "Unknown")
-            else:
-                data["aa_target"] = None
-                data["aa_target_name"] = None
-
-        # extra fields for LogHub (the bases)
-        if isinstance(u, LogHub.LogHub):
-            # turn enum-keyed dict into plain {name: amount}
-            storage_dict = {}
-            if getattr(u, "inStorage", None):
-                for k, v in u.inStorage.items():
-                    # k is SupplyType
-                    storage_dict[k.name if hasattr(k, "name") else str(k)] = v
-
-            data.update({
-                "transmissionRange": u.transmissionRange,
-                "available_retransmitters": getattr(u, "available_retransmitters", 0),
-                "current_spawned_uavs": getattr(u, "current_spawned_uavs", 0),
-                "max_spawned_uavs": getattr(u, "max_deployed_uavs", 5),
-                "current_air_retransmitters": getattr(u, "current_air_retransmitters", 0),
-                "max_air_retransmitters": getattr(u, "max_air_retransmitters", 2),
-                "storage": storage_dict
-            })
+@app.route("/tiles/<int:z>/<int:x>/<int:y>")
+@app.route("/tiles/<int:z>/<int:x>/<int:y>.png")
+def map_tile(z, x, y):
+    store = tile_store()
+    data = store.get(z, x, y)
+    if data is None:
+        abort(404)
+    return send_file(BytesIO(data), mimetype="image/png", etag=store.etag(z, x, y),
+                     max_age=MAP_CACHE_SECONDS, conditional=True)
 
-        if isinstance(u, LogHub.GroundRetransmitter):
-            data.update({
-                "transmissionRange": u.transmissionRange,
-                "parent_base_id": u.parent_base_id
-            })
 
-        if isinstance(u, LogHub.ElectronicWarfare):
-            data.update({
-                "jammingRange": u.jammingRange,
-                "jammingFreq": getattr(u, "jammingFreq", [])
-            })
+# --- ROADS ---
+@app.route("/roads")
+def roads():
+    # published copy; the network itself only changes on the sim thread
+    return jsonify(published_roads)
+
 
-        unit_data.append(data)
+@app.route("/admin_bridge", methods=["POST"])
+def admin_bridge():
+    return run_command(cmd_admin_bridge, request.get_json())
 
-    return jsonify(unit_data)
+
+def cmd_admin_bridge(data):
+    bridge_id = data.get("id")
+    action = data.get("action", "destroy")
+    if world.roads is None or bridge_id not in world.roads.bridges:
+        return {"status": "error", "message": "bridge not found"}, 404
+    if action == "destroy":
+        changed = world.destroy_bridge(bridge_id)
+    elif action == "repair":
+        changed = world.repair_bridge(bridge_id)
+    else:
+        return {"status": "error", "message": "action must be destroy or repair"}, 400
+    return {"status": "ok", "id": bridge_id, "action": action, "changed": changed}
+
+
+# --- API: units ---
+
+# extra map pixels around a client's viewport, so units just off screen are already there
+VIEWPORT_MARGIN = 64
+
+
+def viewer_scope():
+    """
+    What the requesting client should get:
+      ?player=N               only what player N can see (fog of war); required
+      ?spectator=1            everything instead, only if ALLOW_SPECTATORS (else 403)
+      ?view=x0,y0,x1,y1       only that map rectangle (+ VIEWPORT_MARGIN)
+      ?include=id,id          those ids as well, wherever they are (e.g. the selected unit)
+    None when nothing is filtered.
+    """
+    if request.args.get("spectator") == "1":
+        if not ALLOW_SPECTATORS:
+            abort(403)
+        player = None
+    else:
+        player = request.args.get("player", type=int)
+        if player is None or player <= 0:
+            abort(400)
+    rect = None
+    include = frozenset()
+    try:
+        if request.args.get("view"):
+            x0, y0, x1, y1 = (float(v) for v in request.args["view"].split(","))
+            m = VIEWPORT_MARGIN
+            rect = (min(x0, x1) - m, min(y0, y1) - m, max(x0, x1) + m, max(y0, y1) + m)
+        if request.args.get("include"):
+            include = frozenset(int(v) for v in request.args["include"].split(",") if v)
+    except ValueError:
+        abort(400)
+    if player is None and rect is None:
+        return None
+    return WorldView.Scope(player, rect, include)
+
+
+@app.route("/units")
+def get_units():
+    # whatever the sim thread published last; never touches the live world
+    view = views.latest
+    scope = viewer_scope()
+    headers = {"X-Sim-Tick": str(view.tick), "X-View-Version": str(view.version)}
+    if request.args.get("format") == "bin":
+        # full list only, see WireFormat for the layout
+        return Response(view.to_binary(scope), mimetype="application/octet-stream", headers=headers)
+    since = request.args.get("since", type=int)
+    if since is None:
+        body = view.to_json(scope)
+    else:
+        # {"version", "full": true, "units"} or {"version", "created", "changed", "removed"}
+        body = views.delta_json(since, view, scope)
+    return Response(body, mimetype="application/json", headers=headers)
+
+@app.route("/units/stream")
+def units_stream():
+    # one push per published view instead of the page polling /units
+    since = request.args.get("since", -1, type=int)
+    return Response(views.stream(since, viewer_scope()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # --- API: select unit ---
 @app.route("/select_unit", methods=["POST"])
@@ -1568,94 +1965,126 @@ def select_unit():
 
 @app.route("/move_unit", methods=["POST"])
 def move_unit():
-    data = request.get_json()
+    return run_command(cmd_move_unit, request.get_json())
+
+
+def cmd_move_unit(data):
     unit_id = data.get("id")
     x = data.get("x")
     y = data.get("y")
     queue = bool(data.get("queue", False))
 
-    for u in units:
-        if u.id == unit_id and u.player == PLAYER1:
+    u = world.registry.get_unit(unit_id)
+    # AA sites are units too, but they live in aaUnits and can't be moved
+    if u is None or u.player != PLAYER1 or isinstance(u, AntiAirUnits.AntiAir):
+        return {"status": "error", "message": "unit not found"}, 404
+
+    if isinstance(u, UAVUnits.UAV):
+        if not world.is_uav_in_comm(u):
+            return {"status": "error", "message": "UAV out of transmission range"}, 400
+
+    if queue:
+        # make sure queue exists
+        if not hasattr(u, "move_queue"):
+            u.move_queue = []
+
+        # if unit is not moving right now, treat this as the first move
+        if u.state != UAVUnits.UnitState.Moving or u.destination is None:
+            world.route_unit(u, (x, y), clear_queue=False)
+            print(f"[SERVER] (queued-first) moving unit {unit_id} to ({x}, {y})")
+            return {"status": "ok", "unit_id": unit_id, "destination": (x, y), "queued": True}
+        else:
+            # already moving -> append (ground units: the route from the last queued point)
+            world.route_unit(u, (x, y), clear_queue=False)
+            print(f"[SERVER] Queued move for unit {unit_id} to ({x}, {y})")
+            return {"status": "ok", "unit_id": unit_id, "queued_destination": (x, y), "queued": True}
 
-            if isinstance(u, UAVUnits.UAV):
-                if not is_uav_in_comm(u, logBases, ground_retransmitters):
-                    return jsonify({"status": "error", "message": "UAV out of transmission range"}), 400
+    # normal click (no queue): overwrite
+    world.route_unit(u, (x, y))
+    print(f"[SERVER] Moving unit {unit_id} to ({x}, {y})")
+    return {"status": "ok", "unit_id": unit_id, "destination": (x, y)}
 
-            if queue:
-                # make sure queue exists
-                if not hasattr(u, "move_queue"):
-                    u.move_queue = []
 
-                # if unit is not moving right now, treat this as the first move
-                if u.state != UAVUnits.UnitState.Moving or u.destination is None:
-                    u.move_unit((x, y), clear_queue=False)
-                    print(f"[SERVER] (queued-first) moving unit {unit_id} to ({x}, {y})")
-                    return jsonify({"status": "ok", "unit_id": unit_id, "destination": (x, y), "queued": True})
-                else:
-                    # already moving -> append
-                    u.move_queue.append((x, y))
-                    print(f"[SERVER] Queued move for unit {unit_id} to ({x}, {y})")
-                    return jsonify({"status": "ok", "unit_id": unit_id, "queued_destination": (x, y), "queued": True})
+@app.route("/move_units", methods=["POST"])
+def move_units():
+    return run_command(cmd_move_units, request.get_json())
 
-            # normal click (no queue): overwrite
-            u.move_unit((x, y))
-            print(f"[SERVER] Moving unit {unit_id} to ({x}, {y})")
-            return jsonify({"status": "ok", "unit_id": unit_id, "destination": (x, y)})
 
-    return jsonify({"status": "error", "message": "unit not found"}), 404
+def cmd_move_units(data):
+    # group move: every listed unit to one point (ground units share a flow field)
+    x = data.get("x")
+    y = data.get("y")
+    movable = []
+    skipped = []
+    for unit_id in data.get("ids", []):
+        u = world.registry.get_unit(unit_id)
+        if u is None or u.player != PLAYER1 or isinstance(u, AntiAirUnits.AntiAir) \
+           or (isinstance(u, UAVUnits.UAV) and not world.is_uav_in_comm(u)):
+            skipped.append(unit_id)
+            continue
+        movable.append(u)
+    if not movable:
+        return {"status": "error", "message": "no movable units", "skipped": skipped}, 400
+
+    world.route_group(movable, (x, y))
+    print(f"[SERVER] Moving {len(movable)} units to ({x}, {y})")
+    return {"status": "ok", "unit_ids": [u.id for u in movable], "skipped": skipped, "destination": (x, y)}
 
 
 
 @app.route("/attack_unit", methods=["POST"])
 def attack_unit():
-    data = request.get_json()
+    return run_command(cmd_attack_unit, request.get_json())
+
+
+def cmd_attack_unit(data):
     attacker_id = data.get("attacker_id")
     target_id = data.get("target_id")
 
     # we won’t attack right now – we just store the intent
-    global pending_attacks
-
     # optional: validate attacker exists and is LM
-    attacker = next((u for u in units if u.id == attacker_id), None)
+    attacker = world.registry.get_unit(attacker_id)
     if attacker is None:
-        return jsonify({"status": "error", "message": "attacker not found"}), 404
+        return {"status": "error", "message": "attacker not found"}, 404
 
     if not isinstance(attacker, UAVUnits.LoiteringMunition):
-        return jsonify({"status": "error", "message": "attacker is not LoiteringMunition"}), 400
+        return {"status": "error", "message": "attacker is not LoiteringMunition"}, 400
 
-    # also check that target exists (in any list)
-    all_units = units + aaUnits
-    target = next((u for u in all_units if u.id == target_id), None)
+    # also check that target exists (UAVs, ground units and AA)
+    target = world.registry.get_unit(target_id)
     if target is None:
-        return jsonify({"status": "error", "message": "target not found"}), 404
+        return {"status": "error", "message": "target not found"}, 404
 
     # store order
-    pending_attacks[attacker_id] = target_id
+    world.pending_attacks[attacker_id] = target_id
 
-    return jsonify({"status": "ok", "message": "attack order stored"})
+    return {"status": "ok", "message": "attack order stored"}
 
 @app.route("/place_retransmitter", methods=["POST"])
 def place_retransmitter():
-    data = request.get_json()
+    return run_command(cmd_place_retransmitter, request.get_json())
+
+
+def cmd_place_retransmitter(data):
     base_id = data.get("base_id")
     x = data.get("x")
     y = data.get("y")
 
     # find the base
-    base = next((b for b in logBases if b.id == base_id), None)
+    base = world.get_base(base_id)
     if base is None:
-        return jsonify({"status": "error", "message": "base not found"}), 404
+        return {"status": "error", "message": "base not found"}, 404
 
     # check if base still has quota
     if getattr(base, "available_retransmitters", 0) <= 0:
-        return jsonify({"status": "error", "message": "this base has no retransmitters left"}), 400
+        return {"status": "error", "message": "this base has no retransmitters left"}, 400
 
     # check that (x, y) is inside base transmission range
     dx = x - base.positionX
     dy = y - base.positionY
     dist = math.hypot(dx, dy)
     if dist > base.transmissionRange:
-        return jsonify({"status": "error", "message": "point outside base transmission range"}), 400
+        return {"status": "error", "message": "point outside base transmission range"}, 400
 
     # create retransmitter
     retrans = LogHub.GroundRetransmitter(
@@ -1666,74 +2095,81 @@ def place_retransmitter():
         transmissionRange=200,
         parent_base_id=base_id
     )
-    ground_retransmitters.append(retrans)
+    world.spawn(retrans)
 
     # decrease available on the base
     base.available_retransmitters -= 1
+    world.touch(base)
 
-    return jsonify({"status": "ok", "available": base.available_retransmitters})
+    return {"status": "ok", "available": base.available_retransmitters}
 
 @app.route("/admin_destroy", methods=["POST"])
 def admin_destroy():
-    data = request.get_json()
+    return run_command(cmd_admin_destroy, request.get_json())
+
+
+def cmd_admin_destroy(data):
     target_id = data.get("id", None)
 
     if target_id is None:
-        return jsonify({"status": "error", "message": "no id provided"}), 400
-
-    global units, aaUnits, logBases, ground_retransmitters, ewarUnits
-
-    # we will try to find it in every list
-    lists = [
-        ("UAV/air unit", units),
-        ("AntiAir", aaUnits),
-        ("LogHub", logBases),
-        ("GroundRetransmitter", ground_retransmitters),
-        ("ElectronicWarfare", ewarUnits),
-    ]
-
-    for (label, lst) in lists:
-        for obj in list(lst):  # copy to allow removal
-            if getattr(obj, "id", None) == target_id:
-                # if it has a 'state' (UAVs, AA) -> mark destroyed
-                if hasattr(obj, "state"):
-                    obj.state = UAVUnits.UnitState.Destroyed
-                    # the game loop already cleans destroyed UAVs/AA,
-                    # but we can also filter here if you want immediate effect
-                    if lst is units:
-                        units = [u for u in units if u.state != UAVUnits.UnitState.Destroyed]
-                    if lst is aaUnits:
-                        aaUnits = [a for a in aaUnits if a.state != UAVUnits.UnitState.Destroyed]
-                else:
-                    # structures: just remove from list
-                    lst.remove(obj)
-
-                return jsonify({
-                    "status": "ok",
-                    "id": target_id,
-                    "destroyed_class": label
-                })
+        return {"status": "error", "message": "no id provided"}, 400
+
+    obj = world.registry.get(target_id)
+    if obj is None:
+        return {"status": "error", "message": "object not found"}, 404
+
+    lst = world.list_for(obj)
+    if lst is world.aaUnits:
+        label = "AntiAir"
+    elif lst is world.units:
+        label = "UAV/air unit"
+    elif lst is world.logBases:
+        label = "LogHub"
+    elif lst is world.ground_retransmitters:
+        label = "GroundRetransmitter"
+    else:
+        label = "ElectronicWarfare"
+
+    # if it has a 'state' (UAVs, AA) -> mark destroyed
+    if hasattr(obj, "state"):
+        obj.state = UAVUnits.UnitState.Destroyed
+        # the game loop already cleans destroyed UAVs/AA,
+        # but we can also filter here if you want immediate effect
+        if lst is world.units:
+            world.units = world.prune_destroyed(world.units)
+        if lst is world.aaUnits:
+            world.aaUnits = world.prune_destroyed(world.aaUnits)
+    else:
+        # structures: just remove from list
+        world.despawn(obj)
 
-    return jsonify({"status": "error", "message": "object not found"}), 404
+    return {
+        "status": "ok",
+        "id": target_id,
+        "destroyed_class": label
+    }
 
 
 @app.route("/spawn_uav", methods=["POST"])
 def spawn_uav():
-    data = request.get_json()
+    return run_command(cmd_spawn_uav, request.get_json())
+
+
+def cmd_spawn_uav(data):
     base_id = data.get("base_id")
     target_x = data.get("x")
     target_y = data.get("y")
 
     # find the base
-    base = next((b for b in logBases if b.id == base_id), None)
+    base = world.get_base(base_id)
     if base is None:
-        return jsonify({"status": "error", "message": "base not found"}), 404
+        return {"status": "error", "message": "base not found"}, 404
 
     # quota check
     max_uavs = getattr(base, "max_deployed_uavs", 5)
     current_uavs = getattr(base, "current_spawned_uavs", 0)
     if current_uavs >= max_uavs:
-        return jsonify({"status": "error", "message": "this base has no UAVs left"}), 400
+        return {"status": "error", "message": "this base has no UAVs left"}, 400
 
     # create Loitering Munition at base position
     lm = UAVUnits.LoiteringMunition(
@@ -1750,7 +2186,8 @@ def spawn_uav():
         moveBatteryDrainPerTick=0.0138,
         payload=1.0,
         explosiveType=UAVUnits.ExplosiveType.HEAT,
-        usedFrequencies=[2400]
+        usedFrequencies=[2400],
+        store=world.store
     )
 
     # remember which base spawned it, so we can give the slot back when it dies
@@ -1760,35 +2197,83 @@ def spawn_uav():
     lm.move_unit((target_x, target_y))
 
     # add to live units list
-    units.append(lm)
+    world.spawn(lm)
 
     # consume base slot
     base.current_spawned_uavs = current_uavs + 1
+    world.touch(base)
 
-    return jsonify({"status": "ok", "uav_id": lm.id})
+    return {"status": "ok", "uav_id": lm.id}
 
 @app.route("/toggle_pause", methods=["POST"])
 def toggle_pause():
+    return run_command(cmd_toggle_pause)
+
+
+def cmd_toggle_pause():
     global SIM_PAUSED
     SIM_PAUSED = not SIM_PAUSED
-    return jsonify({"status": "ok", "paused": SIM_PAUSED})
+    return {"status": "ok", "paused": SIM_PAUSED}
+
+@app.route("/tick_stats")
+def tick_stats():
+    stats = tick_scheduler.stats()
+    stats["sim_tick"] = views.latest.tick
+    stats["stream_clients"] = views.subscribers
+    stats["paused"] = SIM_PAUSED
+    stats["seed"] = str(world.seed)
+    stats["commands"] = commands.stats()
+    stats.update(published_stats)
+    return jsonify(stats)
+
+@app.route("/admin_snapshot")
+def admin_snapshot():
+    compress = request.args.get("compress", "1") != "0"
+    try:
+        data, tick = commands.call(cmd_admin_snapshot, compress, timeout=COMMAND_TIMEOUT)
+    except CommandQueue.TimeoutError:
+        return jsonify({"status": "error", "message": "simulation busy, try again"}), 503
+    return send_file(BytesIO(data), mimetype="application/octet-stream",
+                     as_attachment=True, download_name=f"world-{tick}.wats")
+
+
+def cmd_admin_snapshot(compress):
+    return Snapshot.dumps(world, compress=compress), world.tick_count
+
+
+@app.route("/admin_restore", methods=["POST"])
+def admin_restore():
+    return run_command(cmd_admin_restore, request.get_data())
+
+
+def cmd_admin_restore(data):
+    global last_autosave
+    try:
+        Snapshot.loads(data, world)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    last_autosave = world.time
+    return {"status": "ok", "tick": world.tick_count, "entities": len(world.registry)}
 
 @app.route("/spawn_retrans_uav", methods=["POST"])
 def spawn_retrans_uav():
-    data = request.get_json()
+    return run_command(cmd_spawn_retrans_uav, request.get_json())
+
+
+def cmd_spawn_retrans_uav(data):
     base_id = data.get("base_id")
     target_x = data.get("x")
     target_y = data.get("y")
 
-    base = next((b for b in logBases if b.id == base_id), None)
+    base = world.get_base(base_id)
     if base is None:
-        return jsonify({"status": "error", "message": "base not found"}), 404
+        return {"status": "error", "message": "base not found"}, 404
 
     # quota: 2 per base (or whatever is in the base)
     current_air = getattr(base, "current_air_retransmitters", 0)
     max_air = getattr(base, "max_air_retransmitters", 2)
     if current_air >= max_air:
-        return jsonify({"status": "error", "message": "this base has no retransmitting UAVs left"}), 400
+        return {"status": "error", "message": "this base has no retransmitting UAVs left"}, 400
 
     # create at base position
     ruav = UAVUnits.RetransmiterUAV(
@@ -1804,7 +2289,8 @@ def spawn_retrans_uav():
         idleBatteryDrainPerTick=0.0083,
         moveBatteryDrainPerTick=0.0138,
         transmissionRange=200.0,
-        usedFrequencies=[5600]
+        usedFrequencies=[5600],
+        store=world.store
     )
 
     # remember parent base if you want later reclamation
@@ -1814,55 +2300,58 @@ def spawn_retrans_uav():
     if target_x is not None and target_y is not None:
         ruav.move_unit((target_x, target_y))
 
-    units.append(ruav)
+    world.spawn(ruav)
 
     # consume slot
     base.current_air_retransmitters = current_air + 1
+    world.touch(base)
 
-    return jsonify({"status": "ok", "uav_id": ruav.id})
+    return {"status": "ok", "uav_id": ruav.id}
 
 
 @app.route("/toggle_uav_retransmitter", methods=["POST"])
 def toggle_uav_retransmitter():
-    data = request.get_json()
+    return run_command(cmd_toggle_uav_retransmitter, request.get_json())
+
+
+def cmd_toggle_uav_retransmitter(data):
     uav_id = data.get("uav_id")
     active = bool(data.get("active", True))
 
     # find the UAV
-    uav = next(
-        (u for u in units
-         if getattr(u, "id", None) == uav_id and isinstance(u, UAVUnits.RetransmiterUAV)),
-        None
-    )
-    if uav is None:
-        return jsonify({"status": "error", "message": "retransmitter UAV not found"}), 404
+    uav = world.registry.get_unit(uav_id)
+    if not isinstance(uav, UAVUnits.RetransmiterUAV):
+        return {"status": "error", "message": "retransmitter UAV not found"}, 404
 
     uav.is_retransmitting = active
-    return jsonify({"status": "ok", "active": uav.is_retransmitting})
+    return {"status": "ok", "active": uav.is_retransmitting}
 
 @app.route("/admin_add_supply", methods=["POST"])
 def admin_add_supply():
-    data = request.get_json()
+    return run_command(cmd_admin_add_supply, request.get_json())
+
+
+def cmd_admin_add_supply(data):
     base_id = data.get("base_id")
     supply_type = data.get("supply_type")
     amount = int(data.get("amount", 0))
 
     if base_id is None or supply_type is None:
-        return jsonify({"status": "error", "message": "base_id and supply_type required"}), 400
+        return {"status": "error", "message": "base_id and supply_type required"}, 400
 
     # find the LogHub
-    base = next((b for b in logBases if b.id == base_id), None)
+    base = world.get_base(base_id)
     if base is None:
-        return jsonify({"status": "error", "message": "LogHub not found"}), 404
+        return {"status": "error", "message": "LogHub not found"}, 404
 
     # validate supply type
     try:
         st_enum = LogHub.SupplyType[supply_type]
     except KeyError:
-        return jsonify({"status": "error", "message": f"Unknown supply type: {supply_type}"}), 400
+        return {"status": "error", "message": f"Unknown supply type: {supply_type}"}, 400
 
     if amount <= 0:
-        return jsonify({"status": "error", "message": "amount must be > 0"}), 400
+        return {"status": "error", "message": "amount must be > 0"}, 400
 
     # make sure storage dict exists
     if getattr(base, "inStorage", None) is None:
@@ -1870,530 +2359,70 @@ def admin_add_supply():
 
     current = base.inStorage.get(st_enum, 0)
     base.inStorage[st_enum] = current + amount
+    world.touch(base)
 
     # return fresh storage as plain dict
     storage_dict = {k.name: v for k, v in base.inStorage.items()}
-    return jsonify({
+    return {
         "status": "ok",
         "base_id": base.id,
         "storage": storage_dict
-    })
+    }
 
 
 @app.route("/admin_spawn", methods=["POST"])
 def admin_spawn():
-    data = request.get_json()
+    return run_command(cmd_admin_spawn, request.get_json())
+
+
+def cmd_admin_spawn(data):
     unit_type = data.get("unit_type")      # e.g. "LoiteringMunition", "AntiAir", "LogHub", "GroundRetransmitter"
     player = int(data.get("player", 1))
     x = float(data.get("x"))
     y = float(data.get("y"))
 
-    global units, aaUnits, logBases, ground_retransmitters
+    obj = world.make_entity(unit_type, player, x, y, data)
+    if obj is None:
+        return {"status": "error", "message": "unknown unit type"}, 400
 
-    if unit_type == "LoiteringMunition":
-        if player == 1:
-            img = "static/ICONS/UAV ALLY.png"
-        else:
-            img = "static/ICONS/UAV ENEMY.png"
-
-        # read optional params
-        expl_str = data.get("explosiveType", "HEAT")
-        used_freqs = data.get("usedFrequencies", [2400])
-
-        # normalize used_freqs (client might send string or list)
-        if isinstance(used_freqs, str):
-            used_freqs = [float(s.strip()) for s in used_freqs.split(",") if s.strip()]
-
-        # convert explosive type string -> enum (fallback to HEAT on invalid)
-        try:
-            expl_enum = UAVUnits.ExplosiveType[expl_str]
-        except Exception:
-            expl_enum = UAVUnits.ExplosiveType.HEAT
-
-        lm = UAVUnits.LoiteringMunition(
-            name=f"LM-admin-{len(units)}",
-            chanceToHit=50,
-            baseSpeed=20,
-            state=UAVUnits.UnitState.Landed,
-            position=(x, y),
-            image=img,
-            armourType=UAVUnits.ArmourType.Unarmored,
-            player=player,
-            currentWeight=1.7,
-            idleBatteryDrainPerTick=0.0083,
-            moveBatteryDrainPerTick=0.0138,
-            payload=1.0,
-            explosiveType=expl_enum,
-            usedFrequencies=used_freqs
-        )
-        units.append(lm)
-        return jsonify({"status": "ok", "spawned": "LoiteringMunition", "id": lm.id})
-
-
-    elif unit_type == "AntiAir":
-        if player == 1:
-            img = "static/ICONS/AIR DEF ALLY.png"
-        else:
-            img = "static/ICONS/AIR DEF ENEMY.png"
-        aa = AntiAirUnits.AntiAir(
-            name=f"AA-admin-{len(aaUnits)}",
-            chanceToHit=35,
-            baseSpeed=0,
-            state=UAVUnits.UnitState.Idle,
-            position=(x, y),
-            image=img,
-            armourType=UAVUnits.ArmourType.LightArmour,
-            player=player,
-            range=150,
-            ammoCount=5,
-            ammoType=LogHub.SupplyType.AAMunition,
-            aimTime=1.0,
-            timeBetweenShots=2.0,
-            AAstate=AntiAirUnits.AAStatus.Idle
-        )
-        aaUnits.append(aa)
-        return jsonify({"status": "ok", "spawned": "AntiAir"})
-
-    elif unit_type == "LogHub":
-        if player == 1:
-            img = "static/ICONS/HQ_ALLY.png"
-        else:
-            img = "static/ICONS/HQ_ENEMY.png"
-        base = LogHub.LogHub(
-            name=f"Base-admin-{len(logBases)}",
-            position=(x, y),
-            image=img,
-            player=player,
-            transmissionRange=300
-        )
-        logBases.append(base)
-        return jsonify({"status": "ok", "spawned": "LogHub", "id": base.id})
-
-    elif unit_type == "GroundRetransmitter":
-        if player == 1:
-            img = "static/ICONS/ŁĄCZNOŚĆ ALLY.png"
-        else:
-            img = "static/ICONS/ŁĄCZNOŚĆ ENEMY.png"
-        rt = LogHub.GroundRetransmitter(
-            name=f"RT-admin-{len(ground_retransmitters)}",
-            position=(x, y),
-            image=img,
-            player=player,
-            transmissionRange=200,
-            parent_base_id=-1
-        )
-        ground_retransmitters.append(rt)
-        return jsonify({"status": "ok", "spawned": "GroundRetransmitter"})
-
-    elif unit_type == "RetransmiterUAV":
-        if player == 1:
-            img = "static/ICONS/ROTOR ALLY.png"
-        else:
-            img = "static/ICONS/ROTOR ENEMY.png"
-
-        used_freqs = data.get("usedFrequencies", [5600])
-        if isinstance(used_freqs, str):
-            used_freqs = [float(s.strip()) for s in used_freqs.split(",") if s.strip()]
-
-        ruav = UAVUnits.RetransmiterUAV(
-            name=f"RT-UAV-admin-{len(units)}",
-            chanceToHit=0,
-            baseSpeed=15,
-            state=UAVUnits.UnitState.Landed,
-            position=(x, y),
-            image=img,
-            armourType=UAVUnits.ArmourType.Unarmored,
-            player=player,
-            currentWeight=1.7,
-            idleBatteryDrainPerTick=0.0083,
-            moveBatteryDrainPerTick=0.0138,
-            transmissionRange=200.0,
-            usedFrequencies=[5600]
-        )
-        units.append(ruav)
-        return jsonify({"status": "ok", "spawned": "RetransmiterUAV", "id": ruav.id})
-
-    elif unit_type == "ElectronicWarfare":
-        if player == 1:
-            img = "static/ICONS/ELECTRONIC WARFARE ALLY.png"
-        else:
-            img = "static/ICONS/ELECTRONIC WARFARE ENEMY.png"
-        # default jammingRange and frequencies — adjust as you like
-        jamming_range = int(data.get("jammingRange", 200))
-        jamming_freq = data.get("jammingFreq", [2400, 5800])
-        if isinstance(jamming_freq, str):
-            # parse comma-separated string just in case
-            jamming_freq = [float(s.strip()) for s in jamming_freq.split(",") if s.strip()]
-
-        ew = LogHub.ElectronicWarfare(
-            name=f"EW-admin-{len(ewarUnits)}",
-            position=(x, y),
-            image=img,
-            player=player,
-            jammingRange=jamming_range,
-            jammingFreq=jamming_freq
-        )
-        ewarUnits.append(ew)
-        return jsonify({"status": "ok", "spawned": "ElectronicWarfare"})
-
-    elif unit_type == "Tank":
-        if player == 1:
-            img = "static/ICONS/TANK ALLY.png"
-        else:
-            img = "static/ICONS/TANK ENEMY.png"
-
-        tank = GroundUnits.Tank(
-            name=f"T-{len(units)}",
-            state=UAVUnits.UnitState.Idle,
-            position=(x, y),
-            image=img,
-            player=player,
-            max_fuel = 300
-        )
-        units.append(tank)
-        return jsonify({"status": "ok", "spawned": "Tank", "id": tank.id})
+    world.spawn(obj)
+    return {"status": "ok", "spawned": unit_type, "id": obj.id}
 
-    else:
-        return jsonify({"status": "error", "message": "unknown unit type"}), 400
-
-def spawn_supply_vehicle(from_base: LogHub.LogHub,
-                         target_unit,
-                         supply_type: LogHub.SupplyType,
-                         amount: int):
-    # 1) check truck quota first
-    if getattr(from_base, "current_supply_trucks", 0) >= getattr(from_base, "max_supply_trucks", 2):
-        # hub is “busy” – don’t spawn another truck
-        return None
 
-    # 2) check storage
-    available = from_base.inStorage.get(supply_type, 0)
-    if available <= 0:
-        return None
-    amount = min(amount, available)
-
-    # reserve supply right away
-    from_base.inStorage[supply_type] = available - amount
-
-    # --- NEW: fuel for the truck ---
-    TRUCK_MAX_FUEL = 40.0           # you can tweak
-    TRUCK_FUEL_PER_TICK = 0.005      # you can tweak
-    fuel_available = from_base.inStorage.get(LogHub.SupplyType.Fuel, 0)
-    taken_fuel = min(TRUCK_MAX_FUEL, fuel_available)
-    if taken_fuel > 0:
-        from_base.inStorage[LogHub.SupplyType.Fuel] = fuel_available - taken_fuel
-
-    # choose icon
-    if from_base.player == 1:
-        image = "static/ICONS/LOGISTYKA ALLY.png"
-    else:
-        image = "static/ICONS/LOGISTYKA ENEMY.png"
-
-    veh = GroundUnits.SupplyVehicle(
-        name=f"SUP-{from_base.id}",
-        chanceToHit=0,
-        baseSpeed=5,
-        state=UAVUnits.UnitState.Idle,
-        position=(from_base.positionX, from_base.positionY),
-        image=image,
-        armourType=UAVUnits.ArmourType.Unarmored,
-        player=from_base.player,
-        cargoType=supply_type,
-        cargoAmmount=amount,
-        target_unit_id=getattr(target_unit, "id"),
-        home_base_id=from_base.id,
-        max_fuel=taken_fuel,
-        fuel_consumption_per_tick=TRUCK_FUEL_PER_TICK
-    )
-
-    # send it to the unit
-    veh.move_unit((target_unit.positionX, target_unit.positionY))
-
-    # put to world
-    units.append(veh)
-
-    # 3) mark that this hub now has one more active truck
-    from_base.current_supply_trucks += 1
-
-    return veh
-
-
-
-def find_nearest_loghub_with_supply(player: int,
-                                    supply_type: LogHub.SupplyType,
-                                    x: float,
-                                    y: float):
-    best_base = None
-    best_dist = None
-    for b in logBases:
-        if b.player != player:
-            continue
-
-        storage = getattr(b, "inStorage", {}) or {}
-        if storage.get(supply_type, 0) <= 0:
-            continue
-
-        # NEW: also require free ground supply truck slot
-        current_trucks = getattr(b, "current_supply_trucks", 0)
-        max_trucks = getattr(b, "max_supply_trucks", 2)
-        if current_trucks >= max_trucks:
-            # hub is busy – skip it
-            continue
-
-        dx = x - b.positionX
-        dy = y - b.positionY
-        dist = math.hypot(dx, dy)
-        if best_dist is None or dist < best_dist:
-            best_dist = dist
-            best_base = b
-    return best_base
-
-
-
-def is_uav_in_comm(uav, bases, retransmitters):
-    """
-    Return True if UAV currently has comm (i.e. able to receive commands).
-    Jammers (ewarUnits) can block comm even if friendly bases/retransmitters are in range.
-    By default, ANY jammer (friendly or enemy) will block; to make only enemy jammers block,
-    change `allow_same_player_jammer` to False.
-    """
-    # ---- FIRST: check if any jammer is actively jamming this UAV ----
-    uav_freqs = getattr(uav, "usedFrequencies", []) or []
-    if uav_freqs:
-        for jammer in ewarUnits:
-            # skip inactive jammers if you later add is_active flag:
-            if getattr(jammer, "is_active", True) is False:
-                continue
-
-            dx = uav.positionX - jammer.positionX
-            dy = uav.positionY - jammer.positionY
-            dist = math.hypot(dx, dy)
-            if dist <= jammer.jammingRange:
-                jammer_freqs = getattr(jammer, "jammingFreq", []) or []
-                # simple overlap test (exact membership)
-                for f in uav_freqs:
-                    if f in jammer_freqs:
-                        # Option: only consider enemy jammers. Set to True to allow friendly jammers
-                        allow_same_player_jammer = True
-                        if not allow_same_player_jammer and jammer.player == uav.player:
-                            # ignore same-player jammer
-                            continue
-                        # jammed: no comm available
-                        return False
-
-    # ---- THEN: check normal comm sources (bases, ground retransmitters, airborne retrans) ----
-    for b in bases:
-        if b.player == uav.player:
-            dx = uav.positionX - b.positionX
-            dy = uav.positionY - b.positionY
-            dist = math.hypot(dx, dy)
-            if dist <= b.transmissionRange:
-                return True
-
-    for r in retransmitters:
-        if r.player == uav.player:
-            dx = uav.positionX - r.positionX
-            dy = uav.positionY - r.positionY
-            dist = math.hypot(dx, dy)
-            if dist <= r.transmissionRange:
-                return True
-
-    # airborne retransmitters
-    for other in units:
-        if other is uav:
-            continue
-        if isinstance(other, UAVUnits.RetransmiterUAV) \
-           and getattr(other, "is_retransmitting", False) \
-           and other.player == uav.player:
-            dx = uav.positionX - other.positionX
-            dy = uav.positionY - other.positionY
-            if math.hypot(dx, dy) <= other.transmissionRange:
-                return True
-
-    # nothing provides comm
-    return False
+def write_autosave(data: bytes):
+    try:
+        Snapshot.write(AUTOSAVE_PATH, Snapshot.compress(data))
+    except OSError as e:
+        print(f"[SERVER] Autosave failed: {e}")
+
+
+def simulation_tick(dt: float):
+    global last_autosave, autosave_job
+    # player / admin commands land between ticks, paused or not
+    applied = commands.drain()
+    if SIM_PAUSED:
+        # scheduler keeps running, the world just doesn't advance;
+        # still republish so paused edits (spawns, moves) show up
+        if applied or not views.paused:
+            views.publish(world, paused=True)
+            publish_state()
+        return
+    world.tick(dt)
+    views.publish(world)
+    publish_state()
+    if AUTOSAVE_SECONDS and world.time - last_autosave >= AUTOSAVE_SECONDS:
+        # still busy with the last one (slow disk): skip this round rather than pile them up
+        if autosave_job is None or autosave_job.done():
+            autosave_job = autosaver.submit(write_autosave, Snapshot.dumps(world))
+        last_autosave = world.time
 
 
 def game_loop():
-    dt = 1.0 / TICK_RATE
-    global units, aaUnits, SIM_PAUSED, pending_attacks
-    while True:
-        if SIM_PAUSED:
-            # just wait one tick and go again
-            time.sleep(dt)
-            continue
-
-        # --- normal simulation below ---
-        for u in units:
-            if isinstance(u, UAVUnits.UAV):
-                if not is_uav_in_comm(u, logBases, ground_retransmitters):
-                    u.destination = None
-                    u.state = UAVUnits.UnitState.Idle
-                    u.tick_unit(dt)
-                    continue
-            u.tick_unit(dt)
-
-        for aa in aaUnits:
-            aa.tickAA(dt, units)
-            if aa.ammoCount <= 0 and not getattr(aa, "supplyRequested", False):
-                # try to find a base with AA ammo
-                base = find_nearest_loghub_with_supply(
-                    aa.player,
-                    aa.ammoType,
-                    aa.positionX,
-                    aa.positionY
-                )
-                if base is not None:
-                    spawn_supply_vehicle(base, aa, aa.ammoType, amount=5)  # amount to deliver
-                    aa.supplyRequested = True
-
-        time.sleep(dt)
-
-        before_uav = len(units)
-        before_aa = len(aaUnits)
-
-        for attacker_id in list(pending_attacks.keys()):
-            target_id = pending_attacks[attacker_id]
-
-            # find attacker + target again (they may have moved or died)
-            attacker = next((u for u in units if u.id == attacker_id), None)
-            all_units = units + aaUnits
-            target = next((u for u in all_units if u.id == target_id), None)
-
-            # if attacker or target is gone/destroyed -> drop order
-            if attacker is None or attacker.state == UAVUnits.UnitState.Destroyed \
-               or target is None or target.state == UAVUnits.UnitState.Destroyed:
-                pending_attacks.pop(attacker_id, None)
-                continue
-
-            # compute distance
-            dx = target.positionX - attacker.positionX
-            dy = target.positionY - attacker.positionY
-            dist = math.hypot(dx, dy)
-
-            if dist <= ATTACK_RANGE:
-                # in range -> perform attack
-                attacker.attack(target)
-                # remove order (LM will likely destroy itself too)
-                pending_attacks.pop(attacker_id, None)
-            else:
-                # not in range -> keep chasing
-                # we order the LM to move toward the *current* target position
-                attacker.move_unit((target.positionX, target.positionY))
-
-        # --- supply vehicle logic ---
-        for u in list(units):  # list() so we can remove safely
-            if isinstance(u, GroundUnits.SupplyVehicle):
-                if u.phase == "to_target":
-                    # find the target
-                    target = next((x for x in units + aaUnits + logBases
-                                   if getattr(x, "id", None) == u.target_unit_id), None)
-                    if target is None:
-                        # target gone -> go back
-                        home = next((b for b in logBases if b.id == u.home_base_id), None)
-                        if home:
-                            u.move_unit((home.positionX, home.positionY))
-                            u.phase = "to_base"
-                        else:
-                            # no home, just despawn
-                            units.remove(u)
-                        continue
-
-                    # are we close enough to deliver?
-                    dx = target.positionX - u.positionX
-                    dy = target.positionY - u.positionY
-                    if math.hypot(dx, dy) < 5:  # delivery radius
-                        if hasattr(target, "ammoCount") and hasattr(target, "ammoType"):
-                            if target.ammoType == u.cargoType:
-                                target.ammoCount += u.cargoAmmount
-
-                                # allow unit to request again in the future
-                                setattr(target, "supplyRequested", False)
-
-                                # if this was an AA unit – wake it up
-                                if hasattr(target, "AAstate"):
-                                    target.AAstate = AntiAirUnits.AAStatus.Idle
-                                    # also clear any old target/aim timer so it can pick a new one cleanly
-                                    if hasattr(target, "target"):
-                                        target.target = None
-                                    if hasattr(target, "currentAimTime"):
-                                        target.currentAimTime = 0.0
-
-                        # after delivering -> go home
-                        home = next((b for b in logBases if b.id == u.home_base_id), None)
-                        if home:
-                            u.move_unit((home.positionX, home.positionY))
-                            u.phase = "to_base"
-                        else:
-                            units.remove(u)
-
-                elif u.phase == "to_base":
-                    home = next((b for b in logBases if b.id == u.home_base_id), None)
-                    if home is None:
-                        units.remove(u)
-                        continue
-
-                    dx = home.positionX - u.positionX
-                    dy = home.positionY - u.positionY
-                    if math.hypot(dx, dy) < 5:
-                        # NEW: return remaining fuel to hub
-                        remaining_fuel = getattr(u, "currentFuel", 0)
-                        if remaining_fuel > 0:
-                            if getattr(home, "inStorage", None) is None:
-                                home.inStorage = {}
-                            home.inStorage[LogHub.SupplyType.Fuel] = home.inStorage.get(LogHub.SupplyType.Fuel, 0) + remaining_fuel
-
-                        # arrived -> free the truck slot on that hub
-                        if hasattr(home, "current_supply_trucks"):
-                            home.current_supply_trucks = max(0, home.current_supply_trucks - 1)
-
-                        # truck is done
-                        units.remove(u)
-
-        # --- handle destroyed supply trucks (resend request) ---
-        for u in list(units):
-            if isinstance(u, GroundUnits.SupplyVehicle) and u.state == UAVUnits.UnitState.Destroyed:
-                # find the unit/structure it was supposed to supply
-                target = next((x for x in units + aaUnits + logBases
-                               if getattr(x, "id", None) == u.target_unit_id), None)
-
-                if target is not None:
-                    # allow it to ask again
-                    setattr(target, "supplyRequested", False)
-
-                    # figure out what it needed
-                    needed_type = None
-                    still_needs = False
-                    if hasattr(target, "ammoCount") and hasattr(target, "ammoType"):
-                        if target.ammoCount <= 0:
-                            needed_type = target.ammoType
-                            still_needs = True
-
-                    if still_needs and needed_type is not None:
-                        # try to send a new truck from ANY hub that has supply AND free trucks
-                        base = find_nearest_loghub_with_supply(
-                            target.player,
-                            needed_type,
-                            target.positionX,
-                            target.positionY
-                        )
-                        if base is not None:
-                            spawned = spawn_supply_vehicle(base, target, needed_type, amount=5)
-                            if spawned is not None:
-                                # mark that the target is being supplied again
-                                target.supplyRequested = True
-                # IMPORTANT: we do NOT give the truck slot back to the original hub here,
-                # because the truck was destroyed
-
-
-        units = [u for u in units if u.state != UAVUnits.UnitState.Destroyed]
-        aaUnits = [aa for aa in aaUnits if aa.state != UAVUnits.UnitState.Destroyed]
-
-        if len(units) != before_uav or len(aaUnits) != before_aa:
-            print(f"[SERVER] Destroyed units removed: "
-                  f"{before_uav - len(units)} UAVs, {before_aa - len(aaUnits)} AA units.")
+    tick_scheduler.run(simulation_tick)
 
 
 threading.Thread(target=game_loop, daemon=True).start()
+threading.Thread(target=prepare_tiles, daemon=True).start()
 
 if __name__ == "__main__":
     # run: python app.py
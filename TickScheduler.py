@@ -0,0 +1,88 @@
+import time
+from collections import deque
+
+
+class FixedTimestepScheduler:
+    """
+    Runs step(dt) at a fixed rate against a monotonic clock.
+    Deadlines advance by exactly dt so there is no drift; when a tick runs
+    late the scheduler catches up with at most maxSubSteps steps in a row,
+    and if it is still behind after that the backlog is dropped (counted in
+    droppedTicks) instead of spiralling.
+    """
+
+    def __init__(self, tickRate: float, maxSubSteps: int = 5, clock=time.monotonic, sleep=time.sleep):
+        self.tickRate = tickRate
+        self.dt = 1.0 / tickRate
+        self.maxSubSteps = maxSubSteps
+        self.clock = clock
+        self.sleep = sleep
+
+        self.ticks = 0
+        self.overruns = 0          # ticks whose work took longer than dt
+        self.droppedTicks = 0      # ticks skipped because we were too far behind
+        self.catchUpSteps = 0      # extra steps run to catch up
+        self.lastWorkTime = 0.0
+        self.maxWorkTime = 0.0
+        self.avgWorkTime = 0.0     # exponential moving average
+        self._tickTimes = deque(maxlen=max(2, int(tickRate * 5)))
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def _run_one(self, step):
+        t0 = self.clock()
+        step(self.dt)
+        t1 = self.clock()
+
+        work = t1 - t0
+        self.ticks += 1
+        self.lastWorkTime = work
+        if work > self.maxWorkTime:
+            self.maxWorkTime = work
+        self.avgWorkTime = work if self.ticks == 1 else self.avgWorkTime * 0.9 + work * 0.1
+        if work > self.dt:
+            self.overruns += 1
+        self._tickTimes.append(t1)
+
+    def run(self, step, shouldStop=None):
+        nextTick = self.clock()
+        while not self._stopped and not (shouldStop is not None and shouldStop()):
+            now = self.clock()
+            if now < nextTick:
+                self.sleep(nextTick - now)
+                continue
+
+            behind = int((now - nextTick) / self.dt) + 1
+            steps = min(behind, self.maxSubSteps)
+            for _ in range(steps):
+                self._run_one(step)
+            self.catchUpSteps += steps - 1
+            nextTick += steps * self.dt
+
+            # still more than maxSubSteps behind -> give up on the backlog
+            late = self.clock() - nextTick
+            if late > self.maxSubSteps * self.dt:
+                skipped = int(late / self.dt)
+                self.droppedTicks += skipped
+                nextTick += skipped * self.dt
+
+    def achieved_hz(self) -> float:
+        if len(self._tickTimes) < 2:
+            return 0.0
+        span = self._tickTimes[-1] - self._tickTimes[0]
+        return (len(self._tickTimes) - 1) / span if span > 0 else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "target_hz": self.tickRate,
+            "achieved_hz": round(self.achieved_hz(), 3),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "dropped_ticks": self.droppedTicks,
+            "catch_up_steps": self.catchUpSteps,
+            "last_work_ms": round(self.lastWorkTime * 1000, 3),
+            "avg_work_ms": round(self.avgWorkTime * 1000, 3),
+            "max_work_ms": round(self.maxWorkTime * 1000, 3),
+        }
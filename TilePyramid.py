@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+TILE_SIZE = 256
+META_FILE = "meta.json"
+
+
+def _source_id(path: str) -> str:
+    # content hash: a re-downloaded scene with the same bytes doesn't force a rebuild
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def levels_for(width: int, height: int, tile_size: int = TILE_SIZE) -> int:
+    """Deepest zoom level needed so the top level has at least the source's resolution."""
+    z = 0
+    while tile_size << z < max(width, height):
+        z += 1
+    return z
+
+
+def _source_stat(path: str) -> list:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def build_pyramid(source: str, out_dir: str, tile_size: int = TILE_SIZE, max_zoom: int = None) -> dict:
+    """
+    Cut `source` into a zoom pyramid of square PNG tiles under out_dir/z/x/y.png.
+    Level z covers the whole map with 2^z x 2^z tiles; the image is stretched
+    to a square (the page draws the map over the whole square canvas too).
+    Each level is made by halving the one above it. Returns the metadata
+    that is written next to the tiles.
+
+    Works one row of tiles at a time: the deepest level is resampled from
+    the source strip by strip and every two rows of a level make one row of
+    the level below, so besides the decoded source only a couple of rows per
+    level are ever in memory.
+    """
+    with Image.open(source) as img:
+        width, height = img.size
+        if max_zoom is None:
+            max_zoom = levels_for(width, height, tile_size)
+        for z in range(max_zoom + 1):
+            for x in range(1 << z):
+                os.makedirs(os.path.join(out_dir, str(z), str(x)), exist_ok=True)
+
+        side = tile_size << max_zoom
+        rowHeight = height / (1 << max_zoom)        # source rows per row of deepest-level tiles
+        # rows above / below a strip the LANCZOS filter (support 3) reaches into
+        margin = int(math.ceil(3 * max(rowHeight / tile_size, 1.0))) + 1
+        pending = {}
+        for row in range(1 << max_zoom):
+            y0, y1 = row * rowHeight, (row + 1) * rowHeight
+            top = max(int(y0) - margin, 0)
+            bottom = min(int(math.ceil(y1)) + margin, height)
+            strip = img.crop((0, top, width, bottom)).convert("RGB")
+            band = strip.resize((side, tile_size), Image.LANCZOS, box=(0, y0 - top, width, y1 - top))
+            _add_row(out_dir, tile_size, max_zoom, row, band, pending)
+
+    meta = {
+        "source": os.path.abspath(source),
+        "source_id": _source_id(source),
+        "source_stat": _source_stat(source),
+        "source_size": [width, height],
+        "tile_size": tile_size,
+        "max_zoom": max_zoom,
+    }
+    # meta last, so a half-written pyramid is never taken as complete
+    tmp = os.path.join(out_dir, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, META_FILE))
+    return meta
+
+
+def _add_row(out_dir: str, tile_size: int, z: int, row: int, band, pending: dict):
+    # one full-width row of level z tiles: save them, and once its pair is
+    # there halve both into the next row of level z - 1
+    for x in range(1 << z):
+        tile = band.crop((x * tile_size, 0, (x + 1) * tile_size, tile_size))
+        tile.save(os.path.join(out_dir, str(z), str(x), f"{row}.png"), optimize=True)
+    if z == 0:
+        return
+    if row % 2 == 0:
+        pending[z] = band
+        return
+    pair = Image.new("RGB", (band.width, 2 * tile_size))
+    pair.paste(pending.pop(z), (0, 0))
+    pair.paste(band, (0, tile_size))
+    _add_row(out_dir, tile_size, z - 1, row // 2, pair.resize((band.width // 2, tile_size), Image.BOX), pending)
+
+
+def is_current(source: str, root: str, tile_size: int = TILE_SIZE) -> bool:
+    """Whether root holds a complete pyramid of `source` at this tile size."""
+    meta_path = os.path.join(root, META_FILE)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("tile_size") != tile_size:
+        return False
+    # same size and mtime as when it was cut: no need to read the whole source again
+    if meta.get("source_stat") == _source_stat(source):
+        return True
+    return meta.get("source_id") == _source_id(source)
+
+
+class TileStore:
+    """
+    Serves tiles of a pyramid built by build_pyramid from disk, keeping the
+    most recently used `capacity` encoded tiles in memory. Thread safe.
+    """
+
+    def __init__(self, root: str, capacity: int = 512):
+        self.root = root
+        with open(os.path.join(root, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.tile_size = self.meta["tile_size"]
+        self.max_zoom = self.meta["max_zoom"]
+        # tiles are immutable for a given source, so source id + position is a stable etag
+        self.version = self.meta["source_id"][:16]
+        self.capacity = capacity
+        self._cache = OrderedDict()     # (z, x, y) -> png bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open_or_build(cls, source: str, root: str, tile_size: int = TILE_SIZE, capacity: int = 512):
+        """
+        Open the pyramid in root, (re)building it first if it's missing or was
+        cut from another source. Can take a while on a big source: call it at
+        startup, not from a request.
+        """
+        if not is_current(source, root, tile_size):
+            build_pyramid(source, root, tile_size)
+        return cls(root, capacity)
+
+    def contains(self, z: int, x: int, y: int) -> bool:
+        return 0 <= z <= self.max_zoom and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+    def etag(self, z: int, x: int, y: int) -> str:
+        return f"{self.version}-{z}-{x}-{y}"
+
+    def get(self, z: int, x: int, y: int):
+        """PNG bytes of tile (z, x, y), or None if it's outside the pyramid."""
+        if not self.contains(z, x, y):
+            return None
+        key = (z, x, y)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        with open(os.path.join(self.root, str(z), str(x), f"{y}.png"), "rb") as f:
+            data = f.read()
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.capacity:
+                self._cache.popitem(last=False)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "tile_size": self.tile_size,
+            "max_zoom": self.max_zoom,
+            "cached": len(self._cache),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut map imagery into a zoom pyramid of tiles.")
+    parser.add_argument("source", help="source image (e.g. img.png or a downloaded Sentinel scene)")
+    parser.add_argument("out_dir", help="directory for z/x/y.png tiles")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--max-zoom", type=int, default=None, help="deepest level (default: source resolution)")
+    args = parser.parse_args()
+
+    meta = build_pyramid(args.source, args.out_dir, args.tile_size, args.max_zoom)
+    print(json.dumps(meta, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import heapq
+import itertools
+
+# wake-ups this close to `now` still count as due (sim time is a float sum of dt's)
+EPSILON = 1e-9
+
+
+class TimerQueue:
+    """
+    Wake-up times for entities, as a min-heap of (due, seq, obj).
+    Each object has at most one pending wake-up: scheduling again replaces
+    it and cancel() drops it. Replaced entries stay in the heap and are
+    skipped when they reach the top, so both are O(log n) / O(1).
+    seq breaks ties, so objects due at the same time wake in the order
+    they were scheduled.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._pending = {}          # obj -> (due, seq) of its live entry
+        self._seq = itertools.count()
+
+    def schedule(self, obj, due: float):
+        entry = (due, next(self._seq))
+        self._pending[obj] = entry
+        heapq.heappush(self._heap, (entry[0], entry[1], obj))
+
+    def cancel(self, obj):
+        self._pending.pop(obj, None)
+
+    def due_time(self, obj):
+        entry = self._pending.get(obj)
+        return entry[0] if entry is not None else None
+
+    def pop_due(self, now: float) -> list:
+        """Remove and return every object whose wake-up is at or before `now`, earliest first."""
+        heap = self._heap
+        pending = self._pending
+        out = []
+        while heap and heap[0][0] <= now + EPSILON:
+            due, seq, obj = heapq.heappop(heap)
+            if pending.get(obj) == (due, seq):
+                del pending[obj]
+                out.append(obj)
+        # drop stale entries once they outnumber the live ones
+        if len(heap) > 2 * len(pending) + 64:
+            self._heap = [e for e in heap if pending.get(e[2]) == (e[0], e[1])]
+            heapq.heapify(self._heap)
+        return out
+
+    def entries(self) -> list:
+        """Live (obj, due) pairs in wake-up order."""
+        live = sorted((due, seq, obj) for obj, (due, seq) in self._pending.items())
+        return [(obj, due) for due, seq, obj in live]
+
+    def clear(self):
+        self._heap = []
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, obj):
+        return obj in self._pending
@@ -1,6 +1,7 @@
 import random
 from enum import Enum
-import math
+
+from MovementEngine import column
 
 # Explosive vs Armour table
 
@@ -32,20 +33,58 @@ class ArmourType(Enum):
     Unarmored = 2
     Infantry = 3
 
-class Unit:
-    nextID = 0
-    positionX = 0
-    positionY = 0
-    destination = None
+# code -> UnitState, the movement store keeps states as small ints
+_STATES_BY_CODE = {s.value: s for s in UnitState}
 
 
-    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, viewRange: int = 100):
+class Unit:
+    # fixed attribute layout, no per-object __dict__; __weakref__ is needed by the movement store
+    __slots__ = ("_store", "_slot", "name", "chanceToHit", "id", "image", "armourType", "player", "viewRange",
+                 "move_queue", "supplyRequested", "__weakref__")
+
+    # thin views over the world's MovementStore (self._store)
+    positionX = column("posX")
+    positionY = column("posY")
+    baseSpeed = column("speed")
+    # steer by the destination's flow field (GameWorld.route_group) instead of heading straight
+    followsFlow = column("followsFlow", bool)
+
+    @property
+    def state(self):
+        return _STATES_BY_CODE[int(self._store.state[self._slot])]
+
+    @state.setter
+    def state(self, value: UnitState):
+        self._store.state[self._slot] = value.value
+        self._store.dirty[self._slot] = True
+
+    @property
+    def destination(self):
+        store = self._store
+        if not store.hasDest[self._slot]:
+            return None
+        return float(store.destX[self._slot]), float(store.destY[self._slot])
+
+    @destination.setter
+    def destination(self, value):
+        store = self._store
+        if value is None:
+            store.hasDest[self._slot] = False
+        else:
+            store.destX[self._slot] = value[0]
+            store.destY[self._slot] = value[1]
+            store.hasDest[self._slot] = True
+        store.dirty[self._slot] = True
+
+    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, viewRange: int = 100, *, store):
+        # the movement store of the world this unit belongs to (GameWorld.store)
+        self._store = store
+        self._slot = store.allocate(self)
         self.name = name
         self.chanceToHit = chanceToHit
         self.baseSpeed = baseSpeed
         self.state = state
-        self.id = Unit.nextID
-        Unit.nextID += 1
+        self.id = None      # handed out by GameWorld.spawn
         self.positionX = position[0]
         self.positionY = position[1]
         self.image = image
@@ -53,41 +92,20 @@ class Unit:
         self.player = player
         self.viewRange = viewRange
         self.move_queue: list[tuple[float, float]] = []
+        # set while a supply truck is on its way to this unit
+        self.supplyRequested = False
 
     def move_unit(self, destination, clear_queue: bool = True):
         self.state = UnitState.Moving
         self.destination = destination
+        self.followsFlow = False
         if clear_queue:
             self.move_queue.clear()
+        self._store.requeued[self._slot] = True
 
     def tick_unit(self, dt: float):
-        if self.state != UnitState.Moving:
-            return
-
-        targetX = self.destination[0]
-        targetY = self.destination[1]
-
-        destinationX = targetX - self.positionX
-        destinationY = targetY - self.positionY
-
-        dist = math.hypot(destinationX, destinationY)
-
-        if dist == 0:
-            self.state = UnitState.Idle
-            self._try_dequeue_next_move()
-            return
-
-        effectiveSpeed = self.baseSpeed #* getModifiersAtPos(destinationX, destinationY)
-        maxStep = effectiveSpeed * dt
-
-        if maxStep >= dist:
-            self.positionX = targetX
-            self.positionY = targetY
-            self.state = UnitState.Idle
-            self._try_dequeue_next_move()
-        else:
-            self.positionX += (destinationX/dist) * maxStep
-            self.positionY += (destinationY/dist) * maxStep
+        # single-unit step; the game loop advances everyone at once with STORE.step(dt)
+        self._store.step(dt, [self._slot])
 
     def _try_dequeue_next_move(self):
         if self.move_queue:
@@ -99,22 +117,24 @@ class Unit:
         return f"{self.nazwa})"
 
 class UAV(Unit):
-    currentBattery = 100.0
+    __slots__ = ("currentWeight", "usedFrequencies", "parent_base_id")
 
-    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, currentWeight: float, idleBatteryDrainPerTick: float, moveBatteryDrainPerTick: float, usedFrequencies: list = None, viewRange: int = 100):
-        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, viewRange)
+    currentBattery = column("battery")
+    idleBatteryDrainPerTick = column("idleDrain")
+    moveBatteryDrainPerTick = column("moveDrain")
+
+    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, currentWeight: float, idleBatteryDrainPerTick: float, moveBatteryDrainPerTick: float, usedFrequencies: list = None, viewRange: int = 100, *, store):
+        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, viewRange,
+                         store=store)
         self.currentWeight = currentWeight
         self.idleBatteryDrainPerTick = idleBatteryDrainPerTick
         self.moveBatteryDrainPerTick = moveBatteryDrainPerTick
         self.usedFrequencies = list(usedFrequencies) if usedFrequencies else []
-
-    def tick_unit(self, dt: float):
-        super().tick_unit(dt)
-        self.currentBattery -= self.getCurrentBatteryDrainPerTick()
-        if self.currentBattery <= 0.0:
-            self.currentBattery = 0.0
-            self.state = UnitState.Destroyed
-            return
+        # LogHub that launched it (-1 = none), so the base gets its slot back
+        self.parent_base_id = -1
+        self.currentBattery = 100.0
+        # battery drain is applied by MovementStore.step
+        self._store.usesBattery[self._slot] = True
 
     def getCurrentBatteryDrainPerTick(self):
         modifier = 1
@@ -130,28 +150,46 @@ class UAV(Unit):
         return 0.0
 
 class LoiteringMunition(UAV):
+    __slots__ = ("payload", "explosiveType")
 
-    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, currentWeight: float, idleBatteryDrainPerTick: float, moveBatteryDrainPerTick: float ,payload: float, explosiveType: ExplosiveType, usedFrequencies: list = None, viewRange: int = 100):
-        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, currentWeight, idleBatteryDrainPerTick, moveBatteryDrainPerTick, usedFrequencies, viewRange)
+    def __init__(self, name: str, chanceToHit: int, baseSpeed: float, state: UnitState, position: (int,int), image: str, armourType: ArmourType, player: int, currentWeight: float, idleBatteryDrainPerTick: float, moveBatteryDrainPerTick: float ,payload: float, explosiveType: ExplosiveType, usedFrequencies: list = None, viewRange: int = 100, *, store):
+        super().__init__(name, chanceToHit, baseSpeed, state, position, image, armourType, player, currentWeight, idleBatteryDrainPerTick, moveBatteryDrainPerTick, usedFrequencies, viewRange, store=store)
         self.payload = payload
         self.explosiveType = explosiveType
 
-    def attack(self, target: Unit):
-        isHit(self, target)
+    def attack(self, target: Unit, rng=None):
+        isHit(self, target, rng)
+
 
+def rollD100(rng=None) -> int:
+    # 1..100 from the world's Generator; falls back to the global random module
+    if rng is None:
+        return random.randint(1,100)
+    return int(rng.integers(1, 101))
 
 def calculateChanceToDestroy(attacker: UAV, attacked: Unit):
     if isinstance(attacker, LoiteringMunition) or isinstance(attacker, CombatUAV):
         return ExplosiveArmourTable[attacked.armourType.value][attacker.explosiveType.value]
 
-def isHit(attacker: UAV, attacked: Unit):
-    calculated = random.randint(1,100)
+def isHit(attacker: UAV, attacked: Unit, rng=None):
+    calculated = rollD100(rng)
     if calculated <= attacker.chanceToHit + calculateChanceToDestroy(attacker, attacked):
         attacked.state = UnitState.Destroyed
     if isinstance(attacker, LoiteringMunition):
         attacker.state = UnitState.Destroyed
 
 class RetransmiterUAV(UAV):
+    __slots__ = ("transmissionRange",)
+
+    @property
+    def is_retransmitting(self):
+        return bool(self._store.drainModifier[self._slot] != 1.0)
+
+    @is_retransmitting.setter
+    def is_retransmitting(self, value: bool):
+        # retransmitting triples battery drain
+        self._store.drainModifier[self._slot] = 3.0 if value else 1.0
+        self._store.dirty[self._slot] = True
 
     def __init__(self,
                  name: str,
@@ -167,21 +205,26 @@ class RetransmiterUAV(UAV):
                  moveBatteryDrainPerTick: float,
                  transmissionRange: float,
                  usedFrequencies: list = None,
-                 viewRange: int = 100):
+                 viewRange: int = 100,
+                 *,
+                 store):
         # call normal UAV init
         super().__init__(name, chanceToHit, baseSpeed, state, position, image,
                          armourType, player, currentWeight,
-                         idleBatteryDrainPerTick, moveBatteryDrainPerTick, usedFrequencies, viewRange)
+                         idleBatteryDrainPerTick, moveBatteryDrainPerTick, usedFrequencies, viewRange,
+                         store=store)
         self.transmissionRange = transmissionRange
         # NEW: start turned off
         self.is_retransmitting = False
 
 class LogisticUAV(UAV):
+    __slots__ = ("currentPayload",)
 
     def __init__(self, currentPayload: float):
         self.currentPayload = currentPayload
 
 class CombatUAV(UAV):
+    __slots__ = ("currentPayload", "explosiveType")
 
     def __init__(self, currentPayload: float, explosiveType: ExplosiveType):
         self.currentPayload = currentPayload
@@ -0,0 +1,50 @@
+import argparse
+import resource
+import time
+
+import numpy as np
+
+import WorldView
+
+
+def battle(count: int, players: int, view_range: float, size: float, spread: float, rng):
+    """Columns for `count` units: uniform over a size x size map, or clumped around the middle when spread > 0."""
+    if spread > 0:
+        x = np.clip(rng.normal(size / 2, spread, count), 0, size)
+        y = np.clip(rng.normal(size / 2, spread, count), 0, size)
+    else:
+        x = rng.random(count) * size
+        y = rng.random(count) * size
+    ids = np.arange(count, dtype=np.int64)
+    player = rng.integers(1, players + 1, count)
+    viewRange = np.full(count, float(view_range))
+    return ids, x, y, player, viewRange
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time WorldView.compute_visibility (fog of war) on a large battle.")
+    parser.add_argument("--count", type=int, default=40000, help="units on the map")
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--view-range", type=float, default=150.0)
+    parser.add_argument("--size", type=float, default=1024.0, help="map side in map units")
+    parser.add_argument("--spread", type=float, default=0.0, help="std dev of a clump in the middle (0 = uniform)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    columns = battle(args.count, args.players, args.view_range, args.size, args.spread,
+                     np.random.default_rng(args.seed))
+    times = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        visible = WorldView.compute_visibility(*columns)
+        times.append((time.perf_counter() - t0) * 1000)
+
+    print(f"{args.count} units, {args.players} players, viewRange {args.view_range}")
+    print(f"best {min(times):.1f} ms, median {sorted(times)[len(times) // 2]:.1f} ms")
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+    print("visible per player:", {p: len(s) for p, s in sorted(visible.items())})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Binary encoding of a WorldView for the page (/units?format=bin).
+
+Layout (little-endian, every section starts on a 4-byte boundary so the
+browser can wrap columns in typed arrays without copying):
+
+  header   MAGIC | u16 version | u16 tables | u32 view version | u32 tick
+           | u32 rows | u32 strings | u32 string bytes
+  strings  u32 offsets[strings + 1] | utf-8 blob | pad
+  tables   per table: u32 rows | u32 columns
+           | per column: u32 name (string index) | u8 type | 3 pad
+           | per column: its data | pad
+
+Records with the same key set (in practice: the same unit class) share a
+table, so there are no holes; the frame lists them table by table, not in
+the view's order. Column types, None allowed everywhere:
+  CONST    one u32 string index: the JSON of the value every row has
+  INT32    i32 per row, INT32_NULL for None
+  FLOAT32  f32 per row, NaN for None
+  STRING   u32 string index per row, STR_NULL for None
+  BOOL     u8 per row, BOOL_NULL for None
+  VEC2     two f32 per row ([x, y] pairs), NaN NaN for None
+  JSON     like STRING, the string is the JSON of a list / dict value
+Names, images and enum names repeat a lot, so the string table is shared
+and deduplicated. Floats go out as float32, which is plenty for map
+coordinates and display values.
+"""
+
+import json
+import struct
+from operator import itemgetter
+
+import numpy as np
+
+MAGIC = b"WATU"
+WIRE_VERSION = 1
+
+CONST, INT32, FLOAT32, STRING, BOOL, VEC2, JSON = range(7)
+
+INT32_NULL = -2 ** 31
+STR_NULL = 0xFFFFFFFF
+BOOL_NULL = 2
+
+_HEADER = struct.Struct("<4sHHIIIII")
+_TABLE = struct.Struct("<II")
+_COLUMN = struct.Struct("<IB3x")
+_ITEMSIZE = {INT32: 4, FLOAT32: 4, STRING: 4, BOOL: 1, VEC2: 8, JSON: 4}
+_NONE = type(None)
+
+
+def _pad4(n: int) -> int:
+    return -n % 4
+
+
+def _json(v) -> str:
+    return json.dumps(v, separators=(",", ":"))
+
+
+class _Strings:
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, s: str) -> int:
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+
+def _column_type(values) -> int:
+    if values.count(values[0]) == len(values):
+        return CONST
+    types = set(map(type, values))
+    types.discard(_NONE)
+    if not types or types == {str}:
+        return STRING
+    if types == {bool}:
+        return BOOL
+    if types == {int}:
+        a = np.array([v for v in values if v is not None], dtype=np.int64)
+        return INT32 if INT32_NULL < a.min() and a.max() < 2 ** 31 else FLOAT32
+    if types <= {int, float}:
+        return FLOAT32
+    if types <= {list, tuple} and all(v is None or (len(v) == 2 and type(v[0]) in (int, float)
+                                                    and type(v[1]) in (int, float)) for v in values):
+        return VEC2
+    return JSON
+
+
+def _encode_column(kind: int, values, strings: _Strings) -> bytes:
+    if kind == CONST:
+        return struct.pack("<I", strings.add(_json(values[0])))
+    if kind == INT32:
+        a = np.array([INT32_NULL if v is None else v for v in values], dtype="<i4")
+    elif kind == FLOAT32:
+        a = np.array([np.nan if v is None else v for v in values], dtype="<f4")
+    elif kind == BOOL:
+        a = np.array([BOOL_NULL if v is None else v for v in values], dtype="u1")
+    elif kind == VEC2:
+        nan = (np.nan, np.nan)
+        a = np.array([nan if v is None else v for v in values], dtype="<f4")
+    else:
+        dump = (lambda v: v) if kind == STRING else _json
+        a = np.array([STR_NULL if v is None else strings.add(dump(v)) for v in values], dtype="<u4")
+    data = a.tobytes()
+    return data + b"\0" * _pad4(len(data))
+
+
+def encode(records, version: int = 0, tick: int = 0) -> bytes:
+    strings = _Strings()
+    groups = {}
+    for r in records:
+        groups.setdefault(tuple(r), []).append(r)
+
+    tables = []
+    for keys, rows in groups.items():
+        # transpose the table: one tuple of values per key
+        values = [(v,) for v in map(itemgetter(*keys), rows)] if len(keys) == 1 else \
+            list(map(itemgetter(*keys), rows))
+        directory = []
+        blobs = []
+        for key, col in zip(keys, zip(*values)):
+            kind = _column_type(col)
+            directory.append(_COLUMN.pack(strings.add(key), kind))
+            blobs.append(_encode_column(kind, col, strings))
+        tables.append(_TABLE.pack(len(rows), len(keys)))
+        tables.extend(directory)
+        tables.extend(blobs)
+
+    encoded = [s.encode() for s in strings.values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    text = b"".join(encoded)
+
+    return b"".join([
+        _HEADER.pack(MAGIC, WIRE_VERSION, len(groups), version, tick, len(records),
+                     len(encoded), len(text)),
+        offsets.tobytes(),
+        text, b"\0" * _pad4(len(text)),
+    ] + tables)
+
+
+def decode(data: bytes) -> dict:
+    """Inverse of encode() (floats come back at float32 precision); for tests and tools."""
+    magic, wire_version, ntables, version, tick, nrows, nstrings, text_len = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a W.A.T unit frame")
+    if wire_version != WIRE_VERSION:
+        raise ValueError(f"unsupported wire version {wire_version}")
+    pos = _HEADER.size
+    offsets = np.frombuffer(data, dtype="<u4", count=nstrings + 1, offset=pos)
+    pos += offsets.nbytes
+    text = data[pos:pos + text_len]
+    strings = [text[offsets[i]:offsets[i + 1]].decode() for i in range(nstrings)]
+    pos += text_len + _pad4(text_len)
+
+    records = []
+    for _ in range(ntables):
+        rows, ncols = _TABLE.unpack_from(data, pos)
+        pos += _TABLE.size
+        directory = [_COLUMN.unpack_from(data, pos + i * _COLUMN.size) for i in range(ncols)]
+        pos += ncols * _COLUMN.size
+        table = [{} for _ in range(rows)]
+        for name, kind in directory:
+            key = strings[name]
+            if kind == CONST:
+                value = json.loads(strings[struct.unpack_from("<I", data, pos)[0]])
+                pos += 4
+                for r in table:
+                    r[key] = value
+                continue
+            size = rows * _ITEMSIZE[kind]
+            dtype = {INT32: "<i4", FLOAT32: "<f4", BOOL: "u1", VEC2: "<f4"}.get(kind, "<u4")
+            col = np.frombuffer(data, dtype=dtype, count=rows * (2 if kind == VEC2 else 1), offset=pos)
+            pos += size + _pad4(size)
+            if kind == VEC2:
+                col = col.reshape(rows, 2)
+            for r, v in zip(table, col.tolist()):
+                if kind == INT32:
+                    r[key] = None if v == INT32_NULL else v
+                elif kind == FLOAT32:
+                    r[key] = v if v == v else None
+                elif kind == BOOL:
+                    r[key] = None if v == BOOL_NULL else bool(v)
+                elif kind == VEC2:
+                    r[key] = v if v[0] == v[0] else None
+                elif v == STR_NULL:
+                    r[key] = None
+                else:
+                    r[key] = strings[v] if kind == STRING else json.loads(strings[v])
+        records.extend(table)
+    return {"version": version, "tick": tick, "units": records}
@@ -0,0 +1,658 @@
+import json
+import math
+import queue
+import threading
+import traceback
+from collections import deque, namedtuple
+
+import numpy as np
+
+import UAVUnits, AntiAirUnits, LogHub, GroundUnits
+import WireFormat
+
+# vision for entities without a viewRange of their own (what the page always assumed)
+DEFAULT_VIEW_RANGE = 180
+
+
+def entity_record(u) -> dict:
+    """Plain JSON-able dict of everything the page shows for one entity."""
+    # base dictionary common for everything
+    data = {
+        "id": getattr(u, "id", None),
+        "name": getattr(u, "name", "Unknown"),
+        "x": u.positionX,
+        "y": u.positionY,
+        "image": getattr(u, "image", None),
+        "player": getattr(u, "player", 0),
+        "unit_class": u.__class__.__name__,
+        "size": 28,
+        "viewRange": getattr(u, "viewRange", DEFAULT_VIEW_RANGE)
+    }
+
+    # extra fields for UAVs
+    if isinstance(u, UAVUnits.UAV):
+        data.update({
+            "state": u.state.name,
+            "chanceToHit": getattr(u, "chanceToHit", None),
+            "baseSpeed": getattr(u, "baseSpeed", None),
+            "armourType": u.armourType.name if hasattr(u, "armourType") else None,
+            "currentBattery": round(u.currentBattery, 2),
+            "currentWeight": u.currentWeight,
+            "idleBatteryDrainPerTick": u.idleBatteryDrainPerTick,
+            "moveBatteryDrainPerTick": u.moveBatteryDrainPerTick,
+        })
+        if getattr(u, "destination", None) is not None:
+            # convert tuple -> list for JSON
+            data["destination"] = [u.destination[0], u.destination[1]]
+        if hasattr(u, "move_queue") and u.move_queue:
+            data["move_queue"] = [[pt[0], pt[1]] for pt in u.move_queue]
+        else:
+            data["move_queue"] = []
+
+    if isinstance(u, UAVUnits.RetransmiterUAV):
+        data.update({
+            "transmissionRange": u.transmissionRange,
+            "is_retransmitting": getattr(u, "is_retransmitting", False)
+        })
+
+    # extra fields for LoiteringMunition
+    if isinstance(u, UAVUnits.LoiteringMunition):
+        data.update({
+            "payload": u.payload,
+            "explosiveType": u.explosiveType.name,
+        })
+
+    if isinstance(u, GroundUnits.CombatVehicle):
+        data.update({
+            "shootingRange": getattr(u, "shootingRange", None),
+            "ammoType": u.ammoType.name if hasattr(u, "ammoType") else None,
+            "ammoCount": getattr(u, "ammoCount", None),
+            "fuel": getattr(u, "currentFuel", None),
+            "maxFuel": getattr(u, "maxFuel", None)
+        })
+
+    if isinstance(u, GroundUnits.SupplyVehicle):
+        data.update({
+            "cargoType": u.cargoType.name,
+            "cargoAmmount": u.cargoAmmount,
+            "armourType": u.armourType.name,
+            "fuel": getattr(u, "currentFuel", None),
+            "maxFuel": getattr(u, "maxFuel", None)
+        })
+
+    # extra fields for AntiAir
+    if isinstance(u, AntiAirUnits.AntiAir):
+        data.update({
+            "state": u.state.name,
+            "armourType": u.armourType.name if hasattr(u, "armourType") else None,
+            "range": u.range,
+            "aa_state": u.AAstate.name,
+            "ammo": u.ammoCount,
+            "ammoType": u.ammoType.name if hasattr(u, "ammoType") else None
+        })
+        if u.target is not None:
+            data["aa_target"] = [u.target.positionX, u.target.positionY]
+            data["aa_target_name"] = getattr(u.target, "name", "Unknown")
+        else:
+            data["aa_target"] = None
+            data["aa_target_name"] = None
+
+    # extra fields for LogHub (the bases)
+    if isinstance(u, LogHub.LogHub):
+        # turn enum-keyed dict into plain {name: amount}
+        storage_dict = {}
+        if getattr(u, "inStorage", None):
+            for k, v in u.inStorage.items():
+                # k is SupplyType
+                storage_dict[k.name if hasattr(k, "name") else str(k)] = v
+
+        data.update({
+            "transmissionRange": u.transmissionRange,
+            "available_retransmitters": getattr(u, "available_retransmitters", 0),
+            "current_spawned_uavs": getattr(u, "current_spawned_uavs", 0),
+            "max_spawned_uavs": getattr(u, "max_deployed_uavs", 5),
+            "current_air_retransmitters": getattr(u, "current_air_retransmitters", 0),
+            "max_air_retransmitters": getattr(u, "max_air_retransmitters", 2),
+            "storage": storage_dict
+        })
+
+    if isinstance(u, LogHub.GroundRetransmitter):
+        data.update({
+            "transmissionRange": u.transmissionRange,
+            "parent_base_id": u.parent_base_id
+        })
+
+    if isinstance(u, LogHub.ElectronicWarfare):
+        data.update({
+            "jammingRange": u.jammingRange,
+            "jammingFreq": list(getattr(u, "jammingFreq", []))
+        })
+
+    return data
+
+
+# movement store columns a record is patched from, see patch_record()
+ROW_COLUMNS = ("posX", "posY", "state", "speed", "battery", "idleDrain", "moveDrain",
+               "hasDest", "destX", "destY", "drainModifier", "fuel")
+
+_STATE_NAMES = {s.value: s.name for s in UAVUnits.UnitState}
+
+
+def patch_record(before: dict, row) -> dict:
+    """
+    What entity_record() says now for a unit whose last record was `before`
+    and that has only changed in the movement store since: `row` holds its
+    ROW_COLUMNS values. Keep in step with entity_record().
+    """
+    x, y, state, speed, battery, idleDrain, moveDrain, hasDest, destX, destY, drainModifier, fuel = row
+    rec = dict(before)
+    rec["x"] = x
+    rec["y"] = y
+    if "state" in rec:
+        rec["state"] = _STATE_NAMES[state]
+    if "currentBattery" in rec:
+        # UAVs
+        rec["baseSpeed"] = speed
+        rec["currentBattery"] = round(battery, 2)
+        rec["idleBatteryDrainPerTick"] = idleDrain
+        rec["moveBatteryDrainPerTick"] = moveDrain
+        if hasDest:
+            rec["destination"] = [destX, destY]
+        else:
+            rec.pop("destination", None)
+    if "is_retransmitting" in rec:
+        rec["is_retransmitting"] = drainModifier != 1.0
+    if "fuel" in rec:
+        rec["fuel"] = fuel
+    return rec
+
+
+# how many published views a client can fall behind and still get a delta
+HISTORY = 30
+
+# what one client gets to see: player (fog of war, None = everyone's units),
+# rect (x0, y0, x1, y1) viewport in map coordinates (None = whole map) and
+# include, ids sent even outside rect (the selected unit) if the player sees them
+Scope = namedtuple("Scope", ("player", "rect", "include"), defaults=(None, None, frozenset()))
+
+
+class WorldView:
+    """
+    Read-only picture of the world as it was at the end of one tick.
+    Built from what the simulation thread collect()ed, then handed to request
+    threads as a whole: nothing in here is mutated after build(), so any
+    number of readers can share it without locks. records are the per-entity dicts the page gets;
+    columns() are the same rows as numpy arrays for filtering.
+    The JSON and binary (WireFormat) encodings are built on first request and cached.
+
+    A view is the previous one with `records` (the entities that may have
+    changed, by id) laid over it and `removed` ids taken out; full=True
+    means records is the whole world instead. Everything else (the record
+    tuple, the columns) is only worked out when someone asks for it.
+
+    version counts publishes (the tick number stalls while paused and resets
+    on restore, version doesn't). created / changed / removed say what differs
+    from the previous version: ids, and for changed ids the record keys.
+
+    The per-client outputs take a Scope and only include what that player
+    can see (fog of war, worked out from the columns on first use) inside
+    its viewport; scope None means everything (spectator / admin).
+    """
+
+    __slots__ = ("tick", "time", "paused", "version", "created", "changed", "removed", "_by_id", "_records",
+                 "_columns", "_visible", "_by_x", "_scopes", "_json", "_binary", "_deltas", "_lock")
+
+    def __init__(self, tick: int, time: float, records: dict, paused: bool = False, previous=None,
+                 removed=frozenset(), full: bool = False):
+        self.tick = tick
+        self.time = time
+        self.paused = paused
+        self.version = previous.version + 1 if previous is not None else 0
+        if previous is None or full:
+            self._by_id = dict(records)
+            self.created, self.changed, self.removed = self._diff(previous)
+        else:
+            self._by_id = dict(previous._by_id)
+            self.created, self.changed, self.removed = self._update(records, removed, previous)
+        self._records = None
+        self._columns = None
+        self._visible = None
+        self._by_x = None
+        self._scopes = {}
+        self._json = {}
+        self._binary = {}
+        self._deltas = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def get(self, entity_id):
+        return self._by_id.get(entity_id)
+
+    @property
+    def records(self) -> tuple:
+        records = self._records
+        if records is None:
+            records = self._records = tuple(self._by_id.values())
+        return records
+
+    def columns(self):
+        """(id, x, y, player, viewRange) of every record as read-only numpy arrays."""
+        if self._columns is None:
+            with self._lock:
+                if self._columns is None:
+                    records = self.records
+                    n = len(records)
+                    cols = (np.fromiter((r["id"] for r in records), dtype=np.int64, count=n),
+                            np.fromiter((r["x"] for r in records), dtype=np.float64, count=n),
+                            np.fromiter((r["y"] for r in records), dtype=np.float64, count=n),
+                            np.fromiter((r["player"] for r in records), dtype=np.int32, count=n),
+                            np.fromiter((r["viewRange"] for r in records), dtype=np.float64, count=n))
+                    for a in cols:
+                        a.flags.writeable = False
+                    self._columns = cols
+        return self._columns
+
+    def visible_to(self, player):
+        """Ids `player` can see, or None when nothing is hidden (player None)."""
+        if player is None:
+            return None
+        if self._visible is None:
+            with self._lock:
+                if self._visible is None:
+                    self._visible = compute_visibility(*self.columns())
+        return self._visible.get(player, frozenset())
+
+    def in_rect(self, x0: float, y0: float, x1: float, y1: float) -> frozenset:
+        """Ids inside the rectangle: binary search on the x-sorted rows, then filter that slab on y."""
+        ids, x, y = self.columns()[:3]
+        if self._by_x is None:
+            with self._lock:
+                if self._by_x is None:
+                    order = np.argsort(x, kind="stable")
+                    self._by_x = (order, x[order])
+        order, xs = self._by_x
+        lo = np.searchsorted(xs, x0, side="left")
+        hi = np.searchsorted(xs, x1, side="right")
+        rows = order[lo:hi]
+        ys = y[rows]
+        return frozenset(ids[rows[(ys >= y0) & (ys <= y1)]].tolist())
+
+    def ids_for(self, scope):
+        """Ids a client with this Scope gets, or None when nothing is filtered out."""
+        if scope is None:
+            return None
+        ids = self._scopes.get(scope)
+        if ids is None:
+            seen = self.visible_to(scope.player)
+            ids = seen
+            if scope.rect is not None:
+                ids = self.in_rect(*scope.rect)
+                if seen is not None:
+                    ids &= seen
+                extra = scope.include & (seen if seen is not None else self._by_id.keys())
+                ids |= extra
+            if ids is not None:
+                with self._lock:
+                    if len(self._scopes) < 64:
+                        self._scopes[scope] = ids
+        return ids
+
+    def records_for(self, scope) -> tuple:
+        ids = self.ids_for(scope)
+        if ids is None:
+            return self.records
+        return tuple(r for r in self.records if r["id"] in ids)
+
+    def _diff(self, previous):
+        # whole world against the previous view (first publish, restore)
+        if previous is None:
+            return frozenset(self._by_id), {}, frozenset()
+        created, changed = self._compare(self._by_id, previous._by_id)
+        removed = [eid for eid in previous._by_id if eid not in self._by_id]
+        return created, changed, frozenset(removed)
+
+    def _update(self, records, removed, previous):
+        # only the entities that may have changed since `previous`
+        by_id = self._by_id
+        old = previous._by_id
+        removed = frozenset(eid for eid in removed if eid in old)
+        for eid in removed:
+            del by_id[eid]
+        by_id.update(records)
+        created, changed = self._compare(records, old)
+        return created, changed, removed
+
+    def _compare(self, records, old):
+        created = []
+        changed = {}
+        by_id = self._by_id
+        for eid, rec in records.items():
+            before = old.get(eid)
+            if before is None:
+                created.append(eid)
+            elif before == rec:
+                # unchanged records are shared with the previous view, so the
+                # history only pays for what actually moved
+                by_id[eid] = before
+            else:
+                keys = [k for k, v in rec.items() if before.get(k, _MISSING) != v]
+                keys.extend(k for k in before if k not in rec)
+                changed[eid] = frozenset(keys)
+        return frozenset(created), changed
+
+    def to_json(self, scope=None) -> bytes:
+        """The full /units body; encoded once per tick (and scope) however many clients ask."""
+        body = self._json.get(scope)
+        if body is None:
+            with self._lock:
+                body = self._json.get(scope)
+                if body is None:
+                    body = self._json[scope] = json.dumps(self.records_for(scope), separators=(",", ":")).encode()
+        return body
+
+    def to_binary(self, scope=None) -> bytes:
+        """The full record list as a WireFormat frame, cached like to_json()."""
+        body = self._binary.get(scope)
+        if body is None:
+            with self._lock:
+                body = self._binary.get(scope)
+                if body is None:
+                    body = self._binary[scope] = WireFormat.encode(self.records_for(scope), self.version, self.tick)
+        return body
+
+
+_MISSING = object()
+
+# most (target, observer) pairs compute_visibility() builds arrays for at once
+VISIBILITY_PAIR_CHUNK = 1 << 16
+# cell offsets around a target, nearest first so most targets are settled before the outer ring
+_VISIBILITY_OFFSETS = sorted(((dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)),
+                             key=lambda d: d[0] * d[0] + d[1] * d[1])
+
+
+def compute_visibility(ids, x, y, player, viewRange) -> dict:
+    """
+    {player: frozenset of ids it sees}: its own entities plus anything of
+    another player inside one of its own entities' viewRange circles.
+    Observers are bucketed on a grid with cells half the largest view range,
+    so each target only looks at the 5x5 cells around it, nearest first.
+    Whole cells are settled without pair tests where they can be: a target
+    cell is seen if some observer in the other cell reaches its far corner,
+    and skipped if none reaches its near edge. What's left is tested pair by
+    pair, at most VISIBILITY_PAIR_CHUNK pairs at a time.
+    """
+    visible = {}
+    for p in np.unique(player).tolist():
+        own = player == p
+        targets = np.flatnonzero(~own)
+        ox, oy, orange = x[own], y[own], viewRange[own]
+        tx, ty = x[targets], y[targets]
+
+        cell = max(float(orange.max()) / 2, 1.0)
+        ocx = np.floor(ox / cell).astype(np.int64)
+        ocy = np.floor(oy / cell).astype(np.int64)
+        x0, y0 = ocx.min() - 2, ocy.min() - 2
+        w, h = ocx.max() - x0 + 3, ocy.max() - y0 + 3
+        # observers sorted by cell: cell k holds order[start[k]:start[k] + count[k]]
+        key = (ocx - x0) * h + (ocy - y0)
+        order = np.argsort(key, kind="stable")
+        ox, oy, r2 = ox[order], oy[order], orange[order] ** 2
+        count = np.bincount(key, minlength=w * h)
+        start = np.cumsum(count) - count
+        reach = np.zeros(w * h)
+        np.maximum.at(reach, key, orange)
+
+        tcx = np.floor(tx / cell).astype(np.int64) - x0
+        tcy = np.floor(ty / cell).astype(np.int64) - y0
+        seen = np.zeros(len(targets), dtype=bool)
+        for dx, dy in _VISIBILITY_OFFSETS:
+            cx, cy = tcx + dx, tcy + dy
+            ti = np.flatnonzero(~seen & (cx >= 0) & (cx < w) & (cy >= 0) & (cy < h))
+            k = cx[ti] * h + cy[ti]
+            r = reach[k]
+            # farthest / nearest two points of the target's cell and cell k can be
+            far = cell * math.hypot(abs(dx) + 1, abs(dy) + 1)
+            near = cell * math.hypot(max(abs(dx) - 1, 0), max(abs(dy) - 1, 0))
+            seen[ti[r > far]] = True
+            test = (r >= near) & (r <= far) & (count[k] > 0)
+            ti, k = ti[test], k[test]
+            n = count[k]
+            if not len(ti):
+                continue
+            # every (target, observer in that cell) pair, a bounded batch of targets at a time
+            ends = np.cumsum(n)
+            lo = 0
+            while lo < len(ti):
+                hi = max(int(np.searchsorted(ends, ends[lo] - n[lo] + VISIBILITY_PAIR_CHUNK, "right")), lo + 1)
+                ct, cn, ck = ti[lo:hi], n[lo:hi], k[lo:hi]
+                total = int(cn.sum())
+                pair_t = np.repeat(ct, cn)
+                pair_o = np.repeat(start[ck] - (np.cumsum(cn) - cn), cn) + np.arange(total)
+                ddx = ox[pair_o] - tx[pair_t]
+                ddy = oy[pair_o] - ty[pair_t]
+                seen[pair_t[ddx * ddx + ddy * ddy <= r2[pair_o]]] = True
+                lo = hi
+        visible[p] = frozenset(ids[own].tolist()) | frozenset(ids[targets[seen]].tolist())
+    return visible
+
+
+# what one tick hands over for its view: whole records for the entities that
+# changed beyond the movement store (all of them when full), the store rows
+# written (ids first, then ROW_COLUMNS, as numpy arrays) and the ids that left
+Changes = namedtuple("Changes", ("tick", "time", "paused", "full", "records", "rows", "gone"))
+
+
+def collect(world, paused: bool = False, full: bool = False) -> Changes:
+    """
+    Take this tick's changes out of the world. Simulation thread only (between
+    ticks); the store rows are copied with a few numpy gathers, entity_record()
+    only runs for entities world.take_changes() says need it.
+    """
+    entities, slots, gone = world.take_changes()
+    if entities is None or full:
+        # same order the page always got: UAVs, AA, bases, retransmitters, EW
+        entities = world.units + world.aaUnits + world.logBases + world.ground_retransmitters + world.ewarUnits
+        return Changes(world.tick_count, world.time, paused, True, {u.id: entity_record(u) for u in entities},
+                       None, frozenset())
+    store = world.store
+    rows = (store.ids[slots],) + tuple(getattr(store, name)[slots] for name in ROW_COLUMNS)
+    return Changes(world.tick_count, world.time, paused, False, {u.id: entity_record(u) for u in entities},
+                   rows, gone)
+
+
+def build(batch, previous: WorldView = None) -> WorldView:
+    """The view after one or more Changes (oldest first) on top of `previous`."""
+    # a full one makes everything before it moot
+    for i in range(len(batch) - 1, -1, -1):
+        if batch[i].full:
+            batch = batch[i:]
+            break
+    full = batch[0].full or previous is None
+    old = {} if full else previous._by_id
+    records = {}
+    gone = set()
+    for changes in batch:
+        for eid in changes.gone:
+            records.pop(eid, None)
+            gone.add(eid)
+        records.update(changes.records)
+        if changes.rows is None:
+            continue
+        for row in zip(*(a.tolist() for a in changes.rows)):
+            eid = row[0]
+            before = records.get(eid)
+            if before is None:
+                before = old.get(eid) if eid not in gone else None
+                if before is None:
+                    continue
+            records[eid] = patch_record(before, row[1:])
+    last = batch[-1]
+    return WorldView(last.tick, last.time, records, last.paused, previous, removed=gone, full=full)
+
+
+def capture(world, paused: bool = False, previous: WorldView = None) -> WorldView:
+    """Freeze the current world state. Simulation thread only (between ticks)."""
+    return build([collect(world, paused, previous is None)], previous)
+
+
+class ViewHistory:
+    """
+    The last HISTORY published views, newest last, so a client that last saw
+    version v can be sent only what changed since then. publish() is called
+    by the simulation thread only; readers take `latest` / `delta_json`
+    lock-free, push streams block in wait_newer() until the next publish.
+
+    With background=True the simulation thread only collect()s each tick's
+    changes and a publisher thread of our own builds the views. When it
+    falls behind, the ticks waiting for it go into one view.
+    """
+
+    def __init__(self, maxlen: int = HISTORY, background: bool = False):
+        self._views = deque(maxlen=maxlen)
+        self.latest = None
+        self._published = threading.Condition()
+        self.subscribers = 0
+        # whether the last publish() was a paused one (latest can lag behind it)
+        self.paused = False
+        self._pending = None
+        self._resync = False
+        if background:
+            self._pending = queue.SimpleQueue()
+            threading.Thread(target=self._publisher, name="view-publisher", daemon=True).start()
+
+    def publish(self, world, paused: bool = False):
+        """Publish the world as it is now: returns the view, or None when it's built in the background."""
+        self.paused = paused
+        # the first view is built right here, readers need one from the start
+        inline = self._pending is None or self.latest is None
+        changes = collect(world, paused, full=self.latest is None or self._resync)
+        self._resync = False
+        if not inline:
+            self._pending.put(changes)
+            return None
+        view = build([changes], self.latest)
+        self._add(view)
+        return view
+
+    def _publisher(self):
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                view = build(batch, self.latest)
+            except Exception:
+                # those changes are lost, so the next publish starts over from the whole world
+                traceback.print_exc()
+                self._resync = True
+                continue
+            self._add(view)
+
+    def _add(self, view: WorldView):
+        self._views.append(view)
+        with self._published:
+            self.latest = view
+            self._published.notify_all()
+
+    def wait_newer(self, version: int, timeout: float = None):
+        """Block until a view newer than `version` is published; returns it, or None on timeout."""
+        with self._published:
+            if self._published.wait_for(lambda: self.latest.version != version, timeout):
+                return self.latest
+        return None
+
+    def stream(self, since: int = -1, scope=None, keepalive: float = 15.0):
+        """
+        Server-sent events, one per publish: each is the delta from what this
+        client was last sent to the newest view. A client that can't keep up
+        doesn't build a backlog - when it's ready again it gets one delta
+        straight to the latest view and the views in between are skipped.
+        """
+        with self._published:
+            self.subscribers += 1
+        try:
+            last = since
+            while True:
+                view = self.wait_newer(last, keepalive)
+                if view is None:
+                    yield b": keepalive\n\n"
+                    continue
+                body = self.delta_json(last, view, scope)
+                last = view.version
+                yield b"event: units\nid: %d\ndata: %s\n\n" % (view.version, body)
+        finally:
+            with self._published:
+                self.subscribers -= 1
+
+    def delta(self, since: int, view: WorldView = None, scope=None) -> dict:
+        """
+        Everything that changed between version `since` and `view` (default: latest),
+        as seen by a client with `scope` (None: everything).
+        Falls back to the full record list when `since` is unknown or too old.
+        """
+        view = view or self.latest
+        if since == view.version:
+            return {"version": view.version, "tick": view.tick, "full": False,
+                    "created": [], "changed": [], "removed": []}
+        # views from `since` up to and including `view`
+        history = [v for v in tuple(self._views) if since <= v.version <= view.version]
+        if since < 0 or len(history) < 2 or history[0].version != since:
+            return {"version": view.version, "tick": view.tick, "full": True,
+                    "units": list(view.records_for(scope))}
+        steps = history[1:]
+
+        created, changed, removed = set(), {}, set()
+        for step in steps:
+            for eid in step.removed:
+                if eid in created:
+                    created.discard(eid)        # came and went, the client never saw it
+                else:
+                    removed.add(eid)
+                changed.pop(eid, None)
+            for eid in step.created:
+                removed.discard(eid)            # id reused (restore): resend the whole thing
+                created.add(eid)
+                changed.pop(eid, None)
+            for eid, keys in step.changed.items():
+                if eid not in created:
+                    changed[eid] = changed.get(eid, frozenset()) | keys
+
+        seen = view.ids_for(scope)
+        if seen is not None:
+            # fog / viewport: entering the scope counts as created, leaving it as removed
+            seen_before = history[0].ids_for(scope)
+            removed = seen_before - seen
+            created = (created & seen) | (seen - seen_before)
+            changed = {eid: keys for eid, keys in changed.items() if eid in seen and eid not in created}
+
+        # values always come from the newest view; keys it no longer has are unset
+        out_changed = []
+        for eid, keys in changed.items():
+            rec = view.get(eid)
+            out_changed.append({
+                "id": eid,
+                "set": {k: rec[k] for k in keys if k in rec},
+                "unset": [k for k in keys if k not in rec],
+            })
+        return {"version": view.version, "tick": view.tick, "full": False,
+                "created": [view.get(eid) for eid in created],
+                "changed": out_changed,
+                "removed": sorted(removed)}
+
+    def delta_json(self, since: int, view: WorldView = None, scope=None) -> bytes:
+        """delta() encoded, cached on the view so clients at the same version share it."""
+        view = view or self.latest
+        key = (since, scope)
+        body = view._deltas.get(key)
+        if body is None:
+            body = json.dumps(self.delta(since, view, scope), separators=(",", ":")).encode()
+            with view._lock:
+                # keep the cache bounded: about one entry per version still in the history
+                if len(view._deltas) < 4 * (HISTORY + 1):
+                    view._deltas[key] = body
+        return body